@@ -0,0 +1,367 @@
+#! /usr/bin/env python3
+#
+# benchmark.py
+#       Script to measure the conversion scripts on synthetic designs.
+#
+#   For each value of the swept generator parameter, a design is
+#   generated and the following times are measured, keeping the best
+#   of the repetitions:
+#     - each script run as a command: sym2vhd.py on the top symbol,
+#       sch2vhd.py on the top schematic, design2vhd.py building the whole
+#       design and design2vhd.py finding it up to date; the stored
+#       netlists are removed before each run, except for the up to date
+#       build,
+#     - each phase of the top schematic conversion: parsing, net
+#       aggregation, component connection and VHDL writing,
+#     - the memory taken by the parsed top schematic, in the data model
+#       of the conversion scripts and in the nested lists and dictionaries
+#       it has replaced.
+#   The results are written as JSON and printed as a table, with the net
+#   aggregation time per segment to make a non-linear growth visible.
+#
+import os
+import sys
+import glob
+import argparse
+import time
+import subprocess
+import tempfile
+import shutil
+import json
+import tracemalloc
+import geda
+import sch2vhd
+import generate_design
+                                                                     # constants
+BENCHMARK_VERSION = 3
+GENERATOR_PARAMETERS = ('instances', 'nets', 'width', 'depth', 'fanout')
+PHASES = ('parse', 'aggregate', 'connect', 'write')
+SCRIPTS = ('sym2vhd', 'sch2vhd', 'design2vhd', 'design2vhd_up_to_date')
+                                                               # script location
+
+script_location = os.path.dirname(os.path.realpath(sys.argv[0]))
+
+# ==============================================================================
+# functions
+#
+# ------------------------------------------------------------------------------
+# remove the netlists stored in a scratch directory
+#
+def remove_netlists(scratch_directory):
+    for netlist_file_spec in glob.glob(
+        os.path.join(scratch_directory, '*-netlist.json')
+    ) :
+        os.remove(netlist_file_spec)
+
+# ------------------------------------------------------------------------------
+# time a script run as a command
+#
+#   With a netlist directory, the stored netlists are removed before each
+#   run, so that the schematics are parsed and connected again.
+#
+def time_script(script_name, arguments, repeat, netlist_directory=None):
+    command_line = [
+        sys.executable, os.path.join(script_location, script_name + '.py')
+    ] + arguments
+    best_time = None
+    for repetition in range(repeat) :
+        if netlist_directory :
+            remove_netlists(netlist_directory)
+        start_time = time.perf_counter()
+        run = subprocess.run(
+            command_line,
+            stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT
+        )
+        run_time = time.perf_counter() - start_time
+        if run.returncode :
+            print("%s failed" % ' '.join(command_line))
+        if (best_time is None) or (run_time < best_time) :
+            best_time = run_time
+
+    return(best_time)
+
+# ------------------------------------------------------------------------------
+# time the phases of a schematic conversion
+#
+#   The port locations of the instantiated symbols have to be in the
+#   scratch directory. Returns the best time of each phase and the
+#   design counters.
+#
+def time_phases(schematics_file_spec, scratch_directory, repeat):
+    (library_name, symbol_name, architecture_name) = \
+        sch2vhd.find_file_specs(schematics_file_spec)[:3]
+    vhdl_file_spec = os.path.join(scratch_directory, 'benchmark.vhd')
+    phase_times = {}
+    for repetition in range(repeat) :
+        times = {}
+        start_time = time.perf_counter()
+        (components, nets, signals, text_blocks, warnings) = \
+            sch2vhd.parse_schematics(schematics_file_spec)
+        times['parse'] = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        sch2vhd.aggregate_nets(nets)
+        times['aggregate'] = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        sch2vhd.connect_components(components, nets, {}, scratch_directory)
+        sch2vhd.propagate_signal_types(components, signals)
+        times['connect'] = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        sch2vhd.write_architecture(
+            vhdl_file_spec, library_name, library_name, symbol_name,
+            architecture_name, components, signals, text_blocks
+        )
+        times['write'] = time.perf_counter() - start_time
+        for (phase, phase_time) in times.items() :
+            if (phase not in phase_times) or (phase_time < phase_times[phase]) :
+                phase_times[phase] = phase_time
+    os.remove(vhdl_file_spec)
+    counters = {
+        'file_size' : os.path.getsize(schematics_file_spec),
+        'components' : len(components),
+        'segments' : len(nets),
+        'nets' : len(set(nets.names))
+    }
+
+    return(phase_times, counters)
+
+# ------------------------------------------------------------------------------
+# parse a schematic into nested lists and dictionaries
+#
+#   These are the structures used before the data model of the netlist
+#   module, they are kept to compare the memory taken by both.
+#
+def parse_schematics_as_lists(schematics_file_spec):
+    components = []
+    nets = []
+    signals = []
+    text_blocks = []
+    for geda_object in geda.read_objects(schematics_file_spec) :
+        object_type = geda_object['type']
+        fields = geda_object['fields']
+                                                                     # component
+        if (object_type == 'C') and geda_object['attributes'] :
+            component = {
+                'name' : fields[-1].rstrip('.sym'),
+                'label' : '',
+                'source' : '',
+                'generics' : [],
+                'location' : [int(fields[0]), int(fields[1])]
+            }
+            for (name, value) in geda_object['attributes'] :
+                if name.startswith('refdes') :
+                    component['label'] = value
+                if name.startswith('source') :
+                    component['source'] = value
+                if name.startswith('generic') :
+                    component['generics'].append(value)
+            components.append(component)
+                                                                           # net
+        elif (object_type == 'N') or (object_type == 'U') :
+            net_name = geda.attribute_value(geda_object, 'netname')
+            if net_name :
+                signals.append([
+                    net_name,
+                    geda.attribute_value(geda_object, 'signaltype'),
+                    geda.attribute_value(geda_object, 'signalrange')
+                ])
+            nets.append([
+                net_name,
+                [int(fields[0]), int(fields[1])],
+                [int(fields[2]), int(fields[3])]
+            ])
+                                                                          # text
+        elif object_type == 'T' :
+            text_blocks.append("\n".join(geda_object['text']))
+
+    return(components, nets, signals, text_blocks)
+
+# ------------------------------------------------------------------------------
+# parse a schematic into the netlist data model and aggregate its nets
+#
+def parse_schematics_as_model(schematics_file_spec):
+    (components, nets, signals, text_blocks, warnings) = \
+        sch2vhd.parse_schematics(schematics_file_spec)
+    sch2vhd.aggregate_nets(nets)
+
+    return(components, nets, signals, text_blocks)
+
+# ------------------------------------------------------------------------------
+# measure the memory taken by a parsed schematic
+#
+#   The memory is the one still allocated once the schematic has been
+#   parsed, as traced by tracemalloc.
+#
+def measure_memory(schematics_file_spec):
+    memory = {}
+    for (model, parse) in (
+        ('lists', parse_schematics_as_lists),
+        ('model', parse_schematics_as_model)
+    ) :
+        tracemalloc.start()
+        design = parse(schematics_file_spec)
+        memory[model] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del design
+
+    return(memory)
+
+# ------------------------------------------------------------------------------
+# measure the scripts on one generated design
+#
+def run_benchmark(parameters, scratch_directory, repeat):
+    design_directory = tempfile.mkdtemp(
+        prefix='benchmark-', dir=scratch_directory
+    )
+    (gafrc_file_spec, top_file_spec, segment_count) = \
+        generate_design.generate_design(design_directory, **parameters)
+    top_symbol_file_spec = top_file_spec.replace('Schematics', 'Symbols')
+    top_symbol_file_spec = \
+        '-'.join(top_symbol_file_spec.split('-')[:-1]) + '.sym'
+                                                                  # script times
+    script_times = {}
+    script_times['design2vhd'] = time_script('design2vhd', [
+        '-f', '-g', gafrc_file_spec, '-s', design_directory, top_file_spec
+    ], repeat, design_directory)
+    script_times['design2vhd_up_to_date'] = time_script('design2vhd', [
+        '-g', gafrc_file_spec, '-s', design_directory, top_file_spec
+    ], repeat)
+    script_times['sym2vhd'] = time_script('sym2vhd', [
+        '-s', design_directory, top_symbol_file_spec
+    ], repeat, design_directory)
+    script_times['sch2vhd'] = time_script('sch2vhd', [
+        '-s', design_directory, top_file_spec
+    ], repeat, design_directory)
+                                                                   # phase times
+    (phase_times, counters) = time_phases(
+        top_file_spec, design_directory, repeat
+    )
+                                                                        # memory
+    memory = measure_memory(top_file_spec)
+    shutil.rmtree(design_directory)
+
+    return({
+        'parameters' : parameters,
+        'counters' : counters,
+        'scripts' : script_times,
+        'phases' : phase_times,
+        'memory' : memory
+    })
+
+# ------------------------------------------------------------------------------
+# print the results as a table
+#
+def print_results(sweep_name, results):
+    columns = [sweep_name, 'segments'] + list(PHASES) + list(SCRIPTS)
+    headers = [sweep_name, 'segments'] + list(PHASES) + [
+        'sym2vhd', 'sch2vhd', 'design2vhd', 'rebuild', 'us/segment',
+        'lists [kB]', 'model [kB]'
+    ]
+    print(' '.join(["%11s" % header[-11:] for header in headers]))
+    for result in results :
+        values = [
+            result['parameters'][sweep_name], result['counters']['segments']
+        ]
+        line = "%11d %11d" % tuple(values)
+        for column in columns[2:] :
+            if column in PHASES :
+                line = line + " %11.4f" % result['phases'][column]
+            else :
+                line = line + " %11.4f" % result['scripts'][column]
+        line = line + " %11.3f" % (
+            1E6 * result['phases']['aggregate'] /
+            max(result['counters']['segments'], 1)
+        )
+        line = line + " %11d %11d" % (
+            result['memory']['lists'] // 1000, result['memory']['model'] // 1000
+        )
+        print(line)
+
+# ==============================================================================
+# main script
+#
+if __name__ == '__main__' :
+                                                             # specify arguments
+    parser = argparse.ArgumentParser(
+      description='Measure the conversion scripts on synthetic designs'
+    )
+                                                               # swept parameter
+    parser.add_argument(
+        '-x', '--sweep', default='nets=10,100,1000,10000',
+        help = 'swept generator parameter and its values, as in nets=10,100'
+    )
+                                                          # generator parameters
+    parser.add_argument(
+        '-i', '--instances', type=int, default=10,
+        help = 'number of instances per schematic'
+    )
+    parser.add_argument(
+        '-n', '--nets', type=int, default=10,
+        help = 'number of nets per schematic'
+    )
+    parser.add_argument(
+        '-w', '--width', type=int, default=8,
+        help = 'data bus width'
+    )
+    parser.add_argument(
+        '-d', '--depth', type=int, default=1,
+        help = 'number of hierarchy levels above the leaf cell'
+    )
+    parser.add_argument(
+        '-f', '--fanout', type=int, default=1,
+        help = 'number of loads per net'
+    )
+                                                                   # repetitions
+    parser.add_argument(
+        '-r', '--repeat', type=int, default=3,
+        help = 'number of runs per measure, the best one is kept'
+    )
+                                                             # scratch directory
+    parser.add_argument(
+        '-s', '--scratch', default='/tmp',
+        help = 'scratch directory'
+    )
+                                                                   # output file
+    parser.add_argument(
+        '-o', '--output', default='benchmark.json',
+        help = 'JSON results file'
+    )
+                                                             # process arguments
+    parser_arguments = parser.parse_args()
+
+    (sweep_name, sweep_values) = parser_arguments.sweep.split('=', 1)
+    if sweep_name not in GENERATOR_PARAMETERS :
+        print("unknown parameter %s, use one of %s" % (
+            sweep_name, ', '.join(GENERATOR_PARAMETERS)
+        ))
+        sys.exit(1)
+    sweep_values = [int(value) for value in sweep_values.split(',')]
+    repeat = max(parser_arguments.repeat, 1)
+    scratch_directory = parser_arguments.scratch
+    if not os.path.isdir(scratch_directory) :
+        print("scratch directory %s not found" % scratch_directory)
+        sys.exit(1)
+                                                                # run benchmarks
+    results = []
+    for sweep_value in sweep_values :
+        parameters = {}
+        for name in GENERATOR_PARAMETERS :
+            parameters[name] = getattr(parser_arguments, name)
+        parameters[sweep_name] = sweep_value
+        print("%s = %d" % (sweep_name, sweep_value))
+        results.append(
+            run_benchmark(parameters, scratch_directory, repeat)
+        )
+                                                                 # write results
+    output_file = open(parser_arguments.output, 'w')
+    json.dump({
+        'version' : BENCHMARK_VERSION,
+        'python' : sys.version.split()[0],
+        'sweep' : sweep_name,
+        'results' : results
+    }, output_file, indent=1)
+    output_file.close()
+    print()
+    print_results(sweep_name, results)
@@ -0,0 +1,206 @@
+#! /usr/bin/env python3
+#
+# conversion_client.py
+#       Script to send conversion requests to the conversion server.
+#
+#   The client only imports what it needs to talk to the server, so that
+#   an editor hook calling it pays little more than the interpreter start.
+#   The protocol is one JSON request line answered by one JSON response
+#   line per connection.
+#
+#   If the server isn't running, symbols and schematics are converted by
+#   running sym2vhd.py or sch2vhd.py instead.
+#
+import os
+import sys
+import argparse
+import socket
+import json
+                                                                     # constants
+SOCKET_FILE_SPEC = "/tmp/vhdl_conversion-%d.sock" % os.getuid()
+                                                               # script location
+
+script_location = os.path.dirname(os.path.realpath(sys.argv[0]))
+
+# ==============================================================================
+# functions
+#
+# ------------------------------------------------------------------------------
+# send a message as a JSON line
+#
+def send_message(connection, message):
+    connection.sendall((json.dumps(message) + "\n").encode())
+
+# ------------------------------------------------------------------------------
+# receive a message sent as a JSON line
+#
+#   Returns None if the connection is closed before the end of the line.
+#
+def receive_message(connection):
+    data = b''
+    while not data.endswith(b"\n") :
+        chunk = connection.recv(65536)
+        if not chunk :
+            return(None)
+        data = data + chunk
+
+    return(json.loads(data.decode()))
+
+# ------------------------------------------------------------------------------
+# send a request to the server and wait for its response
+#
+#   Returns None if the server can't be reached.
+#
+def request(request_message, socket_file_spec=SOCKET_FILE_SPEC):
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try :
+        connection.connect(socket_file_spec)
+    except OSError :
+        connection.close()
+        return(None)
+    try :
+        send_message(connection, request_message)
+        response = receive_message(connection)
+    except OSError :
+        response = None
+    connection.close()
+
+    return(response)
+
+# ------------------------------------------------------------------------------
+# convert files without server
+#
+def convert_locally(file_specs, options):
+    succeeded = True
+    for (script_name, extension) in (('sym2vhd', '.sym'), ('sch2vhd', '.sch')) :
+        script_file_specs = []
+        for file_spec in file_specs :
+            if file_spec.endswith(extension) :
+                script_file_specs.append(file_spec)
+        if not script_file_specs :
+            continue
+        command_line = [
+            sys.executable, os.path.join(script_location, script_name + '.py'),
+            '-s', options['scratch']
+        ]
+        if options['library'] :
+            command_line = command_line + ['-l', options['library']]
+        if options['directory'] :
+            command_line = command_line + ['-d', options['directory']]
+        exit_status = os.spawnv(
+            os.P_WAIT, sys.executable, command_line + script_file_specs
+        )
+        if exit_status != 0 :
+            succeeded = False
+
+    return(succeeded)
+
+# ==============================================================================
+# main script
+#
+if __name__ == '__main__' :
+                                                             # specify arguments
+    parser = argparse.ArgumentParser(
+      description='Send conversion requests to the conversion server'
+    )
+                                                                   # input files
+    parser.add_argument(
+        'input_files', nargs='*',
+        help = 'symbol and schematics files to convert'
+    )
+                                                                  # VHDL library
+    parser.add_argument(
+        '-l', '--library',
+        help = 'VHDL library'
+    )
+                                                                # VHDL directory
+    parser.add_argument(
+        '-d', '--directory',
+        help = 'VHDL files directory'
+    )
+                                                             # scratch directory
+    parser.add_argument(
+        '-s', '--scratch', default='/tmp',
+        help = 'scratch directory'
+    )
+                                                                  # build design
+    parser.add_argument(
+        '-b', '--build', action='store_true',
+        help = 'build the design of the top level schematics file'
+    )
+                                                                    # gafrc file
+    parser.add_argument(
+        '-g', '--gafrc',
+        default = os.sep.join([script_location, '..', 'gafrc']),
+        help = 'gafrc (directory mappings) file, for builds'
+    )
+                                                               # query interface
+    parser.add_argument(
+        '-q', '--query',
+        help = 'print the interface of a converted symbol'
+    )
+                                                                 # server status
+    parser.add_argument(
+        '--status', action='store_true',
+        help = 'print the server state'
+    )
+                                                                   # stop server
+    parser.add_argument(
+        '--stop', action='store_true',
+        help = 'stop the server'
+    )
+                                                                   # socket file
+    parser.add_argument(
+        '-S', '--socket', default=SOCKET_FILE_SPEC,
+        help = 'server socket file'
+    )
+                                                             # process arguments
+    parser_arguments = parser.parse_args()
+    options = {
+        'library' : parser_arguments.library,
+        'directory' : parser_arguments.directory,
+        'scratch' : os.path.realpath(parser_arguments.scratch)
+    }
+    if options['directory'] :
+        options['directory'] = os.path.realpath(options['directory'])
+    file_specs = []
+    for file_spec in parser_arguments.input_files :
+        file_specs.append(os.path.realpath(file_spec))
+                                                                 # build request
+    if parser_arguments.stop :
+        request_message = {'command' : 'stop'}
+    elif parser_arguments.status :
+        request_message = {'command' : 'status'}
+    elif parser_arguments.query :
+        request_message = dict(
+            options, command='query', symbol=parser_arguments.query
+        )
+    elif parser_arguments.build :
+        if len(file_specs) != 1 :
+            print("a build needs one top level schematics file")
+            sys.exit(1)
+        request_message = dict(
+            options, command='build', file=file_specs[0],
+            gafrc=os.path.realpath(parser_arguments.gafrc)
+        )
+    elif file_specs :
+        request_message = dict(options, command='convert', files=file_specs)
+    else :
+        print("nothing to do")
+        sys.exit(1)
+                                                                  # send request
+    response = request(request_message, parser_arguments.socket)
+    if response is None :
+        if request_message['command'] == 'convert' :
+            if not convert_locally(file_specs, options) :
+                sys.exit(1)
+            sys.exit(0)
+        print("conversion server not running on %s" % parser_arguments.socket)
+        sys.exit(1)
+                                                                 # show response
+    if response.get('messages') :
+        print(response['messages'], end='')
+    if response.get('result') is not None :
+        print(json.dumps(response['result'], indent=1))
+    if not response.get('success') :
+        sys.exit(1)
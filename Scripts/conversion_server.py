@@ -0,0 +1,334 @@
+#! /usr/bin/env python3
+#
+# conversion_server.py
+#       Script serving symbol, schematics and design conversions on a UNIX
+#       socket.
+#
+#   The server keeps its state between requests:
+#     - the symbol interfaces, per scratch directory: a schematic is
+#       converted without reading the port locations of its symbols again,
+#     - the components of the schematics parsed by design builds.
+#   An interface is dropped from the cache when its port locations file
+#   changes, a schematic is parsed again when it changes.
+#
+#   Requests are served one at a time: a client that doesn't send its
+#   request within REQUEST_TIMEOUT seconds is dropped, as for a malformed
+#   request. Requests are JSON objects with a 'command' field:
+#     convert : convert the symbol and schematics 'files'
+#     build   : build the design of the top level schematics 'file'
+#     query   : return the ports of a 'symbol'
+#     status  : return the server state
+#     stop    : stop the server
+#   and the options 'library', 'directory', 'scratch', 'gafrc', 'force'.
+#   Responses have the fields 'success', 'messages' (the conversion
+#   output) and 'result'.
+#   See conversion_client.py for the protocol and the client.
+#
+import os
+import sys
+import argparse
+import socket
+import io
+import contextlib
+import time
+import geda
+import sym2vhd
+import sch2vhd
+import design2vhd
+import conversion_client
+                                                                     # constants
+REQUEST_TIMEOUT = 10
+                                                                  # server state
+state = {
+    'interfaces' : {},
+    'interface_times' : {},
+    'component_cache' : {},
+    'requests' : 0,
+    'start_time' : time.time()
+}
+
+# ==============================================================================
+# functions
+#
+# ------------------------------------------------------------------------------
+# find the modification time of a file
+#
+#   Returns None if the file doesn't exist.
+#
+def find_modification_time(file_spec):
+    try :
+        return(os.stat(file_spec).st_mtime_ns)
+    except OSError :
+        return(None)
+
+# ------------------------------------------------------------------------------
+# get the cached interfaces of a scratch directory
+#
+#   The interfaces whose port locations file has changed are removed.
+#
+def get_symbol_interfaces(scratch_directory):
+    symbol_interfaces = state['interfaces'].setdefault(scratch_directory, {})
+    interface_times = \
+        state['interface_times'].setdefault(scratch_directory, {})
+    for symbol_name in list(symbol_interfaces) :
+        modification_time = find_modification_time(
+            sch2vhd.find_port_locations_file_spec(
+                symbol_name, scratch_directory
+            )
+        )
+        if modification_time != interface_times.get(symbol_name) :
+            del symbol_interfaces[symbol_name]
+            interface_times.pop(symbol_name, None)
+
+    return(symbol_interfaces)
+
+# ------------------------------------------------------------------------------
+# store the port locations file times of the cached interfaces
+#
+def store_interface_times(scratch_directory):
+    interface_times = state['interface_times'][scratch_directory]
+    for symbol_name in state['interfaces'][scratch_directory] :
+        interface_times[symbol_name] = find_modification_time(
+            sch2vhd.find_port_locations_file_spec(
+                symbol_name, scratch_directory
+            )
+        )
+
+# ------------------------------------------------------------------------------
+# convert symbols and schematics
+#
+#   The symbols are converted first, so that the schematics use their
+#   new interfaces.
+#
+def convert_files(request_message):
+    scratch_directory = request_message.get('scratch', '/tmp')
+    symbols = []
+    schematics = []
+    failed_files = []
+    for file_spec in request_message.get('files', []) :
+        if file_spec.endswith('.sym') :
+            symbols.append(file_spec)
+        elif file_spec.endswith('.sch') :
+            schematics.append(file_spec)
+        else :
+            print("%s is neither a symbol nor a schematics file" % file_spec)
+            failed_files.append(file_spec)
+    conversion_options = {
+        'VHDL_library' : request_message.get('library'),
+        'VHDL_directory' : request_message.get('directory'),
+        'scratch_directory' : scratch_directory,
+        'symbol_interfaces' : get_symbol_interfaces(scratch_directory)
+    }
+    failed_files = failed_files + geda.convert_batch(
+        sym2vhd.convert_symbol, symbols, conversion_options
+    )
+    failed_files = failed_files + geda.convert_batch(
+        sch2vhd.convert_schematic, schematics, conversion_options
+    )
+    store_interface_times(scratch_directory)
+    if len(symbols) + len(schematics) > 1 :
+        geda.print_batch_summary(symbols + schematics, failed_files)
+
+    return(not failed_files, None)
+
+# ------------------------------------------------------------------------------
+# build a design
+#
+def build_design(request_message):
+    top_architecture_file_spec = request_message['file']
+    gafrc_file_spec = request_message['gafrc']
+    scratch_directory = request_message.get('scratch', '/tmp')
+    (top_symbol_file_spec, compile_list_file_spec, manifest_file_spec) = \
+        design2vhd.find_design_file_specs(
+            top_architecture_file_spec, scratch_directory
+        )[:3]
+                                                               # validity checks
+    for (description, file_spec) in (
+        ('schematics', top_architecture_file_spec),
+        ('symbol', top_symbol_file_spec),
+        ('paths', gafrc_file_spec)
+    ) :
+        if not os.path.isfile(file_spec) :
+            print("%s file %s not found" % (description, file_spec))
+            return(False, None)
+    if not os.path.isdir(scratch_directory) :
+        print("scratch directory %s not found" % scratch_directory)
+        return(False, None)
+                                                                         # build
+    print("Converting %s to VHDL" % top_architecture_file_spec)
+    conversion_options = {
+        'VHDL_library' : request_message.get('library'),
+        'VHDL_directory' : request_message.get('directory'),
+        'scratch_directory' : scratch_directory
+    }
+    (hierarchy, conversion_succeeded, library_paths) = \
+        design2vhd.build_design(
+            top_symbol_file_spec, top_architecture_file_spec,
+            gafrc_file_spec, manifest_file_spec, compile_list_file_spec,
+            conversion_options, 1, request_message.get('force', False),
+            state['component_cache']
+        )
+    if not hierarchy :
+        return(False, None)
+
+    return(conversion_succeeded, {'compile_list' : compile_list_file_spec})
+
+# ------------------------------------------------------------------------------
+# find the interface of a symbol
+#
+#   The interface is the one of the port locations file: its ports, but
+#   not the generics, which are only known when the symbol is converted.
+#
+def query_interface(request_message):
+    scratch_directory = request_message.get('scratch', '/tmp')
+    symbol_name = os.path.basename(request_message['symbol'])
+    if symbol_name.endswith('.sym') :
+        symbol_name = symbol_name[:-len('.sym')]
+    interface = sch2vhd.find_symbol_interface(
+        symbol_name, get_symbol_interfaces(scratch_directory),
+        scratch_directory
+    )
+    store_interface_times(scratch_directory)
+    if not interface :
+        return(False, None)
+    ports = []
+    for port in interface.ports :
+        ports.append({
+            'name' : port.name,
+            'type' : port.type,
+            'range' : port.range,
+            'direction' : port.direction,
+            'location' : [port.x, port.y]
+        })
+
+    return(True, {
+        'name' : interface.name,
+        'ports' : ports
+    })
+
+# ------------------------------------------------------------------------------
+# describe the server state
+#
+def find_status(request_message):
+    interface_count = 0
+    for symbol_interfaces in state['interfaces'].values() :
+        interface_count = interface_count + len(symbol_interfaces)
+
+    return(True, {
+        'pid' : os.getpid(),
+        'uptime' : time.time() - state['start_time'],
+        'requests' : state['requests'],
+        'interfaces' : interface_count,
+        'schematics' : len(state['component_cache'])
+    })
+
+# ------------------------------------------------------------------------------
+# serve a request
+#
+#   The output of the conversions is returned in the response.
+#   Any error of a handler is reported in the response: a malformed
+#   request or a bad file doesn't stop the server.
+#
+def serve_request(request_message):
+    state['requests'] = state['requests'] + 1
+    handlers = {
+        'convert' : convert_files,
+        'build' : build_design,
+        'query' : query_interface,
+        'status' : find_status
+    }
+    messages = io.StringIO()
+    success = False
+    result = None
+    with contextlib.redirect_stdout(messages) :
+        command = request_message.get('command')
+        if command in handlers :
+            try :
+                (success, result) = handlers[command](request_message)
+            except Exception as error :
+                print("error serving %s : %s: %s" % (
+                    command, type(error).__name__, error
+                ))
+        else :
+            print("unknown command %s" % command)
+
+    return({
+        'success' : success,
+        'messages' : messages.getvalue(),
+        'result' : result
+    })
+
+# ==============================================================================
+# main script
+#
+if __name__ == '__main__' :
+                                                             # specify arguments
+    parser = argparse.ArgumentParser(
+      description='Serve gEDA to VHDL conversions on a UNIX socket'
+    )
+                                                                   # socket file
+    parser.add_argument(
+        '-S', '--socket', default=conversion_client.SOCKET_FILE_SPEC,
+        help = 'server socket file'
+    )
+                                                                # verbose output
+    parser.add_argument(
+        '-v', '--verbose', action='store_true',
+        help = 'display the requests and their service time'
+    )
+                                                             # process arguments
+    parser_arguments = parser.parse_args()
+    socket_file_spec = parser_arguments.socket
+    verbose = parser_arguments.verbose
+                                                           # remove stale socket
+    if os.path.exists(socket_file_spec) :
+        if conversion_client.request(
+            {'command' : 'status'}, socket_file_spec
+        ) is not None :
+            print("conversion server already running on %s" % socket_file_spec)
+            sys.exit(1)
+        os.remove(socket_file_spec)
+                                                                   # open socket
+    server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server_socket.bind(socket_file_spec)
+    os.chmod(socket_file_spec, 0o600)
+    server_socket.listen(8)
+    print("serving conversions on %s" % socket_file_spec)
+                                                                # serve requests
+    running = True
+    try :
+        while running :
+            (connection, address) = server_socket.accept()
+            start_time = time.perf_counter()
+                                        # a silent client is a malformed request
+            connection.settimeout(REQUEST_TIMEOUT)
+            try :
+                request_message = conversion_client.receive_message(connection)
+            except (OSError, ValueError) :
+                request_message = None
+            if not isinstance(request_message, dict) :
+                connection.close()
+                continue
+            if request_message.get('command') == 'stop' :
+                response = {'success' : True, 'messages' : '', 'result' : None}
+                running = False
+            else :
+                response = serve_request(request_message)
+            try :
+                conversion_client.send_message(connection, response)
+            except OSError :
+                pass
+            connection.close()
+            if verbose :
+                outcome = 'done'
+                if not response['success'] :
+                    outcome = 'failed'
+                print("%-8s %-6s %8.1f ms" % (
+                    request_message.get('command'), outcome,
+                    1000 * (time.perf_counter() - start_time)
+                ))
+    except KeyboardInterrupt :
+        print()
+                                                                  # close socket
+    server_socket.close()
+    os.remove(socket_file_spec)
@@ -9,88 +9,32 @@ import os
 import sys
 import argparse
 import re
+import io
+import contextlib
+import concurrent.futures
+import json
+import functools
+import time
+import subprocess
+import geda
+import sym2vhd
+import sch2vhd
+import elaboration
+import profiling
                                                                      # constants
 INDENT = 2 * ' '
+MANIFEST_VERSION = 1
                                                                # script location
 
 script_location = os.path.dirname(os.path.realpath(sys.argv[0]))
 
-# ==============================================================================
-# command line arguments
-#
-                                                             # specify arguments
-parser = argparse.ArgumentParser(
-  description='Convert a gEDA symbol to a VHDL entity'
-)
-                                                                    # input file
-parser.add_argument('input_file')
-                                                                    # gafrc file
-parser.add_argument(
-    '-g', '--gafrc', default = os.sep.join([script_location, '..', 'gafrc']),
-    help = 'gafrc (directory mappings) file'
-)
-                                                                  # VHDL library
-parser.add_argument(
-    '-l', '--library',
-    help = 'VHDL library'
-)
-                                                                # VHDL directory
-parser.add_argument(
-    '-d', '--directory',
-    help = 'VHDL files directory'
-)
-                                                             # scratch directory
-parser.add_argument(
-    '-s', '--scratch', default='/tmp',
-    help = 'scratch directory'
-)
-                                                                # verbose output
-parser.add_argument(
-    '-v', '--verbose', action='store_true',
-    help = 'Verbose display'
-)
-                                                             # process arguments
-parser_arguments = parser.parse_args()
-
-top_architecture_file_spec = os.path.realpath(parser_arguments.input_file)
-gafrc_file_spec = parser_arguments.gafrc
-VHDL_directory = parser_arguments.directory
-scratch_directory = parser_arguments.scratch
-verbose = parser_arguments.verbose
-
-VHDL_library = parser_arguments.library
-vhdl_file_path = VHDL_directory
-
-top_architecture = top_architecture_file_spec.split(os.sep)[-1]
-top_architecture = '.'.join(top_architecture.split('.')[:-1])
-compile_list_file_spec = os.path.join(
-    scratch_directory, top_architecture + '-compile_list.txt'
-)
-
-top_symbol_file_spec = top_architecture_file_spec.replace(
-    'Schematics', 'Symbols'
-)
-top_symbol_file_spec = '-'.join(top_symbol_file_spec.split('-')[:-1]) + '.sym'
-                                                               # validity checks
-if not os.path.isfile(top_architecture_file_spec) :
-    print("schematics file %s not found" % top_architecture_file_spec)
-    quit()
-
-if not os.path.isfile(top_symbol_file_spec) :
-    print("symbol file %s not found" % top_symbol_file_spec)
-    quit()
-
-if not os.path.isdir(scratch_directory) :
-    print("scratch directory %s not found" % scratch_directory)
-    quit()
-
 # ==============================================================================
 # functions
 #
 # ------------------------------------------------------------------------------
 # find symbol and component paths
 #
-def find_paths():
+def find_paths(gafrc_file_spec, verbose=False):
                                                                     # parse file
     symbol_paths = []
     schematics_paths = []
@@ -113,16 +57,19 @@ def find_paths():
             line = ''
         if line :
                                                              # apply definitions
-            for definition in definitions :
-                line = re.sub(definition[0], definition[1], line)
+            for (name, value) in definitions :
+                if name in line :
+                    line = line.replace(name, value)
                                                               # find definitions
             if line.startswith('define ') :
-                definition = line.split(' ', 3)[1:]
+                definition = line.split(' ', 2)[1:]
                 if verbose :
                     print(INDENT + "%s = %s" % (definition[0], definition[1]))
                 definitions.append(definition)
                                                                    # build paths
-            match_list = re.search('\(build-path .*\)', line)
+            match_list = None
+            if '(build-path ' in line :
+                match_list = re.search('\(build-path .*\)', line)
             while match_list :
                 sub_target = '\\' + match_list.group()[:-1] + '\\)'
                 path_to_build = \
@@ -147,172 +94,983 @@ def find_paths():
 
     return(symbol_paths, schematics_paths)
 
+# ------------------------------------------------------------------------------
+# list the files of library directories
+#
+#   Each directory is listed once. The listings are cached in the scratch
+#   directory and a listing is reused as long as the modification time of
+#   its directory is unchanged.
+#
+def list_library_directories(library_paths, cache_file_spec):
+                                                                    # read cache
+    cached_listings = {}
+    if os.path.isfile(cache_file_spec) :
+        cache_file = open(cache_file_spec, 'r')
+        try :
+            cached_listings = json.load(cache_file)
+        except ValueError :
+            cached_listings = {}
+        cache_file.close()
+                                                              # list directories
+    listings = {}
+    cache_changed = False
+    for library_path in library_paths :
+        if library_path in listings :
+            continue
+        try :
+            modification_time = os.stat(library_path).st_mtime_ns
+        except OSError :
+            listings[library_path] = {'time' : 0, 'files' : []}
+            continue
+        cached_listing = cached_listings.get(library_path, {})
+        if cached_listing.get('time') == modification_time :
+            listings[library_path] = cached_listing
+        else :
+            file_names = []
+            for directory_entry in os.scandir(library_path) :
+                if directory_entry.is_file() :
+                    file_names.append(directory_entry.name)
+            listings[library_path] = {
+                'time' : modification_time,
+                'files' : sorted(file_names)
+            }
+            cache_changed = True
+                                                                   # write cache
+    if cache_changed :
+        cached_listings.update(listings)
+        cache_file = open(cache_file_spec, 'w')
+        json.dump(cached_listings, cache_file)
+        cache_file.close()
+
+    return(listings)
+
+# ------------------------------------------------------------------------------
+# index the files of library directories by name
+#
+#   The libraries are scanned in the order of the gafrc file and the last
+#   library containing a file wins, as with the former lookup which tested
+#   every library in turn.
+#
+def index_library_files(library_paths, listings):
+    library_index = {}
+    for library_path in library_paths :
+        for file_name in listings[library_path]['files'] :
+            library_index[file_name] = os.sep.join([library_path, file_name])
+
+    return(library_index)
+
 # ------------------------------------------------------------------------------
 # find components in a schematic
 #
-def find_components(schematics_file_spec):
+#   Only the components with a source are returned, together with the
+#   number of nets of the schematic.
+#   Returns None if the schematic is not found.
+#
+def find_components(
+    schematics_file_spec, scratch_directory, use_netlist=True, verbose=False
+):
                                                                 # validity check
     if not os.path.isfile(schematics_file_spec) :
         print("schematics file %s not found" % schematics_file_spec)
-        quit()
+        return(None)
     if verbose :
         print(INDENT + schematics_file_spec.split(os.sep)[-1])
-                                                                    # parse file
+                                                         # read netlist or parse
     components = []
-    search_for_component_info = False
-    line = ' '
-    schematics_file = open(schematics_file_spec, 'r')
-    while line :
-        line = schematics_file.readline().rstrip("\r\n")
-        if search_for_component_info:
-            if line.startswith('source=') :
-                component_source = line.split('=')[-1]
-                if verbose :
-                    print(3*INDENT + component_source)
-            elif line.startswith('}') :
-                if component_source :
-                    components.append(component_symbol)
-                    components.append(component_source)
-                search_for_component_info = False
-        elif line.startswith('C ') :
-            component_symbol = line.split(' ')[-1]
-            component_source = ''
+    (schematics_components, summary) = sch2vhd.read_components(
+        schematics_file_spec, scratch_directory, use_netlist
+    )
+    for component in schematics_components :
+        if verbose :
+            print(2*INDENT + component.symbol)
+        if component.source :
             if verbose :
-                print(2*INDENT + component_symbol)
-            search_for_component_info = True
-    schematics_file.close()
+                print(3*INDENT + component.source)
+            components.append(component)
 
-    return(components)
+    return(components, summary['nets'])
 
-# ==============================================================================
-# main script
+# ------------------------------------------------------------------------------
+# convert a symbol or a schematic, capturing its messages
 #
-print("Converting %s to VHDL" % top_architecture_file_spec)
+#   The warnings of a conversion are collected in the 'warnings' list of
+#   its options, if it has one. Also returns the profile events and
+#   counters of the conversion, for conversions run in another process.
+#
+def run_conversion(conversion, file_spec, conversion_options, profile=False):
+    if profile :
+        profiling.enable()
+    profile_start = profiling.snapshot()
+    messages = io.StringIO()
+    with contextlib.redirect_stdout(messages) :
+        with profiling.phase(
+            "convert %s" % os.path.basename(file_spec), 'conversion'
+        ) :
+            success = conversion(file_spec, **conversion_options)
+    (events, counters) = profiling.changes_since(profile_start)
+
+    return(
+        success, messages.getvalue(), conversion_options.get('warnings', []),
+        events, counters
+    )
 
 # ------------------------------------------------------------------------------
-                                                                    # file paths
-if not os.path.isfile(gafrc_file_spec) :
-    print("paths file %s not found" % gafrc_file_spec)
-    quit()
-if verbose :
-    print("\nreading %s" % gafrc_file_spec)
-(symbol_paths, schematics_paths) = find_paths()
-vhdl_paths = []
-for schematics_path in schematics_paths :
-    vhdl_paths.append(schematics_path.replace('Schematics', 'Description'))
+# read the build manifest
+#
+#   The manifest is discarded when it has been written by another version
+#   or with other build settings (gafrc content, VHDL library, directory).
+#
+def read_manifest(manifest_file_spec, build_settings):
+    manifest = {
+        'version' : MANIFEST_VERSION,
+        'settings' : build_settings,
+        'symbols' : {},
+        'schematics' : {}
+    }
+    if os.path.isfile(manifest_file_spec) :
+        manifest_file = open(manifest_file_spec, 'r')
+        try :
+            stored_manifest = json.load(manifest_file)
+        except ValueError :
+            stored_manifest = {}
+        manifest_file.close()
+        if \
+            (stored_manifest.get('version') == MANIFEST_VERSION) and \
+            (stored_manifest.get('settings') == build_settings)      \
+        :
+            manifest['symbols'] = stored_manifest.get('symbols', {})
+            manifest['schematics'] = stored_manifest.get('schematics', {})
+
+    return(manifest)
 
 # ------------------------------------------------------------------------------
-                                                                   # parse files
-if verbose :
-    print("\nbuilding component list")
-
-compile_files = [top_symbol_file_spec, top_architecture_file_spec]
-configurations = []
-to_parse = [top_architecture_file_spec]
-symbols_to_convert = [top_symbol_file_spec]
-schematics_to_convert = [top_architecture_file_spec]
-while to_parse :
+# write the build manifest
+#
+def write_manifest(manifest_file_spec, manifest):
+    manifest_file = open(manifest_file_spec, 'w')
+    json.dump(manifest, manifest_file, indent=1, sort_keys=True)
+    manifest_file.close()
+
+# ------------------------------------------------------------------------------
+# hash the port tables of a list of symbols
+#
+def hash_interfaces(symbols, conversion_options):
+    interfaces = {}
+    for symbol in symbols :
+        port_locations_file_spec = sym2vhd.find_file_specs(
+            symbol,
+            conversion_options['VHDL_directory'],
+            conversion_options['scratch_directory']
+        )[-1]
+        interfaces[symbol] = geda.hash_file(port_locations_file_spec)
+
+    return(interfaces)
+
+# ------------------------------------------------------------------------------
+# test if a symbol has to be converted
+#
+#   The symbol's hash is taken before the conversion, so that a file saved
+#   during a build still differs from the manifest entry afterwards.
+#
+def symbol_is_stale(symbol, manifest, input_hashes, conversion_options):
+    symbol_entry = manifest['symbols'].get(symbol)
+    if not symbol_entry :
+        return(True)
+    if symbol_entry['hash'] != input_hashes[symbol] :
+        return(True)
+    vhdl_file_spec = sym2vhd.find_file_specs(
+        symbol, conversion_options['VHDL_directory']
+    )[1]
+    if not os.path.isfile(vhdl_file_spec) :
+        return(True)
+    interfaces = hash_interfaces([symbol], conversion_options)
+
+    return(symbol_entry['interface'] != interfaces[symbol])
+
+# ------------------------------------------------------------------------------
+# test if a schematic has to be converted
+#
+#   A schematic is also stale when the port table of one of the symbols
+#   it instantiates has changed since its last conversion.
+#
+def schematic_is_stale(
+    schematics, manifest, input_hashes, schematic_symbols, conversion_options
+):
+    schematics_entry = manifest['schematics'].get(schematics)
+    if not schematics_entry :
+        return(True)
+    if schematics_entry['hash'] != input_hashes[schematics] :
+        return(True)
+    vhdl_file_spec = sch2vhd.find_file_specs(
+        schematics, conversion_options['VHDL_directory']
+    )[-1]
+    if not os.path.isfile(vhdl_file_spec) :
+        return(True)
+    interfaces = hash_interfaces(
+        schematic_symbols.get(schematics, []), conversion_options
+    )
+
+    return(schematics_entry['interfaces'] != interfaces)
+
+# ------------------------------------------------------------------------------
+# convert symbols and then schematics one at a time
+#
+def convert_serially(
+    symbols_to_convert, schematics_to_convert, conversion_options,
+    needs_conversion=None, verbose=False
+):
+    conversion_results = {}
+                                   # share symbol interfaces between conversions
+    conversion_options = dict(conversion_options, symbol_interfaces={})
+                                                               # convert symbols
+    if verbose :
+        print("\nconverting symbols")
+    for symbol in symbols_to_convert :
+        if verbose :
+            print(INDENT + symbol)
+        conversion_results[symbol] = run_conversion(
+            sym2vhd.convert_symbol, symbol, conversion_options
+        )[:3]
+                                                            # convert schematics
+    if verbose :
+        print("\nconverting schematics")
+    for schematics in schematics_to_convert :
+        if needs_conversion and not needs_conversion(schematics) :
+            if verbose :
+                print(INDENT + "%s is up to date" % schematics)
+            continue
+        if verbose :
+            print(INDENT + schematics)
+        conversion_results[schematics] = run_conversion(
+            sch2vhd.convert_schematic, schematics,
+            dict(conversion_options, warnings=[])
+        )[:3]
+
+    return(conversion_results)
+
+# ------------------------------------------------------------------------------
+# convert symbols and schematics on a process pool
+#
+#   A schematic is submitted as soon as the symbols it instantiates
+#   have been converted.
+#
+def convert_in_parallel(
+    symbols_to_convert, schematics_to_convert, schematic_symbols,
+    conversion_options, jobs, needs_conversion=None, verbose=False
+):
+    with concurrent.futures.ProcessPoolExecutor(jobs or None) as pool :
+                                                               # convert symbols
+        if verbose :
+            print("\nconverting symbols")
+        symbol_conversions = {}
+        for symbol in symbols_to_convert :
+            if symbol not in symbol_conversions :
+                if verbose :
+                    print(INDENT + symbol)
+                symbol_conversions[symbol] = pool.submit(
+                    run_conversion,
+                    sym2vhd.convert_symbol, symbol, conversion_options,
+                    profiling.is_enabled()
+                )
+                                                            # convert schematics
+        if verbose :
+            print("\nconverting schematics")
+        schematic_conversions = {}
+        pending_schematics = []
+        for schematics in schematics_to_convert :
+            if schematics not in pending_schematics :
+                pending_schematics.append(schematics)
+        while pending_schematics :
+            for schematics in pending_schematics.copy() :
+                symbols_ready = True
+                for symbol in schematic_symbols.get(schematics, []) :
+                    if symbol in symbol_conversions :
+                        if not symbol_conversions[symbol].done() :
+                            symbols_ready = False
+                if not symbols_ready :
+                    continue
+                pending_schematics.remove(schematics)
+                if needs_conversion and not needs_conversion(schematics) :
+                    if verbose :
+                        print(INDENT + "%s is up to date" % schematics)
+                    continue
+                if verbose :
+                    print(INDENT + schematics)
+                schematic_conversions[schematics] = pool.submit(
+                    run_conversion,
+                    sch2vhd.convert_schematic, schematics,
+                    dict(conversion_options, warnings=[]),
+                    profiling.is_enabled()
+                )
+            if pending_schematics :
+                running_conversions = []
+                for conversion in symbol_conversions.values() :
+                    if not conversion.done() :
+                        running_conversions.append(conversion)
+                concurrent.futures.wait(
+                    running_conversions,
+                    return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                                                               # collect results
+        conversion_results = {}
+        for (file_spec, conversion) in \
+            list(symbol_conversions.items()) + \
+            list(schematic_conversions.items()) \
+        :
+            try :
+                (success, messages, warnings, events, counters) = \
+                    conversion.result()
+                conversion_results[file_spec] = (success, messages, warnings)
+                profiling.merge(events, counters)
+            except Exception as error :
+                conversion_results[file_spec] = (False, "%s\n" % error, [])
+
+    return(conversion_results)
+
+# ------------------------------------------------------------------------------
+# index the symbol, schematics and VHDL libraries listed in a gafrc file
+#
+def index_libraries(gafrc_file_spec, scratch_directory, verbose=False):
+    if verbose :
+        print("\nreading %s" % gafrc_file_spec)
+    (symbol_paths, schematics_paths) = find_paths(gafrc_file_spec, verbose)
+    vhdl_paths = []
+    for schematics_path in schematics_paths :
+        vhdl_paths.append(schematics_path.replace('Schematics', 'Description'))
+    library_paths = symbol_paths + schematics_paths + vhdl_paths
+    listings = list_library_directories(
+        library_paths,
+        os.path.join(scratch_directory, 'design2vhd-library_listings.json')
+    )
+    library_indexes = {
+        'symbols' : index_library_files(symbol_paths, listings),
+        'schematics' : index_library_files(schematics_paths, listings),
+        'vhdl' : index_library_files(vhdl_paths, listings)
+    }
+
+    return(library_indexes, library_paths)
+
+# ------------------------------------------------------------------------------
+# find the files of the design hierarchy
+#
+#   The components of each schematic are cached together with the
+#   schematic's modification time: a schematic is only parsed again
+#   when it has changed. Without use_netlists, the cached components and
+#   the stored netlists are ignored and all schematics are parsed.
+#   The elaborated hierarchy is built along, with one unit per schematic
+#   or VHDL file.
+#   Returns None if a component or schematics file is not found.
+#
+def find_hierarchy(
+    top_symbol_file_spec, top_architecture_file_spec, library_indexes,
+    component_cache, scratch_directory, use_netlists=True, verbose=False
+):
+    compile_files = [top_symbol_file_spec, top_architecture_file_spec]
+    configurations = []
+    to_parse = [top_architecture_file_spec]
+    symbols_to_convert = [top_symbol_file_spec]
+    schematics_to_convert = [top_architecture_file_spec]
+    schematic_symbols = {}
+    library_files = {}
+    listed_files = set(compile_files)
+    top_unit = elaboration.DesignUnit(
+        os.path.basename(top_architecture_file_spec)[:-len('.sch')],
+        os.path.basename(top_symbol_file_spec)[:-len('.sym')],
+        top_architecture_file_spec
+    )
+    design_tree = elaboration.Hierarchy(top_unit)
+    parse_index = 0
+    while parse_index < len(to_parse) :
+        schematics = to_parse[parse_index]
+        parse_index = parse_index + 1
                                                                # parse component
-    components = find_components(to_parse[0])
+        if not os.path.isfile(schematics) :
+            print("schematics file %s not found" % schematics)
+            return(None)
+        modification_time = os.stat(schematics).st_mtime_ns
+        if schematics in component_cache :
+            if \
+                (component_cache[schematics][0] != modification_time) or \
+                not use_netlists                                          \
+            :
+                del component_cache[schematics]
+        if schematics not in component_cache :
+            profiling.count('schematics parsed')
+            schematics_components = find_components(
+                schematics, scratch_directory, use_netlists, verbose
+            )
+            if schematics_components is None :
+                return(None)
+            component_cache[schematics] = (
+                modification_time, schematics_components
+            )
+        (components, net_count) = component_cache[schematics][1]
+        schematic_symbols[schematics] = []
+        unit = design_tree.units[schematics]
+        unit.net_count = net_count
+        component_files = []
+        for component in components :
+            component_files.append(component.symbol)
+            component_files.append(component.source)
                                                     # prepare vhdl configuration
-    configuration_component = to_parse[0].split(os.sep)[-1].rstrip('.sch')
-    configuration_component_list = configuration_component.split('-')
-    configuration_architecture = configuration_component_list[-1]
-    configuration_component = '_'.join(configuration_component_list[:-1])
-    configuration_components = []
-    for component in components :
-        if component.endswith('.sch') or component.endswith('.vhd') :
-            component = component.rstrip('.sch')
-            component = component.rstrip('.vhd')
-            component_list = component.split('-')
-            component_architecture = component_list[-1]
-            component = '_'.join(component_list[:-1])
-            configurations.append([
-                configuration_component, configuration_architecture,
-                component, component_architecture
-            ])
-
-    for component in components :
+        configuration_component = schematics.split(os.sep)[-1].rstrip('.sch')
+        configuration_component_list = configuration_component.split('-')
+        configuration_architecture = configuration_component_list[-1]
+        configuration_component = '_'.join(configuration_component_list[:-1])
+        for component in component_files :
+            if component.endswith('.sch') or component.endswith('.vhd') :
+                component = component.rstrip('.sch')
+                component = component.rstrip('.vhd')
+                component_list = component.split('-')
+                component_architecture = component_list[-1]
+                component = '_'.join(component_list[:-1])
+                configuration = [
+                    configuration_component, configuration_architecture,
+                    component, component_architecture
+                ]
+                if configuration not in configurations :
+                    configurations.append(configuration)
+
+        for component in component_files :
+                                                             # find library file
+            profiling.count('component lookups')
+            if component not in library_files :
+                profiling.count('library file lookups')
+                if component.endswith('.sym') :
+                    library_index = library_indexes['symbols']
+                elif component.endswith('.sch') :
+                    library_index = library_indexes['schematics']
+                else :
+                    library_index = library_indexes['vhdl']
+                library_files[component] = library_index.get(component, '')
+                if not library_files[component] :
+                    if component.endswith('.sym') :
+                        print("symbol file %s not found" % component)
+                    elif component.endswith('.sch') :
+                        print("schematics file %s not found" % component)
+                    else :
+                        print("vhdl file %s not found" % component)
+                    return(None)
+            file_spec = library_files[component]
                                                            # update symbols list
-        if component.endswith('.sym') :
-            symbol_file_spec = ''
-            for symbol_path in symbol_paths :
-                test_spec = os.sep.join([symbol_path, component])
-                if os.path.isfile(test_spec) :
-                    symbol_file_spec = test_spec
-            if symbol_file_spec :
-                symbols_to_convert.append(symbol_file_spec)
-                compile_files.append(symbol_file_spec)
-            else :
-                print("symbol file %s not found" % component)
-                quit()
+            if component.endswith('.sym') :
+                if file_spec not in schematic_symbols[schematics] :
+                    schematic_symbols[schematics].append(file_spec)
+                if file_spec not in listed_files :
+                    symbols_to_convert.append(file_spec)
                                                         # update schematics list
-        elif component.endswith('.sch') :
-            schematic_file_spec = ''
-            for schematics_path in schematics_paths :
-                test_spec = os.sep.join([schematics_path, component])
-                if os.path.isfile(test_spec) :
-                    schematic_file_spec = test_spec
-            if schematic_file_spec :
-                schematics_to_convert.append(schematic_file_spec)
-                compile_files.append(symbol_file_spec)
-                to_parse.append(schematic_file_spec)
+            elif component.endswith('.sch') :
+                if file_spec not in listed_files :
+                    schematics_to_convert.append(file_spec)
+                    to_parse.append(file_spec)
+                                                       # update compilation list
+            if file_spec not in listed_files :
+                listed_files.add(file_spec)
+                compile_files.append(file_spec)
+                                                           # elaborate instances
+        for component in components :
+            file_spec = library_files[component.source]
+            if file_spec in design_tree.units :
+                instance_unit = design_tree.units[file_spec]
             else :
-                print("schematics file %s not found" % component)
-                quit()
+                instance_unit = design_tree.add_unit(elaboration.DesignUnit(
+                    os.path.splitext(component.source)[0], component.name,
+                    file_spec
+                ))
+            design_tree.add_instance(unit, component.label, instance_unit)
+
+    return({
+        'compile_files' : compile_files,
+        'configurations' : configurations,
+        'symbols' : symbols_to_convert,
+        'schematics' : schematics_to_convert,
+        'schematic_symbols' : schematic_symbols,
+        'tree' : design_tree
+    })
+
+# ------------------------------------------------------------------------------
+# convert the stale symbols and schematics of a design hierarchy
+#
+#   Returns True if all conversions succeeded.
+#
+def update_design(
+    hierarchy, gafrc_file_spec, manifest_file_spec, conversion_options,
+    jobs=1, force=False, verbose=False
+):
+    symbols_to_convert = hierarchy['symbols']
+    schematics_to_convert = hierarchy['schematics']
+    schematic_symbols = hierarchy['schematic_symbols']
+                                                              # find stale files
+    build_settings = {
+        'gafrc' : geda.hash_file(gafrc_file_spec),
+        'VHDL_library' : conversion_options['VHDL_library'],
+        'VHDL_directory' : conversion_options['VHDL_directory']
+    }
+    manifest = read_manifest(manifest_file_spec, build_settings)
+    if force :
+        manifest['symbols'] = {}
+        manifest['schematics'] = {}
+                                        # hash the inputs before converting them
+    input_hashes = {}
+    with profiling.phase('hash inputs') :
+        for file_spec in symbols_to_convert + schematics_to_convert :
+            if file_spec not in input_hashes :
+                input_hashes[file_spec] = geda.hash_file(file_spec)
+    stale_symbols = []
+    checked_symbols = set()
+    with profiling.phase('find stale symbols') :
+        for symbol in symbols_to_convert :
+            if symbol not in checked_symbols :
+                checked_symbols.add(symbol)
+                if symbol_is_stale(
+                    symbol, manifest, input_hashes, conversion_options
+                ) :
+                    stale_symbols.append(symbol)
+                elif verbose :
+                    print(INDENT + "%s is up to date" % symbol)
+    profiling.count('symbols', len(checked_symbols))
+    profiling.count('stale symbols', len(stale_symbols))
+    profiling.count('schematics', len(set(schematics_to_convert)))
+    stale_schematic = functools.partial(
+        schematic_is_stale,
+        manifest=manifest,
+        input_hashes=input_hashes,
+        schematic_symbols=schematic_symbols,
+        conversion_options=conversion_options
+    )
+                                                          # convert design units
+    with profiling.phase('convert design units') :
+        if jobs == 1 :
+            conversion_results = convert_serially(
+                stale_symbols, schematics_to_convert, conversion_options,
+                stale_schematic, verbose
+            )
         else :
-            architecture_file_spec = ''
-            for vhdl_path in vhdl_paths :
-                test_spec = os.sep.join([vhdl_path, component])
-                if os.path.isfile(test_spec) :
-                    vhdl_file_spec = test_spec
-            if vhdl_file_spec :
-                compile_files.append(vhdl_file_spec)
+            conversion_results = convert_in_parallel(
+                stale_symbols, schematics_to_convert, schematic_symbols,
+                conversion_options, jobs, stale_schematic, verbose
+            )
+    profiling.count('conversions', len(conversion_results))
+                                                         # update build manifest
+    with profiling.phase('update manifest') :
+        for (file_spec, (success, messages, warnings)) in \
+            conversion_results.items() \
+        :
+            if file_spec.endswith('.sym') :
+                manifest['symbols'].pop(file_spec, None)
+                if success :
+                    manifest['symbols'][file_spec] = {
+                        'hash' : input_hashes[file_spec],
+                        'interface' : hash_interfaces(
+                            [file_spec], conversion_options
+                        )[file_spec]
+                    }
             else :
-                print("vhdl file %s not found" % component)
-                quit()
+                manifest['schematics'].pop(file_spec, None)
+                if success :
+                    manifest['schematics'][file_spec] = {
+                        'hash' : input_hashes[file_spec],
+                        'interfaces' : hash_interfaces(
+                            schematic_symbols.get(file_spec, []),
+                            conversion_options
+                        )
+                    }
+        write_manifest(manifest_file_spec, manifest)
+                                                    # report errors and warnings
+    conversion_failed = False
+    for file_spec in symbols_to_convert + schematics_to_convert :
+        (success, messages, warnings) = \
+            conversion_results.pop(file_spec, (True, '', []))
+        if not success :
+            print("conversion of %s failed" % file_spec)
+            print(messages, end='')
+            conversion_failed = True
+        elif warnings :
+            print("conversion of %s has warnings" % file_spec)
+            for warning in warnings :
+                print(warning)
 
-    to_parse.pop(0)
+    return(not conversion_failed)
 
 # ------------------------------------------------------------------------------
-                                                               # convert symbols
-if verbose :
-    print("\nconverting symbols")
-command = os.sep.join([script_location, 'sym2vhd.py'])
-if VHDL_library :
-    command = command + ' -l ' + VHDL_library
-if vhdl_file_path :
-    command = command + ' -d ' + vhdl_file_path
-for symbol in symbols_to_convert :
-    if verbose :
-        print(INDENT + symbol)
-    os.system("%s %s > /dev/null" % (command, symbol))
+# write the list of VHDL files to compile
+#
+def write_compile_list(compile_list_file_spec, compile_files, verbose=False):
+    compile_list_file = io.StringIO()
+    for compile_file in compile_files :
+        compile_file = compile_file.replace('Symbols', 'Description')
+        compile_file = compile_file.replace('Schematics', 'Description')
+        compile_file = compile_file.replace('.sym', '.vhd')
+        compile_file = compile_file.replace('.sch', '.vhd')
+        if verbose :
+            print(INDENT + compile_file)
+        compile_list_file.write("%s\n" % compile_file)
+    geda.write_file_if_changed(
+        compile_list_file_spec, compile_list_file.getvalue()
+    )
 
 # ------------------------------------------------------------------------------
-                                                            # convert schematics
-if verbose :
-    print("\nconverting schematics")
-command = os.sep.join([script_location, 'sch2vhd.py'])
-if VHDL_library :
-    command = command + ' -l ' + VHDL_library
-if vhdl_file_path :
-    command = command + ' -d ' + vhdl_file_path
-for schematics in schematics_to_convert :
-    if verbose :
-        print(INDENT + schematics)
-    os.system("%s %s > /dev/null" % (command, schematics))
+# find the files of a design build
+#
+#   The top level symbol is found from the top level schematic, the
+#   generated files are in the scratch directory.
+#
+def find_design_file_specs(top_architecture_file_spec, scratch_directory):
+    top_architecture = top_architecture_file_spec.split(os.sep)[-1]
+    top_architecture = '.'.join(top_architecture.split('.')[:-1])
+    compile_list_file_spec = os.path.join(
+        scratch_directory, top_architecture + '-compile_list.txt'
+    )
+    manifest_file_spec = os.path.join(
+        scratch_directory, top_architecture + '-manifest.json'
+    )
+    trace_file_spec = os.path.join(
+        scratch_directory, top_architecture + '-trace.json'
+    )
+    top_symbol_file_spec = top_architecture_file_spec.replace(
+        'Schematics', 'Symbols'
+    )
+    top_symbol_file_spec = \
+        '-'.join(top_symbol_file_spec.split('-')[:-1]) + '.sym'
+
+    return(
+        top_symbol_file_spec, compile_list_file_spec, manifest_file_spec,
+        trace_file_spec
+    )
 
 # ------------------------------------------------------------------------------
+# build a design: find its hierarchy, convert it and write its compile list
+#
+#   Returns the design hierarchy (None if it is incomplete), the success
+#   of the conversions and the library directories.
+#
+def build_design(
+    top_symbol_file_spec, top_architecture_file_spec, gafrc_file_spec,
+    manifest_file_spec, compile_list_file_spec, conversion_options,
+    jobs=1, force=False, component_cache=None, verbose=False
+):
+    gafrc_modification_time = find_modification_times([gafrc_file_spec])
+                                                               # index libraries
+    with profiling.phase('index libraries') :
+        (library_indexes, library_paths) = index_libraries(
+            gafrc_file_spec, conversion_options['scratch_directory'], verbose
+        )
+                                                                   # parse files
+    if verbose :
+        print("\nbuilding component list")
+    if component_cache is None :
+        component_cache = {}
+    with profiling.phase('find hierarchy') :
+        hierarchy = find_hierarchy(
+            top_symbol_file_spec, top_architecture_file_spec, library_indexes,
+            component_cache, conversion_options['scratch_directory'],
+            not force, verbose
+        )
+    if not hierarchy :
+        return(None, False, library_paths)
+                                                 # note the times of the sources
+    hierarchy['modification_times'] = find_modification_times(
+        hierarchy['compile_files']
+    )
+    hierarchy['modification_times'].update(gafrc_modification_time)
+                                                          # convert design units
+    conversion_succeeded = update_design(
+        hierarchy, gafrc_file_spec, manifest_file_spec, conversion_options,
+        jobs, force, verbose
+    )
                                                             # write compile list
-if verbose :
-    print("\nwriting compilation list")
-compile_list_file = open(compile_list_file_spec, 'w')
-for compile_file in compile_files :
-    compile_file = compile_file.replace('Symbols', 'Description')
-    compile_file = compile_file.replace('Schematics', 'Description')
-    compile_file = compile_file.replace('.sym', '.vhd')
-    compile_file = compile_file.replace('.sch', '.vhd')
     if verbose :
-        print(INDENT + compile_file)
-    compile_list_file.write("%s\n" % compile_file)
-compile_list_file.close()
+        print("\nwriting compilation list")
+    with profiling.phase('write compile list') :
+        write_compile_list(
+            compile_list_file_spec, hierarchy['compile_files'], verbose
+        )
+
+    return(hierarchy, conversion_succeeded, library_paths)
+
+# ------------------------------------------------------------------------------
+# find the files to watch for changes
+#
+#   The library directories are watched for new files.
+#
+def find_watched_files(gafrc_file_spec, hierarchy, library_paths):
+    watched_files = [gafrc_file_spec] + library_paths
+    if hierarchy :
+        for file_spec in hierarchy['compile_files'] :
+            if file_spec not in watched_files :
+                watched_files.append(file_spec)
+
+    return(watched_files)
+
+# ------------------------------------------------------------------------------
+# find the modification times to watch from after a build
+#
+#   The build writes its VHDL files in the Description directories: the
+#   directories are watched from their new modification times, and the
+#   source files from the times they had before they were converted, so
+#   that the files saved during the build are converted again.
+#
+def find_watched_times(watched_files, hierarchy):
+    modification_times = find_modification_times(watched_files)
+    if hierarchy :
+        for (file_spec, modification_time) in \
+            hierarchy['modification_times'].items() \
+        :
+            if file_spec in modification_times :
+                modification_times[file_spec] = modification_time
+
+    return(modification_times)
+
+# ------------------------------------------------------------------------------
+# find the modification times of files and directories
+#
+def find_modification_times(file_specs):
+    modification_times = {}
+    for file_spec in file_specs :
+        try :
+            modification_times[file_spec] = os.stat(file_spec).st_mtime_ns
+        except OSError :
+            modification_times[file_spec] = None
+
+    return(modification_times)
+
+# ------------------------------------------------------------------------------
+# analyse the compile list incrementally and run the simulation
+#
+def simulate_design(compile_list_file_spec, top_level, work_directory):
+    simulation = subprocess.run([
+        sys.executable, os.path.join(script_location, 'simulate.py'),
+        '--incremental', '--work', work_directory, '--top', top_level,
+        compile_list_file_spec
+    ])
+
+    return(simulation.returncode == 0)
+
+# ==============================================================================
+# main script
+#
+if __name__ == '__main__' :
+    # --------------------------------------------------------------------------
+    # command line arguments
+    #
+                                                             # specify arguments
+    parser = argparse.ArgumentParser(
+      description='Convert a gEDA symbol to a VHDL entity'
+    )
+                                                                    # input file
+    parser.add_argument('input_file')
+                                                                    # gafrc file
+    parser.add_argument(
+        '-g', '--gafrc',
+        default = os.sep.join([script_location, '..', 'gafrc']),
+        help = 'gafrc (directory mappings) file'
+    )
+                                                                  # VHDL library
+    parser.add_argument(
+        '-l', '--library',
+        help = 'VHDL library'
+    )
+                                                                # VHDL directory
+    parser.add_argument(
+        '-d', '--directory',
+        help = 'VHDL files directory'
+    )
+                                                             # scratch directory
+    parser.add_argument(
+        '-s', '--scratch', default='/tmp',
+        help = 'scratch directory'
+    )
+                                                                 # parallel jobs
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=1,
+        help = 'number of parallel conversions, 0 for all processors'
+    )
+                                                             # full regeneration
+    parser.add_argument(
+        '-f', '--force', action='store_true',
+        help = 'regenerate all files, ignoring the build manifest'
+    )
+                                                                    # watch mode
+    parser.add_argument(
+        '-w', '--watch', action='store_true',
+        help = 'keep running and rebuild the design when its files change'
+    )
+                                                                # polling period
+    parser.add_argument(
+        '-p', '--poll', type=float, default=1,
+        help = 'period in seconds of the checks for changes in watch mode'
+    )
+                                                                    # simulation
+    parser.add_argument(
+        '-r', '--run',
+        help = 'top level entity to analyse and simulate after each build'
+    )
+                                                                # hierarchy tree
+    parser.add_argument(
+        '-t', '--tree', action='store_true',
+        help = 'print the elaborated hierarchy and its statistics'
+    )
+                                                                # find instances
+    parser.add_argument(
+        '-q', '--query',
+        help = 'print the paths to the instances of a unit or with a label'
+    )
+                                                                     # profiling
+    parser.add_argument(
+        '--profile', action='store_true',
+        help = 'print phase times, write a trace in the scratch directory'
+    )
+                                                                # verbose output
+    parser.add_argument(
+        '-v', '--verbose', action='store_true',
+        help = 'Verbose display'
+    )
+                                                             # process arguments
+    parser_arguments = parser.parse_args()
+
+    top_architecture_file_spec = os.path.realpath(parser_arguments.input_file)
+    gafrc_file_spec = parser_arguments.gafrc
+    VHDL_directory = parser_arguments.directory
+    scratch_directory = parser_arguments.scratch
+    jobs = parser_arguments.jobs
+    force = parser_arguments.force
+    watch = parser_arguments.watch
+    poll_period = parser_arguments.poll
+    simulation_top_level = parser_arguments.run
+    print_tree = parser_arguments.tree
+    instance_query = parser_arguments.query
+    profile = parser_arguments.profile
+    verbose = parser_arguments.verbose
+
+    VHDL_library = parser_arguments.library
+    vhdl_file_path = VHDL_directory
+
+    (
+        top_symbol_file_spec, compile_list_file_spec, manifest_file_spec,
+        trace_file_spec
+    ) = find_design_file_specs(top_architecture_file_spec, scratch_directory)
+                                                               # validity checks
+    if not os.path.isfile(top_architecture_file_spec) :
+        print("schematics file %s not found" % top_architecture_file_spec)
+        quit()
+
+    if not os.path.isfile(top_symbol_file_spec) :
+        print("symbol file %s not found" % top_symbol_file_spec)
+        quit()
+
+    if not os.path.isdir(scratch_directory) :
+        print("scratch directory %s not found" % scratch_directory)
+        quit()
+
+    print("Converting %s to VHDL" % top_architecture_file_spec)
+
+    # --------------------------------------------------------------------------
+                                                                    # file paths
+    if not os.path.isfile(gafrc_file_spec) :
+        print("paths file %s not found" % gafrc_file_spec)
+        quit()
+
+    # --------------------------------------------------------------------------
+                                                                  # build design
+    conversion_options = {
+        'VHDL_library' : VHDL_library,
+        'VHDL_directory' : vhdl_file_path,
+        'scratch_directory' : scratch_directory
+    }
+    component_cache = {}
+    if profile :
+        profiling.enable()
+    with profiling.phase('design2vhd', 'script') :
+        (hierarchy, conversion_succeeded, library_paths) = build_design(
+            top_symbol_file_spec, top_architecture_file_spec, gafrc_file_spec,
+            manifest_file_spec, compile_list_file_spec, conversion_options,
+            jobs, force, component_cache, verbose
+        )
+    if profile :
+        profiling.report(trace_file_spec)
+    if not watch :
+        if not hierarchy :
+            quit()
+        if print_tree :
+            print()
+            elaboration.print_hierarchy(hierarchy['tree'])
+        if instance_query :
+            instance_paths = elaboration.find_instances_of(
+                hierarchy['tree'], instance_query
+            ) + elaboration.find_paths_to(hierarchy['tree'], instance_query)
+            if not instance_paths :
+                print("no instance of %s found" % instance_query)
+            for instance_path in instance_paths :
+                print(instance_path)
+        if not conversion_succeeded :
+            sys.exit(1)
+        if simulation_top_level :
+            if not simulate_design(
+                compile_list_file_spec, simulation_top_level, scratch_directory
+            ) :
+                sys.exit(1)
+        sys.exit(0)
+
+    # --------------------------------------------------------------------------
+                                                             # watch for changes
+    if conversion_succeeded and simulation_top_level :
+        simulate_design(
+            compile_list_file_spec, simulation_top_level, scratch_directory
+        )
+    watched_files = find_watched_files(
+        gafrc_file_spec, hierarchy, library_paths
+    )
+    modification_times = find_watched_times(watched_files, hierarchy)
+    print("\nwatching %d files and directories" % len(watched_files))
+    try :
+        while True :
+            time.sleep(poll_period)
+            new_modification_times = find_modification_times(watched_files)
+            if new_modification_times == modification_times :
+                continue
+                                                     # find the time of the save
+            changed_files = []
+            save_time = 0
+            for (file_spec, modification_time) in \
+                new_modification_times.items() \
+            :
+                if modification_time != modification_times[file_spec] :
+                    changed_files.append(file_spec)
+                    if modification_time :
+                        save_time = max(save_time, modification_time / 1E9)
+            if not save_time :
+                save_time = time.time()
+            print()
+            for file_spec in changed_files :
+                print("%s changed" % file_spec)
+                                                            # rebuild the design
+            with profiling.phase('design2vhd', 'script') :
+                (hierarchy, conversion_succeeded, library_paths) = \
+                    build_design(
+                        top_symbol_file_spec, top_architecture_file_spec,
+                        gafrc_file_spec, manifest_file_spec,
+                        compile_list_file_spec, conversion_options,
+                        jobs, False, component_cache, verbose
+                    )
+            if profile :
+                profiling.report(trace_file_spec)
+            conversion_latency = time.time() - save_time
+            simulation_latency = None
+            if conversion_succeeded and simulation_top_level :
+                if simulate_design(
+                    compile_list_file_spec, simulation_top_level,
+                    scratch_directory
+                ) :
+                    simulation_latency = time.time() - save_time
+                                                            # report the latency
+            if conversion_succeeded :
+                print("VHDL up to date %.3f s after save" % conversion_latency)
+            if simulation_latency is not None :
+                print("simulation done %.3f s after save" % simulation_latency)
+                                                      # update the watched files
+            watched_files = find_watched_files(
+                gafrc_file_spec, hierarchy, library_paths
+            )
+            modification_times = find_watched_times(watched_files, hierarchy)
+    except KeyboardInterrupt :
+        print()
@@ -0,0 +1,168 @@
+#
+# elaboration.py
+#       Elaborated design hierarchy.
+#
+#   Each design unit (a schematic or a VHDL architecture) is elaborated
+#   once and shared by all of its instances: the hierarchy is a graph of
+#   units, not a tree of instances. Its size and the cost of building it
+#   grow with the number of different units, not with the number of
+#   instances.
+#   The statistics of a unit are computed once and then reused by all
+#   the units instantiating it.
+#
+#   An instance is designated by its path: the name of the top level
+#   unit followed by the labels of the instances leading to it, as in
+#   top-struct/U1/U3.
+#
+import sys
+                                                                     # constants
+INDENT = 2 * ' '
+PATH_SEPARATOR = '/'
+
+# ==============================================================================
+# records
+#
+# ------------------------------------------------------------------------------
+# design unit
+#
+#   The name is the file name without extension, the entity the one of
+#   the symbol. The instances are (label, unit) pairs, the parents the
+#   (unit, label) pairs instantiating the unit.
+#
+class DesignUnit :
+    __slots__ = (
+        'name', 'entity', 'file_spec', 'net_count', 'instances', 'parents',
+        'statistics'
+    )
+
+    def __init__(self, name, entity, file_spec):
+        self.name = sys.intern(name)
+        self.entity = sys.intern(entity)
+        self.file_spec = file_spec
+        self.net_count = 0
+        self.instances = []
+        self.parents = []
+        self.statistics = None
+
+# ------------------------------------------------------------------------------
+# elaborated hierarchy
+#
+#   The units are indexed by file specification, the units containing an
+#   instance by instance label.
+#
+class Hierarchy :
+    __slots__ = ('top', 'units', 'labels')
+
+    def __init__(self, top_unit):
+        self.top = top_unit
+        self.units = {top_unit.file_spec : top_unit}
+        self.labels = {}
+
+    def add_unit(self, unit):
+        self.units[unit.file_spec] = unit
+        return(unit)
+
+    def add_instance(self, parent, label, unit):
+        parent.instances.append((label, unit))
+        unit.parents.append((parent, label))
+        self.labels.setdefault(label, []).append(parent)
+
+# ==============================================================================
+# functions
+#
+# ------------------------------------------------------------------------------
+# find the statistics of a unit
+#
+#   The statistics are:
+#     - 'instances'       : the number of instances in the unit,
+#     - 'total_instances' : the number of instances below the unit,
+#     - 'nets'            : the number of nets of the unit,
+#     - 'total_nets'      : the number of nets below and in the unit,
+#     - 'depth'           : the number of levels below the unit.
+#   They are computed once per unit.
+#
+def find_statistics(unit):
+    if unit.statistics is None :
+        statistics = {
+            'instances' : len(unit.instances),
+            'total_instances' : len(unit.instances),
+            'nets' : unit.net_count,
+            'total_nets' : unit.net_count,
+            'depth' : 0
+        }
+        for (label, instance_unit) in unit.instances :
+            instance_statistics = find_statistics(instance_unit)
+            statistics['total_instances'] = statistics['total_instances'] + \
+                instance_statistics['total_instances']
+            statistics['total_nets'] = statistics['total_nets'] + \
+                instance_statistics['total_nets']
+            statistics['depth'] = max(
+                statistics['depth'], instance_statistics['depth'] + 1
+            )
+        unit.statistics = statistics
+
+    return(unit.statistics)
+
+# ------------------------------------------------------------------------------
+# find the paths to the instances of a unit
+#
+#   The paths are found by going up from the unit to the top level, the
+#   rest of the hierarchy isn't visited.
+#
+def find_unit_paths(hierarchy, unit):
+    if unit is hierarchy.top :
+        return([hierarchy.top.name])
+    paths = []
+    for (parent, label) in unit.parents :
+        for parent_path in find_unit_paths(hierarchy, parent) :
+            paths.append(parent_path + PATH_SEPARATOR + label)
+
+    return(paths)
+
+# ------------------------------------------------------------------------------
+# find the paths to all instances of a unit or of an entity
+#
+def find_instances_of(hierarchy, name):
+    paths = []
+    for unit in hierarchy.units.values() :
+        if (unit.name == name) or (unit.entity == name) :
+            paths = paths + find_unit_paths(hierarchy, unit)
+
+    return(sorted(paths))
+
+# ------------------------------------------------------------------------------
+# find the paths to the instances with a given label
+#
+def find_paths_to(hierarchy, label):
+    paths = []
+    for parent in hierarchy.labels.get(label, []) :
+        for parent_path in find_unit_paths(hierarchy, parent) :
+            paths.append(parent_path + PATH_SEPARATOR + label)
+
+    return(sorted(paths))
+
+# ------------------------------------------------------------------------------
+# print the hierarchy
+#
+#   The contents of a unit are only printed at its first instance.
+#
+def print_hierarchy(hierarchy):
+    print("%-48s %9s %9s %9s %6s" % (
+        'instance : unit', 'instances', 'nets', 'all nets', 'depth'
+    ))
+    printed_units = set()
+    to_print = [(0, hierarchy.top.name, hierarchy.top)]
+    while to_print :
+        (level, label, unit) = to_print.pop()
+        statistics = find_statistics(unit)
+        description = level*INDENT + "%s : %s" % (label, unit.name)
+        if unit.instances and (unit.name in printed_units) :
+            description = description + ' ...'
+        print("%-48s %9d %9d %9d %6d" % (
+            description[:48], statistics['total_instances'],
+            statistics['nets'], statistics['total_nets'], statistics['depth']
+        ))
+        if unit.name not in printed_units :
+            printed_units.add(unit.name)
+            for (label, instance_unit) in reversed(unit.instances) :
+                to_print.append((level+1, label, instance_unit))
@@ -0,0 +1,318 @@
+#
+# geda.py
+#       Streaming reader for the gEDA symbol and schematic file format.
+#
+# https://lepton-eda.github.io/lepton-manual.html/gEDA-file-format.html
+#
+#   Files are read with a single bulk read split once into lines; the
+#   line by line reader is kept for comparison and for streams.
+#
+#   Each object is returned as a dictionary:
+#     'type'       : object type letter ('C', 'N', 'U', 'P', 'T', ...)
+#     'fields'     : the remaining fields of the object line, as strings
+#     'text'       : the text lines of 'T' and 'H' objects
+#     'attributes' : the [name, value] pairs of the attribute block
+#
+#   The module also holds the file and batch helpers shared by the
+#   conversion, build and simulation scripts.
+#
+import os
+import argparse
+import time
+import glob
+import hashlib
+import profiling
+                                                                     # constants
+INDENT = 2 * ' '
+MULTI_LINE_OBJECTS = ('T', 'H')
+NO_TEXT = ()
+NO_ATTRIBUTES = ()
+
+# ==============================================================================
+# functions
+#
+# ------------------------------------------------------------------------------
+# read the text lines following a multi-line object
+#
+def read_text_lines(lines, line_count):
+    text = []
+    for line in lines :
+        text.append(line)
+        if len(text) == line_count :
+            break
+
+    return(text)
+
+# ------------------------------------------------------------------------------
+# read an attribute block up to its closing brace
+#
+def read_attributes(lines):
+    attributes = []
+    for line in lines :
+        if line.startswith('}') :
+            break
+        if line.startswith('T ') :
+            text = read_text_lines(lines, int(line.split(' ')[-1]))
+            (name, separator, value) = "\n".join(text).partition('=')
+            attributes.append([name, value])
+
+    return(attributes)
+
+# ------------------------------------------------------------------------------
+# skip the embedded contents of a component
+#
+def skip_embedded_block(lines):
+    depth = 1
+    for line in lines :
+        if line.startswith('[') :
+            depth = depth + 1
+        elif line.startswith(']') :
+            depth = depth - 1
+            if depth == 0 :
+                break
+
+# ------------------------------------------------------------------------------
+# parse the objects of a line iterator
+#
+#   The lines are given without line ends.
+#   The attribute block following an object is only known once the next
+#   line has been read, so objects are yielded one line late.
+#
+def parse_objects(lines):
+    lines = iter(lines)
+    geda_object = None
+    for line in lines :
+        object_type = line[:1]
+        if (object_type == '') or (object_type == ' ') :
+            continue
+                                                               # attribute block
+        if object_type == '{' :
+            attributes = read_attributes(lines)
+            if geda_object :
+                geda_object['attributes'] = attributes
+                                                            # embedded component
+        elif object_type == '[' :
+            skip_embedded_block(lines)
+                                                                        # object
+        else :
+            if geda_object :
+                yield(geda_object)
+            fields = line[2:].split(' ')
+            geda_object = {
+                'type' : object_type,
+                'fields' : fields,
+                'text' : NO_TEXT,
+                'attributes' : NO_ATTRIBUTES
+            }
+            if object_type in MULTI_LINE_OBJECTS :
+                geda_object['text'] = read_text_lines(lines, int(fields[-1]))
+    if geda_object :
+        yield(geda_object)
+
+# ------------------------------------------------------------------------------
+# read the lines of a file with one read call
+#
+def read_lines(file_spec):
+    geda_file = open(file_spec, 'r')
+    lines = geda_file.read().split("\n")
+    geda_file.close()
+
+    return(lines)
+
+# ------------------------------------------------------------------------------
+# read the lines of a file one at a time
+#
+def stream_lines(file_spec):
+    geda_file = open(file_spec, 'r')
+    try :
+        for line in geda_file :
+            yield(line.rstrip("\r\n"))
+    finally :
+        geda_file.close()
+
+# ------------------------------------------------------------------------------
+# read the objects of a gEDA file
+#
+def read_objects(file_spec, bulk=True):
+    if bulk :
+        return(parse_objects(read_lines(file_spec)))
+    else :
+        return(parse_objects(stream_lines(file_spec)))
+
+# ------------------------------------------------------------------------------
+# find the value of an attribute
+#
+def attribute_value(geda_object, attribute_name, default=''):
+    for (name, value) in geda_object['attributes'] :
+        if name == attribute_name :
+            return(value)
+
+    return(default)
+
+# ------------------------------------------------------------------------------
+# write a file if its contents have changed
+#
+#   The text is written to a temporary file which then replaces the file:
+#   readers never see a partial file and an unchanged file keeps its
+#   modification time, so that tools watching it don't process it again.
+#   Returns True if the file has been written.
+#
+def write_file_if_changed(file_spec, text):
+    if os.path.isfile(file_spec) :
+        existing_file = open(file_spec, 'r')
+        existing_text = existing_file.read()
+        existing_file.close()
+        if existing_text == text :
+            profiling.count('files unchanged')
+            return(False)
+    temporary_file_spec = "%s.%d.tmp" % (file_spec, os.getpid())
+    temporary_file = open(temporary_file_spec, 'w')
+    temporary_file.write(text)
+    temporary_file.close()
+    os.replace(temporary_file_spec, file_spec)
+    profiling.count('files written')
+
+    return(True)
+
+# ------------------------------------------------------------------------------
+# hash the content of a file
+#
+def hash_file(file_spec):
+    if not os.path.isfile(file_spec) :
+        return('')
+    hashed_file = open(file_spec, 'rb')
+    file_hash = hashlib.sha1(hashed_file.read()).hexdigest()
+    hashed_file.close()
+
+    return(file_hash)
+
+# ------------------------------------------------------------------------------
+# find the stamp of a file: its modification time and size
+#
+#   Returns None if the file doesn't exist.
+#
+def find_file_stamp(file_spec):
+    try :
+        file_status = os.stat(file_spec)
+    except OSError :
+        return(None)
+
+    return([file_status.st_mtime_ns, file_status.st_size])
+
+# ------------------------------------------------------------------------------
+# find the input files of a batch
+#
+#   The inputs are file specifications or glob patterns, given on the
+#   command line or listed in a file, one per line. In the list file,
+#   empty lines and lines starting with '#' are skipped and relative
+#   paths are taken from the list file directory.
+#   Patterns without a match are kept: their conversion reports them.
+#
+def find_input_files(input_specs, list_file_spec=None):
+    input_specs = list(input_specs)
+    if list_file_spec :
+        list_file = open(list_file_spec, 'r')
+        lines = list_file.read().split("\n")
+        list_file.close()
+        for line in lines :
+            line = line.strip()
+            if line and not line.startswith('#') :
+                input_specs.append(
+                    os.path.join(os.path.dirname(list_file_spec), line)
+                )
+    file_specs = []
+    for input_spec in input_specs :
+        matches = sorted(glob.glob(input_spec))
+        if not matches :
+            matches = [input_spec]
+        for file_spec in matches :
+            if file_spec not in file_specs :
+                file_specs.append(file_spec)
+
+    return(file_specs)
+
+# ------------------------------------------------------------------------------
+# convert a batch of files
+#
+#   The conversion options are shared by all conversions, including the
+#   symbol interfaces cache. A file which can't be read or parsed doesn't
+#   stop the batch.
+#   Returns the list of the files which failed to convert.
+#
+def convert_batch(conversion, file_specs, conversion_options):
+    failed_files = []
+    for file_spec in file_specs :
+        with profiling.phase(
+            "convert %s" % os.path.basename(file_spec), 'conversion'
+        ) :
+            try :
+                success = conversion(file_spec, **conversion_options)
+            except (OSError, ValueError, IndexError) as error :
+                print("error converting %s : %s" % (file_spec, error))
+                success = False
+        if not success :
+            failed_files.append(file_spec)
+
+    return(failed_files)
+
+# ------------------------------------------------------------------------------
+# print the summary of a batch conversion
+#
+def print_batch_summary(file_specs, failed_files):
+    print("\n%d of %d files converted" % (
+        len(file_specs) - len(failed_files), len(file_specs)
+    ))
+    if failed_files :
+        print("failed :")
+        for file_spec in failed_files :
+            print(INDENT + file_spec)
+
+# ==============================================================================
+# main script
+#
+if __name__ == '__main__' :
+                                                             # specify arguments
+    parser = argparse.ArgumentParser(
+      description='Measure the gEDA file reading throughput'
+    )
+                                                                   # input files
+    parser.add_argument('input_files', nargs='+')
+                                                                   # repetitions
+    parser.add_argument(
+        '-r', '--repeat', type=int, default=3,
+        help = 'number of reads per file and reader, the best one is kept'
+    )
+                                                             # process arguments
+    parser_arguments = parser.parse_args()
+                                                            # measure throughput
+    readers = {
+        'readline' : stream_lines,
+        'bulk' : read_lines
+    }
+    print("%-32s %8s %12s %12s %12s %12s" % (
+        'file', 'MB',
+        'readline', 'bulk', 'readline', 'bulk'
+    ))
+    print("%-32s %8s %12s %12s %12s %12s" % (
+        '', '', 'lines', 'lines', 'objects', 'objects'
+    ))
+    for file_spec in parser_arguments.input_files :
+        file_size = os.path.getsize(file_spec) / 1e6
+        throughputs = []
+        for parse in (False, True) :
+            for reader in readers.values() :
+                best_time = None
+                for repetition in range(parser_arguments.repeat) :
+                    start_time = time.perf_counter()
+                    lines = reader(file_spec)
+                    if parse :
+                        lines = parse_objects(lines)
+                    for item in lines :
+                        pass
+                    read_time = time.perf_counter() - start_time
+                    if (best_time is None) or (read_time < best_time) :
+                        best_time = read_time
+                throughputs.append(file_size / max(best_time, 1e-9))
+        print("%-32s %8.2f %7.1f MB/s %7.1f MB/s %7.1f MB/s %7.1f MB/s" % (
+            os.path.basename(file_spec)[-32:], file_size, *throughputs
+        ))
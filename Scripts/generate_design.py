@@ -0,0 +1,346 @@
+#! /usr/bin/env python3
+#
+# generate_design.py
+#       Script to generate a synthetic gEDA hierarchical design for
+#       measuring the conversion scripts.
+#
+# https://lepton-eda.github.io/lepton-manual.html/gEDA-file-format.html
+#
+#   The design is a library with a leaf cell described in VHDL and one
+#   block per hierarchy level. Each block schematic places a number of
+#   instances of the level below and connects them with:
+#     - a clock net chaining all clock pins,
+#     - one data bus per instance output, driving the inputs of the next
+#       instances (fan-out) through a hub point,
+#     - free nets, not connected to any pin, beyond the instance count,
+#       made of a T-junction and fan-out branches.
+#
+import os
+import argparse
+import math
+                                                                     # constants
+FILE_VERSION = 'v 20200319 2'
+PIN_LENGTH = 500
+PIN_PITCH = 400
+SYMBOL_WIDTH = 2000
+INSTANCE_PITCH_X = 8000
+INSTANCE_SPACING_Y = 2000
+ORIGIN = 10000
+
+# ==============================================================================
+# functions
+#
+# ------------------------------------------------------------------------------
+# find the port locations of the generated symbols
+#
+#   The location of a port is the outer end of its pin.
+#
+def find_port_locations(fanout):
+    port_locations = {'clock' : (-PIN_LENGTH, PIN_PITCH//2)}
+    for index in range(fanout) :
+        port_locations["data_in%d" % index] = \
+            (-PIN_LENGTH, (index+1)*PIN_PITCH + PIN_PITCH//2)
+    port_locations['data_out'] = \
+        (SYMBOL_WIDTH + PIN_LENGTH, PIN_PITCH + PIN_PITCH//2)
+
+    return(port_locations)
+
+# ------------------------------------------------------------------------------
+# find the location of an instance pin
+#
+def find_pin(instance_location, port_location):
+    return(
+        instance_location[0] + port_location[0],
+        instance_location[1] + port_location[1]
+    )
+
+# ------------------------------------------------------------------------------
+# write an attribute block
+#
+def write_attributes(geda_file, location, attributes, visible=True):
+    geda_file.write("{\n")
+    for (name, value) in attributes :
+        geda_file.write("T %d %d 5 10 %d 1 0 0 1\n" % (
+            location[0], location[1], int(visible)
+        ))
+        geda_file.write("%s=%s\n" % (name, value))
+        visible = False
+    geda_file.write("}\n")
+
+# ------------------------------------------------------------------------------
+# write a symbol
+#
+def write_symbol(symbol_file_spec, fanout, width):
+    symbol_file = open(symbol_file_spec, 'w')
+    symbol_file.write(FILE_VERSION + "\n")
+    height = (fanout+1)*PIN_PITCH + PIN_PITCH
+    symbol_file.write(
+        "B 0 0 %d %d 3 0 0 0 -1 -1 0 -1 -1 -1 -1 -1\n" % (SYMBOL_WIDTH, height)
+    )
+    for (name, location) in find_port_locations(fanout).items() :
+        if location[0] < 0 :
+            inner_x = 0
+        else :
+            inner_x = SYMBOL_WIDTH
+        symbol_file.write("P %d %d %d %d 1 0 0\n" % (
+            location[0], location[1], inner_x, location[1]
+        ))
+        attributes = [['pinlabel', name]]
+        if name == 'clock' :
+            attributes.append(['porttype', 'std_ulogic'])
+        else :
+            attributes.append(['porttype', 'unsigned'])
+            attributes.append(['portrange', "(%d downto 0)" % (width-1)])
+        if name == 'data_out' :
+            attributes.append(['portdirection', 'out'])
+        else :
+            attributes.append(['portdirection', 'in'])
+        write_attributes(symbol_file, location, attributes)
+    symbol_file.write("T 0 -600 8 10 1 1 0 0 1\n")
+    symbol_file.write("generic1=delay : time := 1 ns\n")
+    symbol_file.close()
+
+# ------------------------------------------------------------------------------
+# write the architecture of the leaf cell
+#
+def write_cell_architecture(vhdl_file_spec, library, fanout):
+    data_inputs = ["data_in%d" % index for index in range(fanout)]
+    vhdl_file = open(vhdl_file_spec, 'w')
+    vhdl_file.write("library ieee;\n")
+    vhdl_file.write("  use ieee.std_logic_1164.all;\n")
+    vhdl_file.write("  use ieee.numeric_std.all;\n\n")
+    vhdl_file.write("architecture rtl of %s_cell is\n" % library)
+    vhdl_file.write("begin\n\n")
+    vhdl_file.write("  process(clock)\n")
+    vhdl_file.write("  begin\n")
+    vhdl_file.write("    if rising_edge(clock) then\n")
+    vhdl_file.write("      data_out <= %s after delay;\n" % (
+        ' xor '.join(data_inputs)
+    ))
+    vhdl_file.write("    end if;\n")
+    vhdl_file.write("  end process;\n\n")
+    vhdl_file.write("end rtl;\n")
+    vhdl_file.close()
+
+# ------------------------------------------------------------------------------
+# write a net segment
+#
+def write_net(schematics_file, start, end, attributes=()):
+    schematics_file.write("N %d %d %d %d 4\n" % (
+        start[0], start[1], end[0], end[1]
+    ))
+    if attributes :
+        write_attributes(schematics_file, start, attributes)
+
+# ------------------------------------------------------------------------------
+# write a block schematic
+#
+#   Returns the number of net segments written.
+#
+def write_schematics(
+    schematics_file_spec, symbol_name, source, instances, nets, width, fanout
+):
+    port_locations = find_port_locations(fanout)
+    columns = math.ceil(math.sqrt(instances))
+    pitch_y = (fanout+2)*PIN_PITCH + INSTANCE_SPACING_Y
+    schematics_file = open(schematics_file_spec, 'w')
+    schematics_file.write(FILE_VERSION + "\n")
+    segment_count = 0
+                                                                     # instances
+    instance_locations = []
+    for index in range(instances) :
+        location = (
+            ORIGIN + (index % columns)*INSTANCE_PITCH_X,
+            ORIGIN + (index // columns)*pitch_y
+        )
+        instance_locations.append(location)
+        schematics_file.write(
+            "C %d %d 1 0 0 %s\n" % (location[0], location[1], symbol_name)
+        )
+        write_attributes(schematics_file, location, [
+            ['refdes', "U%d" % index],
+            ['source', source]
+        ])
+                                                                     # clock net
+    clock_pins = []
+    for location in instance_locations :
+        clock_pins.append(find_pin(location, port_locations['clock']))
+    for index in range(instances-1) :
+        attributes = ()
+        if index == 0 :
+            attributes = [['netname', 'clock_line']]
+        write_net(
+            schematics_file, clock_pins[index], clock_pins[index+1], attributes
+        )
+        segment_count = segment_count + 1
+                                                                     # data nets
+    for index in range(min(nets, instances)) :
+        output = find_pin(
+            instance_locations[index], port_locations['data_out']
+        )
+        hub = (output[0] + PIN_LENGTH*2, output[1])
+        write_net(
+            schematics_file, output, hub, [['netname', "d%d" % index]]
+        )
+        segment_count = segment_count + 1
+        for load in range(min(fanout, instances-1)) :
+            load_instance = (index + 1 + load) % instances
+            write_net(schematics_file, hub, find_pin(
+                instance_locations[load_instance],
+                port_locations["data_in%d" % load]
+            ))
+            segment_count = segment_count + 1
+                                                                     # free nets
+    free_origin = ORIGIN + (columns+2)*INSTANCE_PITCH_X
+    for index in range(nets - instances) :
+        hub = (
+            free_origin + (index % 50)*2*PIN_PITCH*(fanout+3),
+            ORIGIN + (index // 50)*4*PIN_PITCH
+        )
+        branch_end = (hub[0] + PIN_PITCH*2, hub[1])
+        attributes = ()
+        if index % 2 == 0 :
+            attributes = [
+                ['netname', "f%d" % index],
+                ['signaltype', 'std_ulogic']
+            ]
+        write_net(schematics_file, hub, branch_end, attributes)
+        write_net(
+            schematics_file,
+            (hub[0] + PIN_PITCH, hub[1]),
+            (hub[0] + PIN_PITCH, hub[1] + PIN_PITCH)
+        )
+        segment_count = segment_count + 2
+        for load in range(fanout) :
+            write_net(schematics_file, branch_end, (
+                branch_end[0] + (load+1)*PIN_PITCH,
+                branch_end[1] + PIN_PITCH*2
+            ))
+            segment_count = segment_count + 1
+    schematics_file.close()
+
+    return(segment_count)
+
+# ------------------------------------------------------------------------------
+# write the gafrc file
+#
+def write_gafrc(gafrc_file_spec, directory, library):
+    gafrc_file = open(gafrc_file_spec, 'w')
+    gafrc_file.write("(define project-directory \"%s\")\n" % directory)
+    gafrc_file.write(
+        "(component-library-search " +
+        "(build-path project-directory \"%s\" \"Symbols\") \"%s\")\n" %
+        (library, library)
+    )
+    gafrc_file.write(
+        "(source-library " +
+        "(build-path project-directory \"%s\" \"Schematics\"))\n" % library
+    )
+    gafrc_file.close()
+
+# ------------------------------------------------------------------------------
+# generate a design
+#
+#   Level 1 blocks instantiate the leaf cell, level n blocks instantiate
+#   level n-1 blocks. Returns the file specifications of the gafrc file
+#   and of the top level schematic, and the number of net segments per
+#   schematic.
+#
+def generate_design(
+    directory, library='bench',
+    instances=10, nets=10, width=8, depth=1, fanout=1
+):
+    directory = os.path.realpath(directory)
+    library_directory = os.path.join(directory, library)
+    for kind in ('Symbols', 'Schematics', 'Description') :
+        os.makedirs(os.path.join(library_directory, kind), exist_ok=True)
+                                                                     # leaf cell
+    write_symbol(
+        os.path.join(library_directory, 'Symbols', library + '-cell.sym'),
+        fanout, width
+    )
+    write_cell_architecture(
+        os.path.join(
+            library_directory, 'Description', library + '-cell-rtl.vhd'
+        ),
+        library, fanout
+    )
+    instance_symbol = library + '-cell.sym'
+    instance_source = library + '-cell-rtl.vhd'
+                                                                  # level blocks
+    for level in range(1, depth+1) :
+        block_name = "%s-level%d" % (library, level)
+        write_symbol(
+            os.path.join(library_directory, 'Symbols', block_name + '.sym'),
+            fanout, width
+        )
+        schematics_file_spec = os.path.join(
+            library_directory, 'Schematics', block_name + '-struct.sch'
+        )
+        segment_count = write_schematics(
+            schematics_file_spec, instance_symbol, instance_source,
+            instances, nets, width, fanout
+        )
+        instance_symbol = block_name + '.sym'
+        instance_source = block_name + '-struct.sch'
+                                                                    # gafrc file
+    gafrc_file_spec = os.path.join(directory, 'gafrc')
+    write_gafrc(gafrc_file_spec, directory, library)
+
+    return(gafrc_file_spec, schematics_file_spec, segment_count)
+
+# ==============================================================================
+# main script
+#
+if __name__ == '__main__' :
+                                                             # specify arguments
+    parser = argparse.ArgumentParser(
+      description='Generate a synthetic gEDA hierarchical design'
+    )
+                                                              # output directory
+    parser.add_argument('directory')
+                                                                  # library name
+    parser.add_argument(
+        '-l', '--library', default='bench',
+        help = 'library name'
+    )
+                                                                     # instances
+    parser.add_argument(
+        '-i', '--instances', type=int, default=10,
+        help = 'number of instances per schematic'
+    )
+                                                                          # nets
+    parser.add_argument(
+        '-n', '--nets', type=int, default=10,
+        help = 'number of nets per schematic'
+    )
+                                                                     # bus width
+    parser.add_argument(
+        '-w', '--width', type=int, default=8,
+        help = 'data bus width'
+    )
+                                                               # hierarchy depth
+    parser.add_argument(
+        '-d', '--depth', type=int, default=1,
+        help = 'number of hierarchy levels above the leaf cell'
+    )
+                                                                       # fan-out
+    parser.add_argument(
+        '-f', '--fanout', type=int, default=1,
+        help = 'number of loads per net'
+    )
+                                                             # process arguments
+    parser_arguments = parser.parse_args()
+                                                               # generate design
+    (gafrc_file_spec, top_file_spec, segment_count) = generate_design(
+        parser_arguments.directory,
+        parser_arguments.library,
+        max(parser_arguments.instances, 1),
+        parser_arguments.nets,
+        max(parser_arguments.width, 1),
+        max(parser_arguments.depth, 1),
+        max(parser_arguments.fanout, 1)
+    )
+    print("gafrc file : %s" % gafrc_file_spec)
+    print("top level : %s" % top_file_spec)
+    print("net segments per schematic : %d" % segment_count)
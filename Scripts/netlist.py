@@ -0,0 +1,188 @@
+#
+# netlist.py
+#       Data model of the parsed symbols and schematics.
+#
+#   The records are classes with slots instead of dictionaries: they have
+#   no per-instance dictionary and misspelled fields raise an error.
+#   The net segments of a schematic are kept in a single object, with
+#   their coordinates in a flat integer array (x1, y1, x2, y2 per segment)
+#   instead of a list of two point lists per segment.
+#   Names and types are interned: the many segments, ports and signals
+#   sharing a name share a single string.
+#
+#   Parsed and connected schematics are stored as netlist files, in a
+#   versioned JSON lines format.
+#
+import sys
+import array
+import json
+                                                                     # constants
+COORDINATE_TYPE = 'i'
+NETLIST_FORMAT = 'vhdl-eda netlist'
+NETLIST_VERSION = 3
+
+# ==============================================================================
+# records
+#
+# ------------------------------------------------------------------------------
+# symbol port
+#
+#   The location is relative to the symbol origin.
+#
+class Port :
+    __slots__ = ('name', 'type', 'range', 'direction', 'x', 'y')
+
+    def __init__(
+        self, name='', port_type='std_ulogic', port_range='', direction='in',
+        x=0, y=0
+    ):
+        self.name = sys.intern(name)
+        self.type = sys.intern(port_type)
+        self.range = port_range
+        self.direction = direction
+        self.x = x
+        self.y = y
+
+# ------------------------------------------------------------------------------
+# symbol interface: generics and ports
+#
+class Interface :
+    __slots__ = ('name', 'generics', 'ports')
+
+    def __init__(self, name, generics=None, ports=None):
+        if generics is None :
+            generics = []
+        if ports is None :
+            ports = []
+        self.name = name
+        self.generics = generics
+        self.ports = ports
+
+# ------------------------------------------------------------------------------
+# schematic component instance
+#
+#   The name is the one of the symbol, without the file extension.
+#   The interface and the port connections are filled in when the
+#   component is connected to the nets.
+#
+class Component :
+    __slots__ = (
+        'name', 'symbol', 'label', 'source', 'generics', 'x', 'y',
+        'interface', 'connections'
+    )
+
+    def __init__(self, name, x=0, y=0, symbol=''):
+        self.name = sys.intern(name)
+        self.symbol = symbol
+        self.label = ''
+        self.source = ''
+        self.generics = []
+        self.x = x
+        self.y = y
+        self.interface = None
+        self.connections = {}
+
+# ------------------------------------------------------------------------------
+# schematic signal
+#
+#   An empty type or range is taken from the ports the signal connects to.
+#
+class Signal :
+    __slots__ = ('name', 'type', 'range')
+
+    def __init__(self, name, signal_type='', signal_range=''):
+        self.name = sys.intern(name)
+        self.type = sys.intern(signal_type)
+        self.range = signal_range
+
+# ------------------------------------------------------------------------------
+# net segments of a schematic
+#
+#   Unlabelled segments have an empty name until the nets are aggregated.
+#
+class NetSegments :
+    __slots__ = ('names', 'coordinates')
+
+    def __init__(self):
+        self.names = []
+        self.coordinates = array.array(COORDINATE_TYPE)
+
+    def __len__(self):
+        return(len(self.names))
+
+    def append(self, name, x1, y1, x2, y2):
+        self.names.append(sys.intern(name))
+        self.coordinates.extend((x1, y1, x2, y2))
+
+    def start(self, index):
+        return(self.coordinates[4*index], self.coordinates[4*index+1])
+
+    def end(self, index):
+        return(self.coordinates[4*index+2], self.coordinates[4*index+3])
+
+# ==============================================================================
+# netlist files
+#
+#   A netlist file holds a header line followed by one JSON line per
+#   section. The header gives the format, its version and the section
+#   names, together with the fields given by the writer. The sections
+#   are only decoded when they are accessed.
+#
+# ------------------------------------------------------------------------------
+# netlist read from a file
+#
+class StoredNetlist :
+    __slots__ = ('header', 'section_lines', 'sections')
+
+    def __init__(self, header, section_lines):
+        self.header = header
+        self.section_lines = section_lines
+        self.sections = {}
+
+    def has_section(self, name):
+        return(name in self.section_lines)
+
+    def section(self, name):
+        if name not in self.sections :
+            self.sections[name] = json.loads(self.section_lines[name])
+        return(self.sections[name])
+
+# ------------------------------------------------------------------------------
+# format a netlist file
+#
+def format_netlist(header, sections):
+    header = dict(
+        header,
+        format=NETLIST_FORMAT, version=NETLIST_VERSION, sections=list(sections)
+    )
+    lines = [json.dumps(header)]
+    for section in sections.values() :
+        lines.append(json.dumps(section, separators=(',', ':')))
+
+    return("\n".join(lines) + "\n")
+
+# ------------------------------------------------------------------------------
+# read a netlist file
+#
+#   Only the header is decoded.
+#   Returns None if the file is missing, truncated or of another version.
+#
+def read_netlist(file_spec):
+    try :
+        netlist_file = open(file_spec, 'r')
+        lines = netlist_file.read().split("\n")
+        netlist_file.close()
+        header = json.loads(lines[0])
+    except (OSError, ValueError) :
+        return(None)
+    if not isinstance(header, dict) :
+        return(None)
+    if header.get('format') != NETLIST_FORMAT :
+        return(None)
+    if header.get('version') != NETLIST_VERSION :
+        return(None)
+    section_names = header.get('sections', [])
+    if len(lines) < len(section_names) + 1 :
+        return(None)
+
+    return(StoredNetlist(header, dict(zip(section_names, lines[1:]))))
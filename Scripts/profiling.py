@@ -0,0 +1,147 @@
+#
+# profiling.py
+#       Phase timing and counters for the conversion scripts.
+#
+#   Profiling is off until enable() is called: phases and counters then
+#   cost a test of a flag.
+#
+#   Phases are recorded as Chrome trace events ("complete" events with
+#   their start and duration in microseconds of the system clock), so
+#   that the phases of child processes can be merged with the ones of
+#   their parent. The trace can be opened in chrome://tracing or in
+#   https://ui.perfetto.dev.
+#
+import os
+import time
+import json
+import contextlib
+                                                                 # profile state
+profile = {
+    'enabled' : False,
+    'events' : [],
+    'counters' : {}
+}
+
+# ==============================================================================
+# functions
+#
+# ------------------------------------------------------------------------------
+# start recording
+#
+def enable():
+    profile['enabled'] = True
+
+# ------------------------------------------------------------------------------
+# test if recording
+#
+def is_enabled():
+    return(profile['enabled'])
+
+# ------------------------------------------------------------------------------
+# time a phase
+#
+@contextlib.contextmanager
+def phase(name, category='phase', **arguments):
+    if not profile['enabled'] :
+        yield
+        return
+    start_time = time.time_ns() // 1000
+    try :
+        yield
+    finally :
+        event = {
+            'name' : name,
+            'cat' : category,
+            'ph' : 'X',
+            'ts' : start_time,
+            'dur' : time.time_ns() // 1000 - start_time,
+            'pid' : os.getpid(),
+            'tid' : 0
+        }
+        if arguments :
+            event['args'] = arguments
+        profile['events'].append(event)
+
+# ------------------------------------------------------------------------------
+# increment a counter
+#
+def count(name, increment=1):
+    if profile['enabled'] :
+        counters = profile['counters']
+        counters[name] = counters.get(name, 0) + increment
+
+# ------------------------------------------------------------------------------
+# take a snapshot of the recorded events and counters
+#
+def snapshot():
+    return(len(profile['events']), dict(profile['counters']))
+
+# ------------------------------------------------------------------------------
+# get the events and counter increments recorded since a snapshot
+#
+def changes_since(profile_snapshot):
+    (event_count, counters) = profile_snapshot
+    counter_increments = {}
+    for (name, value) in profile['counters'].items() :
+        if value != counters.get(name, 0) :
+            counter_increments[name] = value - counters.get(name, 0)
+
+    return(profile['events'][event_count:], counter_increments)
+
+# ------------------------------------------------------------------------------
+# add events and counters recorded by another process
+#
+def merge(events, counters):
+    profile['events'].extend(events)
+    for (name, value) in counters.items() :
+        count(name, value)
+
+# ------------------------------------------------------------------------------
+# write the Chrome trace file
+#
+#   The counters are added as a counter event at the end of the trace.
+#
+def write_trace(trace_file_spec):
+    events = list(profile['events'])
+    if events :
+        end_time = max([event['ts'] + event['dur'] for event in events])
+        events.append({
+            'name' : 'counters',
+            'ph' : 'C',
+            'ts' : end_time,
+            'pid' : os.getpid(),
+            'tid' : 0,
+            'args' : profile['counters']
+        })
+    trace_file = open(trace_file_spec, 'w')
+    json.dump({'traceEvents' : events, 'displayTimeUnit' : 'ms'}, trace_file)
+    trace_file.close()
+
+# ------------------------------------------------------------------------------
+# print the phase times and the counters
+#
+#   Phases of the same name are summed, the list follows the order of
+#   their first start.
+#
+def print_summary():
+    phases = {}
+    for event in sorted(profile['events'], key=lambda event: event['ts']) :
+        if event['name'] not in phases :
+            phases[event['name']] = [0, 0]
+        phases[event['name']][0] = phases[event['name']][0] + 1
+        phases[event['name']][1] = phases[event['name']][1] + event['dur']
+    print("\n%-48s %8s %12s" % ('phase', 'calls', 'time [ms]'))
+    for (name, (calls, duration)) in phases.items() :
+        print("%-48s %8d %12.3f" % (name[-48:], calls, duration / 1000))
+    if profile['counters'] :
+        print("\n%-48s %8s" % ('counter', 'value'))
+        for (name, value) in sorted(profile['counters'].items()) :
+            print("%-48s %8d" % (name, value))
+
+# ------------------------------------------------------------------------------
+# print the summary and write the trace file
+#
+def report(trace_file_spec):
+    print_summary()
+    write_trace(trace_file_spec)
+    print("\ntrace written to %s" % trace_file_spec)
@@ -6,615 +6,1047 @@
 # https://lepton-eda.github.io/lepton-manual.html/gEDA-file-format.html
 #
 import os
+import sys
 import argparse
-import re
+import io
+import geda
+import netlist
+import sym2vhd
+import profiling
                                                                      # constants
 INDENT = 2 * ' '
-
-# ==============================================================================
-# command line arguments
-#
-                                                             # specify arguments
-parser = argparse.ArgumentParser(
-  description='Convert a gEDA symbol to a VHDL entity'
-)
-                                                                    # input file
-parser.add_argument('input_file')
-                                                                  # VHDL library
-parser.add_argument(
-    '-l', '--library',
-    help = 'VHDL library'
-)
-                                                                # VHDL directory
-parser.add_argument(
-    '-d', '--directory',
-    help = 'VHDL files directory'
+PARSED_SECTIONS = (
+    'summary', 'components', 'nets', 'signals', 'text_blocks',
+    'parse_warnings'
 )
-                                                             # scratch directory
-parser.add_argument(
-    '-s', '--scratch', default='/tmp',
-    help = 'scratch directory'
-)
-                                                                # verbose output
-parser.add_argument(
-    '-v', '--verbose', action='store_true',
-    help = 'Verbose display'
-)
-                                                             # process arguments
-parser_arguments = parser.parse_args()
-
-schematics_file_spec = parser_arguments.input_file
-VHDL_library = parser_arguments.library
-VHDL_directory = parser_arguments.directory
-scratch_directory = parser_arguments.scratch
-verbose = parser_arguments.verbose
-
-schematics_file_path = os.path.dirname(schematics_file_spec)
-if VHDL_directory :
-    vhdl_file_path = VHDL_directory
-else :
-    path_list = schematics_file_path.split(os.sep)
-    path_list[-1] = 'Description'
-    vhdl_file_path = os.sep.join(path_list)
-schematics_name_parts = \
-    os.path.basename(schematics_file_spec).rstrip('.sch').split('-')
-library_name = schematics_name_parts.pop(0)
-architecture_name = schematics_name_parts.pop()
-symbol_name = '-'.join(schematics_name_parts)
-vhdl_file_spec = os.path.join(vhdl_file_path, "%s-%s-%s.vhd" %
-    (library_name, symbol_name, architecture_name)
-)
-if not VHDL_library :
-    VHDL_library = library_name
-                                                               # validity checks
-if not os.path.isfile(schematics_file_spec) :
-    print("schematics file %s not found" % schematics_file_spec)
-    quit()
-
-if not os.path.isdir(vhdl_file_path) :
-    print("VHDL directory %s not found" % vhdl_file_path)
-    quit()
-
-if not os.path.isdir(scratch_directory) :
-    print("scratch directory %s not found" % scratch_directory)
-    quit()
 
 # ==============================================================================
 # functions
 #
 # ------------------------------------------------------------------------------
-# aggregate unnamed nets to named nets
+# format a signal type with its range
 #
-def aggregate_one_unnamed_net(nets_labelled, nets_not_labelled):
-    super_verbose = False
-    found_item = []
-    for net_labelled in nets_labelled :
-        net_label = net_labelled[0]
-        if super_verbose :
-            print(INDENT + net_label)
-        for segment in range(1, len(net_labelled)-1) :
-            segment_start_x = net_labelled[segment][0]
-            segment_start_y = net_labelled[segment][1]
-            segment_end_x = net_labelled[segment+1][0]
-            segment_end_y = net_labelled[segment+1][1]
-                                                             # vertical segments
-            if segment_start_x == segment_end_x :
-                segment_x = segment_start_x
-                if super_verbose :
-                    print(2*INDENT + "vertical segment %d - [%d, %s]" % (
-                        segment_x, segment_start_y, segment_end_y
-                    ))
-                y_min = min(segment_start_y, segment_end_y)
-                y_max = max(segment_start_y, segment_end_y)
-                for net in range(len(nets_not_labelled)) :
-                    if not found_item :
-                        net_start_x = nets_not_labelled[net][0][0]
-                        net_end_x = nets_not_labelled[net][1][0]
-                        if net_start_x != net_end_x :
-                            net_y = nets_not_labelled[net][0][1]
-                                                         # test start of segment
-                            if net_start_x == segment_x :
-                                if (net_y >= y_min) and (net_y <= y_max) :
-                                    if verbose :
-                                        if super_verbose :
-                                            print(INDENT, end='')
-                                        else :
-                                            print(INDENT + "net %s" % net_label)
-                                        print(
-                                            2*INDENT +
-                                            "aggreagting net %d at [%d, %d]" % (
-                                                net, segment_x, net_y
-                                            )
-                                        )
-                                    nets_not_labelled.pop(net)
-                                    found_item = [
-                                        net_label,
-                                        [net_start_x, net_y],
-                                        [net_end_x, net_y]
-                                    ]
-                                                           # test end of segment
-                            if net_end_x == segment_x :
-                                if (net_y >= y_min) and (net_y <= y_max) :
-                                    if verbose :
-                                        if super_verbose :
-                                            print(INDENT, end='')
-                                        else :
-                                            print(INDENT + "net %s" % net_label)
-                                        print(
-                                            2*INDENT +
-                                            "aggreagting net %d at [%d, %d]" % (
-                                                net, segment_x, net_y
-                                            )
-                                        )
-                                    nets_not_labelled.pop(net)
-                                    found_item = [
-                                        net_label,
-                                        [net_start_x, net_y],
-                                        [net_end_x, net_y]
-                                    ]
-                                                           # horizontal segments
-            if segment_start_y == segment_end_y :
-                if super_verbose :
-                    print(2*INDENT + "horizontal segment %d - [%d, %s]" % (
-                        segment_start_y, segment_start_x, segment_end_x
-                    ))
-                x_min = min(segment_start_x, segment_end_x)
-                x_max = max(segment_start_x, segment_end_x)
-                for net in range(len(nets_not_labelled)) :
-                    if not found_item :
-                        net_start_y = nets_not_labelled[net][0][1]
-                        net_end_y = nets_not_labelled[net][1][1]
-                        if net_start_y != net_end_y :
-                            net_x = nets_not_labelled[net][0][0]
-                                                         # test start of segment
-                            if net_start_y == segment_start_y :
-                                if (net_x >= x_min) and (net_x <= x_max) :
-                                    if verbose :
-                                        if super_verbose :
-                                            print(INDENT, end='')
-                                        else :
-                                            print(INDENT + "net %s" % net_label)
-                                        print(
-                                            2*INDENT +
-                                            "aggreagting net %d at [%d, %d]" % (
-                                                net, net_x, net_start_y
-                                            )
-                                        )
-                                    nets_not_labelled.pop(net)
-                                    found_item = [
-                                        net_label,
-                                        [net_x, net_start_y],
-                                        [net_x, net_end_y]
-                                    ]
-                                                           # test end of segment
-                            if net_end_y == segment_start_y :
-                                if (net_x >= x_min) and (net_x <= x_max) :
-                                    if verbose :
-                                        if super_verbose :
-                                            print(INDENT, end='')
-                                        else :
-                                            print(INDENT + "net %s" % net_label)
-                                        print(
-                                            2*INDENT +
-                                            "aggreagting net %d at [%d, %d]" % (
-                                                net, net_x, net_start_y
-                                            )
-                                        )
-                                    nets_not_labelled.pop(net)
-                                    found_item = [
-                                        net_label,
-                                        [net_x, net_start_y],
-                                        [net_x, net_end_y]
-                                    ]
-    if found_item :
-        nets_labelled.append(found_item)
-    return(found_item)
+def format_signal_type(signal_type, signal_range):
+    if signal_range :
+        return("%s(%s)" % (signal_type, signal_range))
 
-# ==============================================================================
-# main script
+    return(signal_type)
+
+# ------------------------------------------------------------------------------
+# merge a type and a range into a signal
 #
-print("Converting %s to %s" % (schematics_file_spec, vhdl_file_spec))
+#   An empty type or range of the signal is taken from the given ones.
+#   Types are compared without case, ranges without case and spacing.
+#   Returns False if the given type or range conflicts with the signal's.
+#
+def merge_signal_type(signal, signal_type, signal_range):
+    if signal_type :
+        if not signal.type :
+            signal.type = signal_type
+        elif signal_type.lower() != signal.type.lower() :
+            return(False)
+    if signal_range :
+        if not signal.range :
+            signal.range = signal_range
+        elif signal_range.lower().split() != signal.range.lower().split() :
+            return(False)
+
+    return(True)
 
 # ------------------------------------------------------------------------------
-                                                                    # parse file
-if verbose :
-    print("\nParsing schematics file")
-done = False
-discard_next_read = False
-processing_component_start = False
-processing_component = False
-processing_net_start = False
-processing_net = False
-processing_text = False
-components = []
-nets_not_labelled = []
-nets_labelled = []
-signals = []
-component_location = [0, 0]
-net_start = [0, 0]
-net_end = [0, 0]
-text_blocks = []
-
-schematics_file = open(schematics_file_spec, 'r')
-while not done :
-                                                                # read next line
-    if not discard_next_read :
-        line = schematics_file.readline().rstrip("\r\n")
-    else :
-        discard_next_read = False
-                                                         # pre-process component
-    if processing_component_start :
-        if line.startswith('{') :
-            processing_component = True
-        processing_component_start = False
-                                                               # pre-process net
-    elif processing_net_start :
-        if line.startswith('{') :
-            processing_net = True
-        else :
-            nets_not_labelled.append([net_start.copy(), net_end.copy()])
-            if verbose :
-                print(INDENT + "net")
-                print(2*INDENT + "[%d, %d] - [%d, %d]" %
-                    (net_start[0], net_start[1], net_end[0], net_end[1])
-                )
-        processing_net_start = False
+# parse schematics file
+#
+#   Also returns the warnings about the nets declared with different types.
+#
+def parse_schematics(schematics_file_spec, verbose=False):
+    if verbose :
+        print("\nParsing schematics file")
+    components = []
+    nets = netlist.NetSegments()
+    signals = {}
+    text_blocks = []
+    warnings = []
+    for geda_object in geda.read_objects(schematics_file_spec) :
+        object_type = geda_object['type']
+        fields = geda_object['fields']
                                                                      # component
-    if processing_component :
-        value = '='.join((line + '= ').split('=')[1:-1])
-                                                               # component label
-        if line.startswith('refdes') :
-            component_label = value
+        if (object_type == 'C') and geda_object['attributes'] :
+            component = netlist.Component(
+                fields[-1].rstrip('.sym'), int(fields[0]), int(fields[1]),
+                fields[-1]
+            )
             if verbose :
-                print(2*INDENT + "label %s" % component_label)
+                print(INDENT + "at [%d, %d] : %s" % (
+                    component.x, component.y, component.name
+                ))
+            for (name, value) in geda_object['attributes'] :
+                                                               # component label
+                if name.startswith('refdes') :
+                    component.label = value
+                    if verbose :
+                        print(2*INDENT + "label %s" % value)
                                                               # component source
-        if line.startswith('source') :
-            component_source = value
-            if verbose :
-                print(2*INDENT + "source %s" % component_source)
+                if name.startswith('source') :
+                    component.source = value
+                    if verbose :
+                        print(2*INDENT + "source %s" % value)
                                                             # component generics
-        if line.startswith('generic') :
-            component_generics.append(value)
-            if verbose :
-                print(2*INDENT + "generic %s" % value)
-                                                       # component wrap together
-        if line.startswith('}') :
-            components.append({
-                'name' : component_name,
-                'label' : component_label,
-                'source' : component_source,
-                'generics' : component_generics,
-                'location' : component_location.copy()
-            })
-            processing_component = False
+                if name.startswith('generic') :
+                    component.generics.append(value)
+                    if verbose :
+                        print(2*INDENT + "generic %s" % value)
+            components.append(component)
                                                                            # net
-    elif processing_net :
-        value = line[line.find('=')+1:]
-                                                                      # net name
-        if line.startswith('netname') :
-            net_name = value
-            if verbose :
-                print(INDENT + "net %s" % net_name)
-                print(2*INDENT + "[%d, %d] - [%d, %d]" %
-                    (net_start[0], net_start[1], net_end[0], net_end[1])
-                )
-                                                                      # net type
-        if line.startswith('signaltype') :
-            net_type = value
-            if verbose :
-                print(2*INDENT + net_type)
-                                                                     # net range
-        if line.startswith('signalrange') :
-            net_range = value
+        elif (object_type == 'N') or (object_type == 'U') :
+            (x1, y1, x2, y2) = [int(field) for field in fields[:4]]
+            net_name = ''
+            net_type = ''
+            net_range = ''
+            for (name, value) in geda_object['attributes'] :
+                if name.startswith('netname') :
+                    net_name = value
+                if name.startswith('signaltype') :
+                    net_type = value
+                if name.startswith('signalrange') :
+                    net_range = value
             if verbose :
-                print(2*INDENT + "(%s)" % net_range)
-                                                             # net wrap together
-        if line.startswith('}') :
-            nets_labelled.append([net_name, net_start.copy(), net_end.copy()])
-            signals.append([net_name, net_type, net_range])
-            processing_net = False
+                print(INDENT + ("net %s" % net_name).rstrip())
+                print(2*INDENT + "[%d, %d] - [%d, %d]" % (x1, y1, x2, y2))
+                                                                     # net label
+            if net_name :
+                if verbose and net_type :
+                    print(2*INDENT + net_type)
+                if verbose and net_range :
+                    print(2*INDENT + "(%s)" % net_range)
+                if net_name not in signals :
+                    signals[net_name] = netlist.Signal(net_name)
+                if not merge_signal_type(
+                    signals[net_name], net_type, net_range
+                ) :
+                    warnings.append("net %s declared as %s and as %s" % (
+                        net_name,
+                        format_signal_type(
+                            signals[net_name].type, signals[net_name].range
+                        ),
+                        format_signal_type(net_type, net_range)
+                    ))
+            nets.append(net_name, x1, y1, x2, y2)
                                                                           # text
-    elif processing_text :
-        if re.search('\A[A-Z]\s', line) or not line :
-            text_block = text_block[:-1]
+        elif object_type == 'T' :
+            text_block = "\n".join(geda_object['text'])
             text_blocks.append(text_block)
             if verbose :
                 print(INDENT + "text")
                 print(text_block)
-            discard_next_read = True
-            processing_text = False
-        text_block = text_block + line + "\n"
-    else :
-                                                            # schematics element
-        if line.startswith('C ') :
-            component_info = line.split(' ')
-            component_location[0] = int(component_info[1])
-            component_location[1] = int(component_info[2])
-            component_name = component_info[-1].rstrip('.sym')
-            component_label = ''
-            component_generics = []
-            if verbose :
-                print(INDENT + "at [%d, %d] : %s" % (
-                    component_location[0], component_location[0], component_name
-                ))
-            processing_component_start = True
-        elif line.startswith('N ') or line.startswith('U ') :
-            net_info = line.split(' ')
-            net_start[0] = int(net_info[1])
-            net_start[1] = int(net_info[2])
-            net_end[0] = int(net_info[3])
-            net_end[1] = int(net_info[4])
-            net_type = ''
-            net_range = ''
-            processing_net_start = True
-        elif line.startswith('T ') :
-            text_block = ''
-            processing_text = True
-    if not line :
-        done = True
-
-print(components)
+
+    return(components, nets, signals, text_blocks, warnings)
+
+# ------------------------------------------------------------------------------
+# find the group a net segment belongs to
+#
+def find_net_group(net_groups, segment):
+                                                                 # find the root
+    root = segment
+    while net_groups[root] != root :
+        root = net_groups[root]
+                                                             # compress the path
+    while net_groups[segment] != root :
+        (net_groups[segment], segment) = (root, net_groups[segment])
+    return(root)
+
+# ------------------------------------------------------------------------------
+# merge the groups of two net segments
+#
+def merge_net_groups(net_groups, segment_1, segment_2):
+    root_1 = find_net_group(net_groups, segment_1)
+    root_2 = find_net_group(net_groups, segment_2)
+                                          # keep the first segment as group root
+    if root_1 < root_2 :
+        net_groups[root_2] = root_1
+    elif root_2 < root_1 :
+        net_groups[root_1] = root_2
+
 # ------------------------------------------------------------------------------
-                                                                # aggregate nets
-if verbose :
-    print("\nAggregating nets")
-unlabelled_id = 0
-done_unlabelled = False
-while not done_unlabelled :
-                                                       # aggregate labelled nets
-    continue_search = True
-    while continue_search :
-        continue_search = aggregate_one_unnamed_net(
-            nets_labelled, nets_not_labelled
+# connect segment endpoints lying on a horizontal or vertical line
+#
+def sweep_net_line(net_groups, events):
+    merged_segment = -1
+    merged_count = 0
+    pending_segments = set()
+    for (position, event, segment) in sorted(events) :
+                                                           # segment enters line
+        if event == 0 :
+            pending_segments.add(segment)
+                                               # endpoint on all active segments
+        elif event == 1 :
+            if pending_segments or merged_count :
+                for active_segment in pending_segments :
+                    merge_net_groups(net_groups, active_segment, segment)
+                merged_count = merged_count + len(pending_segments)
+                pending_segments.clear()
+                if merged_segment >= 0 :
+                    merge_net_groups(net_groups, merged_segment, segment)
+                merged_segment = segment
+                                                           # segment leaves line
+        else :
+            if segment in pending_segments :
+                pending_segments.discard(segment)
+            else :
+                merged_count = merged_count - 1
+                if merged_count == 0 :
+                    merged_segment = -1
+
+# ------------------------------------------------------------------------------
+# aggregate unnamed nets to named nets
+#
+#   Segments are connected when they share an endpoint or when the endpoint
+#   of one lies on the other (T-junction).
+#   A group takes the name of its first labelled segment,
+#   groups without label are named net0, net1, ... in file order.
+#   The names of the unlabelled segments are set in place.
+#
+def aggregate_nets(nets, verbose=False):
+    net_names = nets.names
+    net_groups = list(range(len(nets)))
+                                                      # connect common endpoints
+    endpoints = {}
+    for index in range(len(nets)) :
+        for point in (nets.start(index), nets.end(index)) :
+            if point in endpoints :
+                merge_net_groups(net_groups, endpoints[point], index)
+            else :
+                endpoints[point] = index
+                                                 # index horizontal and vertical
+    rows = {}
+    columns = {}
+    for index in range(len(nets)) :
+        (start, end) = (nets.start(index), nets.end(index))
+        if start[1] == end[1] :
+            line = rows.setdefault(start[1], [])
+            line.append((min(start[0], end[0]), 0, index))
+            line.append((max(start[0], end[0]), 2, index))
+        elif start[0] == end[0] :
+            line = columns.setdefault(start[0], [])
+            line.append((min(start[1], end[1]), 0, index))
+            line.append((max(start[1], end[1]), 2, index))
+                                                              # find T-junctions
+    for (point, index) in endpoints.items() :
+        if point[1] in rows :
+            rows[point[1]].append((point[0], 1, index))
+        if point[0] in columns :
+            columns[point[0]].append((point[1], 1, index))
+    for line in list(rows.values()) + list(columns.values()) :
+        sweep_net_line(net_groups, line)
+                                                                   # name groups
+    group_names = {}
+    unlabelled_segments = []
+    for index in range(len(nets)) :
+        if net_names[index] :
+            root = find_net_group(net_groups, index)
+            if root not in group_names :
+                group_names[root] = net_names[index]
+        else :
+            unlabelled_segments.append(index)
+    unlabelled_id = 0
+    for index in unlabelled_segments :
+        root = find_net_group(net_groups, index)
+        if root not in group_names :
+            group_names[root] = sys.intern("net%d" % unlabelled_id)
+            unlabelled_id = unlabelled_id + 1
+        net_names[index] = group_names[root]
+        (start, end) = (nets.start(index), nets.end(index))
+        if verbose :
+            print(INDENT + "net %s" % group_names[root])
+            print(2*INDENT + "aggregating [%d, %d] - [%d, %d]" % (
+                start[0], start[1], end[0], end[1]
+            ))
+
+    return(nets)
+
+# ------------------------------------------------------------------------------
+# index net names by segment endpoint
+#
+def index_net_endpoints(nets):
+    net_endpoints = {}
+    for index in range(len(nets)) :
+        for point in {nets.start(index), nets.end(index)} :
+            net_endpoints.setdefault(point, []).append(nets.names[index])
+
+    return(net_endpoints)
+
+# ------------------------------------------------------------------------------
+# find the port locations file of a symbol
+#
+def find_port_locations_file_spec(symbol_name, scratch_directory):
+    return(os.sep.join([
+        scratch_directory, symbol_name + "-port_locations.txt"
+    ]))
+
+# ------------------------------------------------------------------------------
+# find the interface of a component symbol
+#
+#   The interfaces are cached per symbol, the port locations file is only
+#   read for symbols which have not been converted in the same process.
+#
+def find_symbol_interface(symbol_name, symbol_interfaces, scratch_directory):
+    profiling.count('interface lookups')
+    if symbol_name not in symbol_interfaces :
+        profiling.count('interface file reads')
+        port_locations_file_spec = find_port_locations_file_spec(
+            symbol_name, scratch_directory
+        )
+        if not os.path.isfile(port_locations_file_spec) :
+            print(
+                "port location file %s not found" % port_locations_file_spec
+            )
+            return(None)
+        symbol_interfaces[symbol_name] = netlist.Interface(
+            symbol_name, [],
+            sym2vhd.read_port_locations(port_locations_file_spec)
         )
-                                                    # label first unlabelled net
-    if nets_not_labelled :
-        nets_labelled.append([
-            "net%d" % unlabelled_id,
-            nets_not_labelled[0][0],
-            nets_not_labelled[0][1]
-        ])
-        nets_not_labelled.pop(0)
-        unlabelled_id = unlabelled_id + 1
-    else :
-        done_unlabelled = True
+
+    return(symbol_interfaces[symbol_name])
 
 # ------------------------------------------------------------------------------
-                                                            # connect components
-if verbose :
-    print("\nConnecting components")
-port_connections = []
-for component in components :
-    component_name = component['name']
-    component_location = component['location']
+# connect component ports to nets
+#
+#   Returns the warnings about the ports connected to several nets, None
+#   if the interface of a symbol is not found.
+#
+def connect_components(
+    components, nets, symbol_interfaces, scratch_directory, verbose=False
+):
     if verbose :
-        print(INDENT + component_name)
-                                                 # read port locations from file
-    port_locations_file_spec = os.sep.join([
-        scratch_directory,component_name + "-port_locations.txt"
-    ])
-    if not os.path.isfile(port_locations_file_spec) :
-        print("port location file %s not found" % port_locations_file_spec)
-        quit()
-    port_locations_file = open(port_locations_file_spec, 'r')
-    locations = port_locations_file.read().replace("\r", "\n").split("\n")
-    port_locations_file.close()
-    for location in locations :
-        location_trimmed = location.replace('[', '').replace(']', '')
-        location_trimmed = location_trimmed.replace(',', '')
-        location_list = location_trimmed.split(' ')
-        if len(location_list) >= 4 :
-            port_name = location_list[0]
-            port_type = ' '.join(location_list[1:-2])
-            port_coordinates = [
-                component_location[0] + int(location_list[-2]),
-                component_location[1] + int(location_list[-1])
-            ]
-            for net in nets_labelled :
-                net_name = net[0]
-                net_start = net[1]
-                net_end = net[2]
-                                          # test if net and port locations match
-                if \
-                    (net_start == port_coordinates) or \
-                    (net_end == port_coordinates)      \
-                :
-                    if verbose :
-                        print(2*INDENT + "%s - %s" % (port_name, net_name))
-                    port_connections.append(
-                        [component_name, port_name, net_name]
+        print("\nConnecting components")
+    net_endpoints = index_net_endpoints(nets)
+    warnings = []
+    for component in components :
+        component_name = component.name
+        port_connections = {}
+        if verbose :
+            print(INDENT + component_name)
+                                                         # find symbol interface
+        interface = find_symbol_interface(
+            component_name, symbol_interfaces, scratch_directory
+        )
+        if not interface :
+            return(None)
+        component.interface = interface
+        profiling.count('component ports', len(interface.ports))
+        for port in interface.ports :
+            port_name = port.name
+            port_coordinates = (component.x + port.x, component.y + port.y)
+                                             # find nets ending at port location
+            connected_nets = net_endpoints.get(port_coordinates, [])
+            port_connections[port_name] = 'open'
+            for net_name in connected_nets :
+                if verbose :
+                    print(2*INDENT + "%s - %s" % (port_name, net_name))
+                port_connections[port_name] = net_name
+                                               # report multiply connected ports
+            if len(set(connected_nets)) > 1 :
+                warnings.append(
+                    "port %s of %s connected to nets %s" % (
+                        port_name, component.label or component_name,
+                        ', '.join(sorted(set(connected_nets)))
                     )
-                                  # test if signal needs type and rage from port
-                    for signal in signals :
-                        if signal[0] == net_name :
-                            if not signal[1] :
-                                type_list = port_type.split('(')
-                                signal_type = type_list[0]
-                                signal[1] = signal_type
-                                if not signal[2] :
-                                    signal_range = ''
-                                    if len(type_list) > 1 :
-                                        signal_range = type_list[1].rstrip(')')
-                                    signal[2] = signal_range
+                )
+        component.connections = port_connections
+
+    return(warnings)
+
+# ------------------------------------------------------------------------------
+# propagate the port types to the signals
+#
+#   Each connected net gets a signal, the unlabelled nets included.
+#   The declared type and range of a net take precedence, the missing
+#   ones are taken from the first port connected to it. Each port
+#   connection is visited once.
+#   Returns the warnings about the ports whose type or range differs from
+#   the one of their net.
+#
+def propagate_signal_types(components, signals, verbose=False):
+    if verbose :
+        print("\nPropagating signal types")
+    warnings = []
+    for component in components :
+        for port in component.interface.ports :
+            net_name = component.connections[port.name]
+            if net_name == 'open' :
+                continue
+            if net_name not in signals :
+                signals[net_name] = netlist.Signal(net_name)
+            signal = signals[net_name]
+            port_range = port.range.strip()
+            if port_range.startswith('(') and port_range.endswith(')') :
+                port_range = port_range[1:-1]
+            if not merge_signal_type(signal, port.type, port_range) :
+                profiling.count('signal type conflicts')
+                warnings.append("port %s of %s is %s, net %s is %s" % (
+                    port.name, component.label or component.name,
+                    format_signal_type(port.type, port_range),
+                    net_name, format_signal_type(signal.type, signal.range)
+                ))
+            elif verbose :
+                print(INDENT + "%s : %s" % (
+                    net_name, format_signal_type(signal.type, signal.range)
+                ))
+
+    return(warnings)
+
+# ------------------------------------------------------------------------------
+# find the signals without type
+#
+#   Such a signal can't be declared: its net has no signaltype attribute
+#   and isn't connected to any component port.
+#
+def find_untyped_signals(signals):
+    untyped_signals = []
+    for signal in signals.values() :
+        if not signal.type :
+            untyped_signals.append(signal.name)
+
+    return(untyped_signals)
 
 # ------------------------------------------------------------------------------
-                                                            # write architecture
-if verbose :
-    print("\nWriting architecture")
-vhdl_file = open(vhdl_file_spec, 'w')
+# write architecture
+#
+#   Each component is declared once, in the order of its first instance.
+#   The file is only replaced if its contents change.
+#   Returns True if the file has been written.
+#
+def write_architecture(
+    vhdl_file_spec, VHDL_library, library_name, symbol_name, architecture_name,
+    components, signals, text_blocks, verbose=False
+):
+    if verbose :
+        print("\nWriting architecture")
+    vhdl_file = io.StringIO()
                                                                      # libraries
-vhdl_file.write("library %s;\n" % VHDL_library)
-use_1164 = False
-use_numeric_std = False
-for signal in signals :
-    signal_type = signal[1].lower()
-    if signal_type.startswith('std_logic') :
-        use_1164 = True
-    if signal_type.startswith('std_ulogic') :
-        use_1164 = True
-    if signal_type == 'unsigned' :
-        use_numeric_std = True
-    if signal_type == 'signed' :
-        use_numeric_std = True
-if use_1164 or use_numeric_std :
-    vhdl_file.write("library ieee;\n")
-if use_1164 :
-    vhdl_file.write(INDENT + "use ieee.std_logic_1164.all;\n")
-if use_numeric_std :
-    vhdl_file.write(INDENT + "use ieee.numeric_std.all;\n")
-vhdl_file.write("\n")
+    vhdl_file.write("library %s;\n" % VHDL_library)
+    use_1164 = False
+    use_numeric_std = False
+    for signal in signals.values() :
+        signal_type = signal.type.lower()
+        if signal_type.startswith('std_logic') :
+            use_1164 = True
+        if signal_type.startswith('std_ulogic') :
+            use_1164 = True
+        if signal_type == 'unsigned' :
+            use_numeric_std = True
+        if signal_type == 'signed' :
+            use_numeric_std = True
+    if use_1164 or use_numeric_std :
+        vhdl_file.write("library ieee;\n")
+    if use_1164 :
+        vhdl_file.write(INDENT + "use ieee.std_logic_1164.all;\n")
+    if use_numeric_std :
+        vhdl_file.write(INDENT + "use ieee.numeric_std.all;\n")
+    vhdl_file.write("\n")
                                                             # architecture start
-vhdl_file.write(
-    "architecture %s of %s_%s is\n" %
-    (architecture_name, library_name, symbol_name)
-)
+    vhdl_file.write(
+        "architecture %s of %s_%s is\n" %
+        (architecture_name, library_name, symbol_name)
+    )
                                                         # pre-begin declarations
-remaining_text_blocks = []
-for embedded_text in text_blocks :
-    if embedded_text.startswith('architecture start') :
-        vhdl_file.write("\n")
-        start_code = embedded_text.split("\n")
-        for line in start_code[1:] :
-            vhdl_file.write(INDENT + line + "\n")
-    else :
-        remaining_text_blocks.append(embedded_text)
-if verbose :
-    if len(remaining_text_blocks) < len(text_blocks) :
-        print(INDENT + 'start code')
-text_blocks = remaining_text_blocks
-                                                                       # signals
-if signals :
+    remaining_text_blocks = []
+    for embedded_text in text_blocks :
+        if embedded_text.startswith('architecture start') :
+            vhdl_file.write("\n")
+            start_code = embedded_text.split("\n")
+            for line in start_code[1:] :
+                vhdl_file.write(INDENT + line + "\n")
+        else :
+            remaining_text_blocks.append(embedded_text)
     if verbose :
-        print(INDENT + "signals :")
-    vhdl_file.write("\n")
-    for signal in signals :
-        signal_name = signal[0]
-        signal_type = signal[1]
-        if signal[2] :
-            signal_type = "%s(%s)" % (signal_type, signal[2])
+        if len(remaining_text_blocks) < len(text_blocks) :
+            print(INDENT + 'start code')
+    text_blocks = remaining_text_blocks
+                                                                       # signals
+    if signals :
         if verbose :
-            print(2*INDENT + "%s : %s" % (signal_name, signal_type))
-        vhdl_file.write(
-            INDENT + "signal %s : %s;\n" % (signal_name, signal_type)
-        )
+            print(INDENT + "signals :")
+        vhdl_file.write("\n")
+        for signal in signals.values() :
+            signal_name = signal.name
+            signal_type = format_signal_type(signal.type, signal.range)
+            if verbose :
+                print(2*INDENT + "%s : %s" % (signal_name, signal_type))
+            vhdl_file.write(
+                INDENT + "signal %s : %s;\n" % (signal_name, signal_type)
+            )
                                                                     # components
-if components :
-    if verbose :
-        print(INDENT + "component declarations :")
-    vhdl_file.write("\n")
-    for component in components :
-        component_name = component['name']
-        vhdl_component_name = component_name.replace('-', '_')
+    if components :
         if verbose :
-            print(2*INDENT + component_name)
+            print(INDENT + "component declarations :")
+        vhdl_file.write("\n")
+        declared_components = set()
+        for component in components :
+            component_name = component.name
+            if component_name in declared_components :
+                continue
+            declared_components.add(component_name)
+            vhdl_component_name = component_name.replace('-', '_')
+            if verbose :
+                print(2*INDENT + component_name)
                                                                      # component
-        component_name = component['name']
-        vhdl_file.write(INDENT + "component %s\n" % vhdl_component_name)
+            vhdl_file.write(INDENT + "component %s\n" % vhdl_component_name)
                                                                       # generics
-        component_generics = component['generics']
-        if component_generics :
-            separator = ';'
-            vhdl_file.write(2*INDENT + "generic(\n")
-            for index in range(len(component_generics)) :
-                if index == len(component_generics)-1 :
-                    separator = ''
-                vhdl_file.write(
-                    3*INDENT + "%s%s\n" % (component_generics[index], separator)
-                )
-            vhdl_file.write(2*INDENT + ");\n")
+            component_generics = component.generics
+            if component_generics :
+                separator = ';'
+                vhdl_file.write(2*INDENT + "generic(\n")
+                for index in range(len(component_generics)) :
+                    if index == len(component_generics)-1 :
+                        separator = ''
+                    vhdl_file.write(3*INDENT + "%s%s\n" % (
+                        component_generics[index], separator
+                    ))
+                vhdl_file.write(2*INDENT + ");\n")
                                                                          # ports
-        ports_file_spec = os.sep.join([
-            scratch_directory,component_name + "-port_locations.txt"
-        ])
-        ports_file = open(ports_file_spec, 'r')
-        ports = ports_file.read().replace("\r", "\n").split("\n")
-        ports_file.close()
-        while (len(ports) > 0) and (not ports[-1]) :
-            ports.pop()
-        if ports :
-            separator = ';'
-            vhdl_file.write(2*INDENT + "port(\n")
-            for index in range(len(ports)) :
-                port_code = ports[index].split('[', 1)[0].rstrip(' ')
-                port_code = port_code.replace(' ', ' : ', 1)
-                if index == len(ports)-1 :
-                    separator = ''
-                vhdl_file.write(3*INDENT + "%s%s\n" % (port_code, separator))
-            vhdl_file.write(2*INDENT + ");\n")
+            ports = component.interface.ports
+            if ports :
+                separator = ';'
+                vhdl_file.write(2*INDENT + "port(\n")
+                for index in range(len(ports)) :
+                    port_code = "%s : %s%s" % (
+                        ports[index].name,
+                        ports[index].type,
+                        ports[index].range
+                    )
+                    if index == len(ports)-1 :
+                        separator = ''
+                    vhdl_file.write(
+                        3*INDENT + "%s%s\n" % (port_code, separator)
+                    )
+                vhdl_file.write(2*INDENT + ");\n")
 
                                                                            # end
-        vhdl_file.write(INDENT + "end component %s;\n\n" % vhdl_component_name)
+            vhdl_file.write(
+                INDENT + "end component %s;\n\n" % vhdl_component_name
+            )
                                                             # architecture begin
-vhdl_file.write("begin\n")
+    vhdl_file.write("begin\n")
                                                              # component mapping
-if components :
-    if verbose :
-        print(INDENT + "component mappings :")
-    vhdl_file.write("\n")
-    for component in components :
-        component_name = component['name']
-        vhdl_component_name = component_name.replace('-', '_')
+    if components :
         if verbose :
-            print(2*INDENT + component_name)
+            print(INDENT + "component mappings :")
+        vhdl_file.write("\n")
+        for component in components :
+            component_name = component.name
+            vhdl_component_name = component_name.replace('-', '_')
+            if verbose :
+                print(2*INDENT + component_name)
                                                                          # label
-        component_label = component['label']
-        vhdl_file.write(INDENT)
-        if component_label :
-            vhdl_file.write(component_label + ' : ')
+            component_label = component.label
+            vhdl_file.write(INDENT)
+            if component_label :
+                vhdl_file.write(component_label + ' : ')
                                                                      # component
-        vhdl_file.write("%s\n" % vhdl_component_name)
+            vhdl_file.write("%s\n" % vhdl_component_name)
                                                                # generic mapping
-        component_generics = component['generics']
-        if component_generics :
-            separator = ','
-            vhdl_file.write(2*INDENT + "generic map(\n")
-            for index in range(len(component_generics)) :
-                generics_info = component_generics[index].split(':')
-                generic_name = generics_info[0].rstrip(' ')
-                generic_mapping = generics_info[-1].lstrip('= ')
-                if index == len(component_generics)-1 :
-                    separator = ''
-                vhdl_file.write(
-                    3*INDENT + "%s => %s%s\n" %
-                    (generic_name, generic_mapping, separator)
-                )
-            vhdl_file.write(2*INDENT + ")\n")
+            component_generics = component.generics
+            if component_generics :
+                separator = ','
+                vhdl_file.write(2*INDENT + "generic map(\n")
+                for index in range(len(component_generics)) :
+                    generics_info = component_generics[index].split(':')
+                    generic_name = generics_info[0].rstrip(' ')
+                    generic_mapping = generics_info[-1].lstrip('= ')
+                    if index == len(component_generics)-1 :
+                        separator = ''
+                    vhdl_file.write(
+                        3*INDENT + "%s => %s%s\n" %
+                        (generic_name, generic_mapping, separator)
+                    )
+                vhdl_file.write(2*INDENT + ")\n")
                                                                   # port mapping
-        if ports :
-            separator = ','
-            vhdl_file.write(2*INDENT + "port map(\n")
-            for index in range(len(ports)) :
-                port_name = ports[index].split(' ', 1)[0]
-                connected_signal = ''
-                for port_connection in port_connections :
-                    if \
-                        (port_connection[0] == component_name) and \
-                        (port_connection[1] == port_name)          \
-                    :
-                        connected_signal = port_connection[2]
-                    if not connected_signal :
-                        connected_signal = 'open'
-                if index == len(ports)-1 :
-                    separator = ''
-                vhdl_file.write(
-                    3*INDENT + "%s => %s%s\n" %
-                    (port_name, connected_signal, separator)
-                )
-            vhdl_file.write(2*INDENT + ");\n")
-        vhdl_file.write("\n")
-                                                                 # embedded code
-found_embedded_code = False
-if text_blocks :
-    for embedded_text in text_blocks :
-        if embedded_text.startswith('embedded code') :
-            start_code = embedded_text.split("\n")
-            for line in start_code[1:] :
-                vhdl_file.write(INDENT + line + "\n")
+            port_connections = component.connections
+            if port_connections :
+                separator = ','
+                vhdl_file.write(2*INDENT + "port map(\n")
+                for (index, port_name) in enumerate(port_connections) :
+                    if index == len(port_connections)-1 :
+                        separator = ''
+                    vhdl_file.write(
+                        3*INDENT + "%s => %s%s\n" %
+                        (port_name, port_connections[port_name], separator)
+                    )
+                vhdl_file.write(2*INDENT + ");\n")
             vhdl_file.write("\n")
-            found_embedded_code = True
-if found_embedded_code :
-    if verbose :
-        print(INDENT + 'embedded code')
+                                                                 # embedded code
+    found_embedded_code = False
+    if text_blocks :
+        for embedded_text in text_blocks :
+            if embedded_text.startswith('embedded code') :
+                start_code = embedded_text.split("\n")
+                for line in start_code[1:] :
+                    vhdl_file.write(INDENT + line + "\n")
+                vhdl_file.write("\n")
+                found_embedded_code = True
+    if found_embedded_code :
+        if verbose :
+            print(INDENT + 'embedded code')
                                                               # architecture end
-vhdl_file.write("end %s;\n" % architecture_name)
-vhdl_file.close()
+    vhdl_file.write("end %s;\n" % architecture_name)
+
+    return(
+        geda.write_file_if_changed(vhdl_file_spec, vhdl_file.getvalue())
+    )
+
+# ------------------------------------------------------------------------------
+# find the file generated from a schematic
+#
+def find_file_specs(schematics_file_spec, VHDL_directory=''):
+    schematics_file_path = os.path.dirname(schematics_file_spec)
+    if VHDL_directory :
+        vhdl_file_path = VHDL_directory
+    else :
+        path_list = schematics_file_path.split(os.sep)
+        path_list[-1] = 'Description'
+        vhdl_file_path = os.sep.join(path_list)
+    schematics_name_parts = \
+        os.path.basename(schematics_file_spec).rstrip('.sch').split('-')
+    library_name = schematics_name_parts.pop(0)
+    architecture_name = schematics_name_parts.pop()
+    symbol_name = '-'.join(schematics_name_parts)
+    vhdl_file_spec = os.path.join(vhdl_file_path, "%s-%s-%s.vhd" %
+        (library_name, symbol_name, architecture_name)
+    )
+
+    return(library_name, symbol_name, architecture_name, vhdl_file_spec)
+
+# ------------------------------------------------------------------------------
+# find the netlist file of a schematic
+#
+def find_netlist_file_spec(schematics_file_spec, scratch_directory):
+    netlist_name = os.path.basename(schematics_file_spec)
+    if netlist_name.endswith('.sch') :
+        netlist_name = netlist_name[:-len('.sch')]
+
+    return(os.path.join(scratch_directory, netlist_name + '-netlist.json'))
+
+# ------------------------------------------------------------------------------
+# find the stamps of the port locations files of the instantiated symbols
+#
+def find_interface_stamps(components, scratch_directory):
+    interface_stamps = {}
+    for component in components :
+        if component.name not in interface_stamps :
+            interface_stamps[component.name] = geda.find_file_stamp(
+                find_port_locations_file_spec(
+                    component.name, scratch_directory
+                )
+            )
+
+    return(interface_stamps)
+
+# ------------------------------------------------------------------------------
+# parse a schematics file and aggregate its nets
+#
+def read_schematics(schematics_file_spec, verbose=False):
+    with profiling.phase('parse schematics') :
+        (components, nets, signals, text_blocks, warnings) = \
+            parse_schematics(schematics_file_spec, verbose)
+    profiling.count('components', len(components))
+    profiling.count('net segments', len(nets))
+    if verbose :
+        print("\nAggregating nets")
+    with profiling.phase('aggregate nets') :
+        aggregate_nets(nets, verbose)
+    if profiling.is_enabled() :
+        profiling.count('nets', len(set(nets.names)))
+
+    return(components, nets, signals, text_blocks, warnings)
+
+# ------------------------------------------------------------------------------
+# store a parsed schematic as netlist sections
+#
+#   The parse warnings are stored to be reported again when the sections
+#   are loaded.
+#
+def store_parsed_sections(components, nets, signals, text_blocks, warnings):
+    stored_components = []
+    for component in components :
+        stored_components.append([
+            component.symbol, component.name, component.label,
+            component.source, component.generics, component.x, component.y
+        ])
+    stored_signals = []
+    for signal in signals.values() :
+        stored_signals.append([signal.name, signal.type, signal.range])
+
+    return({
+        'summary' : {
+            'components' : len(components),
+            'net_segments' : len(nets),
+            'nets' : len(set(nets.names))
+        },
+        'components' : stored_components,
+        'nets' : {
+            'names' : nets.names,
+            'coordinates' : nets.coordinates.tolist()
+        },
+        'signals' : stored_signals,
+        'text_blocks' : text_blocks,
+        'parse_warnings' : warnings
+    })
+
+# ------------------------------------------------------------------------------
+# store the connections of a schematic as netlist sections
+#
+#   The signals are the ones with the types propagated from the ports.
+#   The connection warnings are stored to be reported again when the
+#   connections are loaded.
+#
+def store_connected_sections(components, signals, warnings):
+    connections = []
+    interfaces = {}
+    for component in components :
+        connections.append(component.connections)
+        if component.name not in interfaces :
+            ports = []
+            for port in component.interface.ports :
+                ports.append([
+                    port.name, port.type, port.range, port.direction,
+                    port.x, port.y
+                ])
+            interfaces[component.name] = [component.interface.generics, ports]
+    connected_signals = []
+    for signal in signals.values() :
+        connected_signals.append([signal.name, signal.type, signal.range])
+
+    return({
+        'connections' : connections,
+        'interfaces' : interfaces,
+        'connected_signals' : connected_signals,
+        'connection_warnings' : warnings
+    })
+
+# ------------------------------------------------------------------------------
+# write the netlist of a schematic
+#
+#   The stamp of the schematic is the one it had when it was parsed.
+#   The interface stamps are only given with the connected sections.
+#
+def write_netlist(
+    netlist_file_spec, schematics_file_spec, source_stamp, sections,
+    interface_stamps=None
+):
+    profiling.count('netlists written')
+    geda.write_file_if_changed(netlist_file_spec, netlist.format_netlist(
+        {
+            'source' : schematics_file_spec,
+            'source_stamp' : source_stamp,
+            'interface_stamps' : interface_stamps
+        },
+        sections
+    ))
+
+# ------------------------------------------------------------------------------
+# read the netlist of a schematic
+#
+#   Returns None if there is no netlist for the schematic in its current
+#   state.
+#
+def read_netlist(netlist_file_spec, source_stamp):
+    stored_netlist = netlist.read_netlist(netlist_file_spec)
+    if not stored_netlist :
+        return(None)
+    if stored_netlist.header.get('source_stamp') != source_stamp :
+        return(None)
+    profiling.count('netlists read')
+
+    return(stored_netlist)
+
+# ------------------------------------------------------------------------------
+# load the components of a netlist
+#
+def load_components(stored_netlist):
+    components = []
+    for (symbol, name, label, source, generics, x, y) in \
+        stored_netlist.section('components') \
+    :
+        component = netlist.Component(name, x, y, symbol)
+        component.label = label
+        component.source = source
+        component.generics = generics
+        components.append(component)
+
+    return(components)
+
+# ------------------------------------------------------------------------------
+# load the signals of a netlist
+#
+def load_signals(stored_netlist, section_name='signals'):
+    signals = {}
+    for (name, signal_type, signal_range) in \
+        stored_netlist.section(section_name) \
+    :
+        signals[name] = netlist.Signal(name, signal_type, signal_range)
+
+    return(signals)
+
+# ------------------------------------------------------------------------------
+# load the net segments of a netlist
+#
+def load_nets(stored_netlist):
+    stored_nets = stored_netlist.section('nets')
+    nets = netlist.NetSegments()
+    for name in stored_nets['names'] :
+        nets.names.append(sys.intern(name))
+    nets.coordinates.fromlist(stored_nets['coordinates'])
+
+    return(nets)
+
+# ------------------------------------------------------------------------------
+# load the port connections of a netlist into its components
+#
+def load_connections(stored_netlist, components):
+    interfaces = {}
+    for (symbol_name, (generics, ports)) in \
+        stored_netlist.section('interfaces').items() \
+    :
+        interface_ports = []
+        for port_fields in ports :
+            interface_ports.append(netlist.Port(*port_fields))
+        interfaces[symbol_name] = netlist.Interface(
+            symbol_name, generics, interface_ports
+        )
+    for (component, connections) in \
+        zip(components, stored_netlist.section('connections')) \
+    :
+        component.interface = interfaces[component.name]
+        component.connections = connections
+
+# ------------------------------------------------------------------------------
+# find the components of a schematic
+#
+#   The components are taken from the netlist of the schematic if it is
+#   up to date. Otherwise the schematic is parsed and its netlist written,
+#   without the connections: they need the symbol interfaces.
+#   Without use_netlist, the schematic is always parsed.
+#   Returns the components and the netlist summary.
+#
+def read_components(
+    schematics_file_spec, scratch_directory, use_netlist=True, verbose=False
+):
+    netlist_file_spec = find_netlist_file_spec(
+        schematics_file_spec, scratch_directory
+    )
+    source_stamp = geda.find_file_stamp(schematics_file_spec)
+    stored_netlist = None
+    if use_netlist :
+        stored_netlist = read_netlist(netlist_file_spec, source_stamp)
+    if stored_netlist :
+        return(
+            load_components(stored_netlist), stored_netlist.section('summary')
+        )
+    (components, nets, signals, text_blocks, parse_warnings) = \
+        read_schematics(schematics_file_spec, verbose)
+    sections = store_parsed_sections(
+        components, nets, signals, text_blocks, parse_warnings
+    )
+    write_netlist(
+        netlist_file_spec, schematics_file_spec, source_stamp, sections
+    )
+
+    return(components, sections['summary'])
+
+# ------------------------------------------------------------------------------
+# convert a schematic to a VHDL architecture
+#
+#   The schematic is only parsed if its netlist in the scratch directory
+#   is out of date, and connected if the netlist is not connected or if
+#   the port locations of a symbol have changed since.
+#   Without use_netlist, the schematic is always parsed and connected.
+#   No architecture is written if a signal has no type.
+#   The warnings are printed and, if a warnings list is given, appended
+#   to it. The warnings of a stored netlist are reported again.
+#
+def convert_schematic(
+    schematics_file_spec, VHDL_library='', VHDL_directory='',
+    scratch_directory='/tmp', symbol_interfaces=None, use_netlist=True,
+    warnings=None, verbose=False
+):
+                                                                    # file specs
+    (library_name, symbol_name, architecture_name, vhdl_file_spec) = \
+        find_file_specs(schematics_file_spec, VHDL_directory)
+    if not VHDL_library :
+        VHDL_library = library_name
+    vhdl_file_path = os.path.dirname(vhdl_file_spec)
+                                                               # validity checks
+    if not os.path.isfile(schematics_file_spec) :
+        print("schematics file %s not found" % schematics_file_spec)
+        return(False)
+
+    if not os.path.isdir(vhdl_file_path) :
+        print("VHDL directory %s not found" % vhdl_file_path)
+        return(False)
+
+    if not os.path.isdir(scratch_directory) :
+        print("scratch directory %s not found" % scratch_directory)
+        return(False)
+                                                                       # convert
+    print("Converting %s to %s" % (schematics_file_spec, vhdl_file_spec))
+    netlist_file_spec = find_netlist_file_spec(
+        schematics_file_spec, scratch_directory
+    )
+    source_stamp = geda.find_file_stamp(schematics_file_spec)
+    stored_netlist = None
+    if use_netlist :
+        stored_netlist = read_netlist(netlist_file_spec, source_stamp)
+    if stored_netlist :
+        if verbose :
+            print("\nLoading netlist %s" % netlist_file_spec)
+        with profiling.phase('load netlist') :
+            components = load_components(stored_netlist)
+            signals = load_signals(stored_netlist)
+            text_blocks = stored_netlist.section('text_blocks')
+            parse_warnings = stored_netlist.section('parse_warnings')
+    else :
+        (components, nets, signals, text_blocks, parse_warnings) = \
+            read_schematics(schematics_file_spec, verbose)
+        sections = store_parsed_sections(
+            components, nets, signals, text_blocks, parse_warnings
+        )
+                                                          # connect if necessary
+    interface_stamps = find_interface_stamps(components, scratch_directory)
+    if \
+        stored_netlist and \
+        (stored_netlist.header.get('interface_stamps') == interface_stamps) \
+    :
+        with profiling.phase('load netlist') :
+            load_connections(stored_netlist, components)
+            signals = load_signals(stored_netlist, 'connected_signals')
+            connection_warnings = \
+                stored_netlist.section('connection_warnings')
+    else :
+        if stored_netlist :
+            with profiling.phase('load netlist') :
+                nets = load_nets(stored_netlist)
+                sections = {}
+                for section_name in PARSED_SECTIONS :
+                    sections[section_name] = \
+                        stored_netlist.section(section_name)
+        if symbol_interfaces is None :
+            symbol_interfaces = {}
+        with profiling.phase('connect components') :
+            connection_warnings = connect_components(
+                components, nets, symbol_interfaces, scratch_directory,
+                verbose
+            )
+        if connection_warnings is None :
+            return(False)
+        with profiling.phase('propagate signal types') :
+            connection_warnings = connection_warnings + \
+                propagate_signal_types(components, signals, verbose)
+        sections.update(store_connected_sections(
+            components, signals, connection_warnings
+        ))
+        write_netlist(
+            netlist_file_spec, schematics_file_spec, source_stamp, sections,
+            interface_stamps
+        )
+                                                               # report warnings
+    for warning in parse_warnings + connection_warnings :
+        print(warning)
+    if warnings is not None :
+        warnings.extend(parse_warnings + connection_warnings)
+                                                            # check signal types
+    untyped_signals = find_untyped_signals(signals)
+    if untyped_signals :
+        for signal_name in untyped_signals :
+            print("type of net %s not found" % signal_name)
+        return(False)
+    with profiling.phase('write architecture') :
+        write_architecture(
+            vhdl_file_spec, VHDL_library, library_name, symbol_name,
+            architecture_name, components, signals, text_blocks, verbose
+        )
+
+    return(True)
+
+# ==============================================================================
+# main script
+#
+if __name__ == '__main__' :
+                                                             # specify arguments
+    parser = argparse.ArgumentParser(
+      description='Convert a gEDA symbol to a VHDL entity'
+    )
+                                                                   # input files
+    parser.add_argument(
+        'input_files', nargs='*',
+        help = 'schematic files or glob patterns'
+    )
+                                                                     # file list
+    parser.add_argument(
+        '-f', '--file-list',
+        help = 'file listing the schematic files, one per line'
+    )
+                                                                  # VHDL library
+    parser.add_argument(
+        '-l', '--library',
+        help = 'VHDL library'
+    )
+                                                                # VHDL directory
+    parser.add_argument(
+        '-d', '--directory',
+        help = 'VHDL files directory'
+    )
+                                                             # scratch directory
+    parser.add_argument(
+        '-s', '--scratch', default='/tmp',
+        help = 'scratch directory'
+    )
+                                                               # ignore netlists
+    parser.add_argument(
+        '-n', '--no-netlist', action='store_true',
+        help = 'parse and connect again, ignoring the stored netlists'
+    )
+                                                                     # profiling
+    parser.add_argument(
+        '--profile', action='store_true',
+        help = 'print phase times, write a trace in the scratch directory'
+    )
+                                                                # verbose output
+    parser.add_argument(
+        '-v', '--verbose', action='store_true',
+        help = 'Verbose display'
+    )
+                                                             # process arguments
+    parser_arguments = parser.parse_args()
+    schematics_file_specs = geda.find_input_files(
+        parser_arguments.input_files, parser_arguments.file_list
+    )
+    if not schematics_file_specs :
+        print("no schematics file specified")
+        sys.exit(1)
+    if parser_arguments.profile :
+        profiling.enable()
+                                                  # convert, sharing the symbols
+    with profiling.phase('sch2vhd', 'script') :
+        failed_files = geda.convert_batch(
+            convert_schematic, schematics_file_specs, {
+                'VHDL_library' : parser_arguments.library,
+                'VHDL_directory' : parser_arguments.directory,
+                'scratch_directory' : parser_arguments.scratch,
+                'symbol_interfaces' : {},
+                'use_netlist' : not parser_arguments.no_netlist,
+                'verbose' : parser_arguments.verbose
+            }
+        )
+    if len(schematics_file_specs) > 1 :
+        geda.print_batch_summary(schematics_file_specs, failed_files)
+                                                                # profile report
+    if parser_arguments.profile :
+        trace_name = 'sch2vhd'
+        if len(schematics_file_specs) == 1 :
+            trace_name = \
+                os.path.basename(schematics_file_specs[0])[:-len('.sch')]
+        profiling.report(
+            os.path.join(parser_arguments.scratch, trace_name + '-trace.json')
+        )
+    if failed_files :
+        sys.exit(1)
@@ -0,0 +1,927 @@
+#! /usr/bin/env python3
+#
+# simulate.py
+#       Script to analyse the files of a compile list with GHDL and to
+#       simulate the top level design.
+#
+#   The files are ordered by the design units they declare and use
+#   (entities, architectures, packages, configurations and instantiated
+#   components) instead of relying on the order of the compile list.
+#   Files without dependencies between them form a wave.
+#
+#   GHDL keeps one index file per library and rewrites it at every
+#   analysis, so two files of the same library are never analysed at
+#   the same time: the concurrency is between the libraries of a wave.
+#   With the default single work library, the files are analysed one
+#   after the other. Analysing into one library per file name prefix
+#   (--libraries) makes the analysis concurrent, but only works for
+#   sources which bind their components explicitly (library and use
+#   clauses, or configurations): the architectures written by sch2vhd
+#   rely on the default binding, which only searches the work library.
+#
+#   Many testbenches can be simulated after a single analysis: each one
+#   is elaborated in its own directory, next to the shared work
+#   libraries, and the simulations run in parallel. A test passes when
+#   GHDL exits without error and no assertion of severity error or
+#   failure is reported, apart from the failure ending the simulation
+#   with the end of test message.
+#
+import os
+import sys
+import argparse
+import re
+import json
+import time
+import signal
+import subprocess
+import concurrent.futures
+import xml.etree.ElementTree
+import geda
+                                                                     # constants
+INDENT = 2 * ' '
+WORK_LIBRARY = 'work'
+STANDARD_LIBRARIES = ('ieee', 'std')
+ANALYSIS_STATE_VERSION = 1
+TESTER_SUFFIX = '_tester'
+TEST_LIBRARY_SUFFIX = '_test'
+TESTS_DIRECTORY = 'tests'
+END_OF_TEST_MESSAGE = 'end of test'
+
+VHDL_COMMENT = re.compile(r'--[^\n]*')
+ENTITY_DECLARATION = re.compile(r'\bentity\s+(\w+)\s+is\b')
+ARCHITECTURE_DECLARATION = re.compile(
+    r'\barchitecture\s+(\w+)\s+of\s+(\w+)\s+is\b'
+)
+PACKAGE_DECLARATION = re.compile(r'\bpackage\s+(\w+)\s+is\b')
+PACKAGE_BODY_DECLARATION = re.compile(r'\bpackage\s+body\s+(\w+)\s+is\b')
+CONFIGURATION_DECLARATION = re.compile(
+    r'\bconfiguration\s+(\w+)\s+of\s+(\w+)\s+is\b'
+)
+USE_CLAUSE = re.compile(r'\buse\s+(\w+)\.(\w+)\s*[.;]')
+ENTITY_INSTANTIATION = re.compile(
+    r'\bentity\s+(\w+)\.(\w+)(?:\s*\(\s*(\w+)\s*\))?'
+)
+COMPONENT_INSTANTIATION = re.compile(
+    r'\b\w+\s*:\s*(?:component\s+)?(\w+)\s+(?:generic|port)\s+map\b'
+)
+ASSERTION_MESSAGE = re.compile(
+    r'\((?:assertion|report) (error|failure)\):?\s*(.*)'
+)
+
+                                                         # running GHDL commands
+running_processes = set()
+
+# ==============================================================================
+# functions
+#
+# ------------------------------------------------------------------------------
+# read the VHDL file specifications of a compile list
+#
+def read_compile_list(compile_list_file_spec):
+    vhdl_file_specs = []
+    compile_list_file = open(compile_list_file_spec, 'r')
+    for line in compile_list_file :
+        line = line.strip()
+        if line and (line not in vhdl_file_specs) :
+            vhdl_file_specs.append(line)
+    compile_list_file.close()
+
+    return(vhdl_file_specs)
+
+# ------------------------------------------------------------------------------
+# find the library a VHDL file is analysed into
+#
+#   With per-file libraries, the library is the file name prefix, as
+#   chosen by sym2vhd and sch2vhd ("I2S-deserializer-rtl.vhd" -> I2S).
+#
+def find_library(vhdl_file_spec, file_libraries=False):
+    library = WORK_LIBRARY
+    if file_libraries :
+        library = os.path.basename(vhdl_file_spec).split('-')[0]
+
+    return(library.lower())
+
+# ------------------------------------------------------------------------------
+# find the design units declared and used by a VHDL file
+#
+#   Primary units (entities, packages, configurations) are identified by
+#   (library, name), architectures by (library, entity, architecture).
+#   Instantiated components are recorded as the entity of the same name
+#   in the file's library: they only become dependencies when that
+#   entity is part of the compile list.
+#
+def scan_design_units(vhdl_file_spec, library):
+    vhdl_file = open(vhdl_file_spec, 'r')
+    code = VHDL_COMMENT.sub('', vhdl_file.read()).lower()
+    vhdl_file.close()
+    declared_units = set()
+    used_units = set()
+                                                         # entities and packages
+    for name in ENTITY_DECLARATION.findall(code) :
+        declared_units.add((library, name))
+    for name in PACKAGE_DECLARATION.findall(code) :
+        declared_units.add((library, name))
+    for name in PACKAGE_BODY_DECLARATION.findall(code) :
+        used_units.add((library, name))
+                                              # architectures and configurations
+    for (architecture, entity) in ARCHITECTURE_DECLARATION.findall(code) :
+        declared_units.add((library, entity, architecture))
+        used_units.add((library, entity))
+    for (name, entity) in CONFIGURATION_DECLARATION.findall(code) :
+        declared_units.add((library, name))
+        used_units.add((library, entity))
+                                                                   # use clauses
+    for (used_library, name) in USE_CLAUSE.findall(code) :
+        if used_library == WORK_LIBRARY :
+            used_library = library
+        if used_library not in STANDARD_LIBRARIES :
+            used_units.add((used_library, name))
+                                                                     # instances
+    for (used_library, entity, architecture) in \
+        ENTITY_INSTANTIATION.findall(code) \
+    :
+        if used_library == WORK_LIBRARY :
+            used_library = library
+        used_units.add((used_library, entity))
+        if architecture :
+            used_units.add((used_library, entity, architecture))
+    for name in COMPONENT_INSTANTIATION.findall(code) :
+        used_units.add((library, name))
+
+    return(declared_units, used_units - declared_units)
+
+# ------------------------------------------------------------------------------
+# build the file dependency graph
+#
+#   Returns, for each file, the set of files which have to be analysed
+#   before it. Units declared by no file of the list are taken from the
+#   already analysed libraries and are not part of the graph.
+#
+def build_dependencies(vhdl_file_specs, file_libraries=False, verbose=False):
+    declaring_files = {}
+    file_units = {}
+    for vhdl_file_spec in vhdl_file_specs :
+        library = find_library(vhdl_file_spec, file_libraries)
+        (declared_units, used_units) = scan_design_units(
+            vhdl_file_spec, library
+        )
+        file_units[vhdl_file_spec] = used_units
+        for unit in declared_units :
+            declaring_files[unit] = vhdl_file_spec
+
+    dependencies = {}
+    for vhdl_file_spec in vhdl_file_specs :
+        dependencies[vhdl_file_spec] = set()
+        for unit in file_units[vhdl_file_spec] :
+            declaring_file = declaring_files.get(unit)
+            if declaring_file and (declaring_file != vhdl_file_spec) :
+                dependencies[vhdl_file_spec].add(declaring_file)
+        if verbose :
+            print(INDENT + vhdl_file_spec)
+            for declaring_file in sorted(dependencies[vhdl_file_spec]) :
+                print(2*INDENT + "needs %s" % declaring_file)
+
+    return(dependencies, declaring_files)
+
+# ------------------------------------------------------------------------------
+# group the files into waves of independent files
+#
+#   Each wave only depends on the previous ones and on the files which
+#   are already analysed. Files caught in a dependency cycle are appended
+#   one per wave in compile list order.
+#
+def find_analysis_waves(vhdl_file_specs, dependencies, analysed_files=()):
+    waves = []
+    analysed_files = set(analysed_files)
+    pending_files = list(vhdl_file_specs)
+    while pending_files :
+        wave = []
+        for vhdl_file_spec in pending_files :
+            if dependencies[vhdl_file_spec] <= analysed_files :
+                wave.append(vhdl_file_spec)
+        if not wave :
+            print("dependency cycle between:")
+            for vhdl_file_spec in pending_files :
+                print(INDENT + vhdl_file_spec)
+            wave = pending_files[:1]
+        for vhdl_file_spec in wave :
+            pending_files.remove(vhdl_file_spec)
+        analysed_files.update(wave)
+        waves.append(wave)
+
+    return(waves)
+
+# ------------------------------------------------------------------------------
+# find the files depending directly or indirectly on a set of files
+#
+def find_dependents(vhdl_file_specs, dependencies):
+    dependent_files = {}
+    for (vhdl_file_spec, needed_files) in dependencies.items() :
+        for needed_file in needed_files :
+            dependent_files.setdefault(needed_file, []).append(vhdl_file_spec)
+    dependents = set(vhdl_file_specs)
+    files_to_visit = list(vhdl_file_specs)
+    while files_to_visit :
+        for dependent_file in dependent_files.get(files_to_visit.pop(), []) :
+            if dependent_file not in dependents :
+                dependents.add(dependent_file)
+                files_to_visit.append(dependent_file)
+
+    return(dependents)
+
+# ------------------------------------------------------------------------------
+# list the libraries present in the work directory
+#
+#   GHDL names the index of a library "<library>-obj<standard>.cf".
+#
+def list_work_libraries(work_directory):
+    libraries = set()
+    for library_file_spec in os.listdir(work_directory) :
+        if library_file_spec.endswith('.cf') and '-obj' in library_file_spec :
+            libraries.add(library_file_spec.rsplit('-obj', 1)[0].lower())
+
+    return(libraries)
+
+# ------------------------------------------------------------------------------
+# read the analysis state of the work directory
+#
+#   The state holds the hash of each file when it was last analysed. It
+#   is discarded when written by another version or with other GHDL
+#   settings, since the work libraries then no longer match it.
+#
+def read_analysis_state(state_file_spec, analysis_settings):
+    analysis_state = {
+        'version' : ANALYSIS_STATE_VERSION,
+        'settings' : analysis_settings,
+        'files' : {}
+    }
+    if os.path.isfile(state_file_spec) :
+        state_file = open(state_file_spec, 'r')
+        try :
+            stored_state = json.load(state_file)
+        except ValueError :
+            stored_state = {}
+        state_file.close()
+        if \
+            (stored_state.get('version') == ANALYSIS_STATE_VERSION) and \
+            (stored_state.get('settings') == analysis_settings)          \
+        :
+            analysis_state['files'] = stored_state.get('files', {})
+
+    return(analysis_state)
+
+# ------------------------------------------------------------------------------
+# write the analysis state of the work directory
+#
+def write_analysis_state(state_file_spec, analysis_state):
+    state_file = open(state_file_spec, 'w')
+    json.dump(analysis_state, state_file, indent=1, sort_keys=True)
+    state_file.close()
+
+# ------------------------------------------------------------------------------
+# build a GHDL command line
+#
+def ghdl_command(ghdl, command, library, ghdl_options, *arguments):
+    command_line = [ghdl, command]
+    if library != WORK_LIBRARY :
+        command_line.append("--work=%s" % library)
+    command_line = command_line + ghdl_options + list(arguments)
+
+    return(command_line)
+
+# ------------------------------------------------------------------------------
+# analyse VHDL files of a same library one after the other
+#
+#   Returns the success, analysis time and messages of each file.
+#
+def analyse_library_files(
+    vhdl_file_specs, library, ghdl, ghdl_options, work_directory
+):
+    analyses = {}
+    for vhdl_file_spec in vhdl_file_specs :
+        start_time = time.perf_counter()
+        analysis = subprocess.run(
+            ghdl_command(ghdl, '-a', library, ghdl_options, vhdl_file_spec),
+            cwd=work_directory,
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            universal_newlines=True
+        )
+        analyses[vhdl_file_spec] = (
+            analysis.returncode == 0,
+            time.perf_counter() - start_time,
+            analysis.stdout
+        )
+        if analysis.returncode :
+            break
+
+    return(analyses)
+
+# ------------------------------------------------------------------------------
+# analyse the waves of files
+#
+#   The files of a wave are grouped per library, each group being
+#   analysed by its own job. With a single library, the files are
+#   analysed in turn.
+#   Returns the analysis time of each successfully analysed file and
+#   whether all analyses succeeded. The analysis stops after the first
+#   wave with a failure.
+#
+def analyse_design(
+    waves, ghdl, ghdl_options, work_directory, jobs,
+    file_libraries=False, verbose=False
+):
+    analysis_times = {}
+    with concurrent.futures.ThreadPoolExecutor(jobs or os.cpu_count()) \
+        as pool \
+    :
+        for (wave_index, wave) in enumerate(waves) :
+            if verbose :
+                print("wave %d" % (wave_index+1))
+                                                            # start the analyses
+            library_files = {}
+            for vhdl_file_spec in wave :
+                library = find_library(vhdl_file_spec, file_libraries)
+                library_files.setdefault(library, []).append(vhdl_file_spec)
+            library_analyses = []
+            for (library, vhdl_file_specs) in library_files.items() :
+                library_analyses.append(pool.submit(
+                    analyse_library_files,
+                    vhdl_file_specs, library,
+                    ghdl, ghdl_options, work_directory
+                ))
+            analyses = {}
+            for library_analysis in library_analyses :
+                analyses.update(library_analysis.result())
+                                                          # report in list order
+            analysis_failed = False
+            for vhdl_file_spec in wave :
+                if vhdl_file_spec not in analyses :
+                    continue
+                (success, analysis_time, messages) = \
+                    analyses[vhdl_file_spec]
+                print("%8.3f s  %s" % (analysis_time, vhdl_file_spec))
+                if messages :
+                    print(messages.rstrip("\n"))
+                if success :
+                    analysis_times[vhdl_file_spec] = analysis_time
+                else :
+                    analysis_failed = True
+            if analysis_failed :
+                return(analysis_times, False)
+
+    return(analysis_times, True)
+
+# ------------------------------------------------------------------------------
+# find the time left from a time limit
+#
+#   Returns None without time limit.
+#
+def find_remaining_time(start_time, timeout):
+    if not timeout :
+        return(None)
+
+    return(max(timeout - (time.perf_counter() - start_time), 0))
+
+# ------------------------------------------------------------------------------
+# run a GHDL command with a time limit, capturing its output
+#
+#   The command runs in its own process group, which is killed when the
+#   time limit is reached: "ghdl -r" may start the simulation executable
+#   as a child process.
+#   Returns the exit status, None if the time limit is reached, and the
+#   output.
+#
+def run_ghdl(command_line, directory, timeout=None):
+    process = subprocess.Popen(
+        command_line, cwd=directory,
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        universal_newlines=True, start_new_session=True
+    )
+    running_processes.add(process)
+    try :
+        output = process.communicate(timeout=timeout)[0]
+        exit_status = process.returncode
+    except subprocess.TimeoutExpired :
+        kill_process_group(process)
+        output = process.communicate()[0]
+        exit_status = None
+    except KeyboardInterrupt :
+        kill_process_group(process)
+        raise
+    running_processes.discard(process)
+
+    return(exit_status, output)
+
+# ------------------------------------------------------------------------------
+# kill a command and the processes it has started
+#
+def kill_process_group(process):
+    try :
+        os.killpg(process.pid, signal.SIGKILL)
+    except OSError :
+        pass
+
+# ------------------------------------------------------------------------------
+# elaborate and run the top level design
+#
+def simulate_design(
+    top_level, library, ghdl, ghdl_options, work_directory, timeout=None
+):
+    start_time = time.perf_counter()
+    for command_line in (
+        ghdl_command(ghdl, '-e', library, ghdl_options, top_level),
+        ghdl_command(
+            ghdl, '-r', library, ghdl_options,
+            top_level, "--vcd=%s.vcd" % top_level
+        )
+    ) :
+        try :
+            if subprocess.run(
+                command_line, cwd=work_directory,
+                timeout=find_remaining_time(start_time, timeout)
+            ).returncode :
+                return(False)
+        except subprocess.TimeoutExpired :
+            print("simulation of %s stopped after %g s" % (top_level, timeout))
+            return(False)
+
+    return(True)
+
+# ------------------------------------------------------------------------------
+# find the library of a top level entity
+#
+def find_top_library(top_level, declaring_files):
+    top_library = WORK_LIBRARY
+    for unit in declaring_files :
+        if unit[1:] == (top_level.lower(),) :
+            top_library = unit[0]
+
+    return(top_library)
+
+# ------------------------------------------------------------------------------
+# find the testbenches of a compile list
+#
+#   The testbenches are the entities named "<name>_tester" declared in
+#   the files of the test libraries ("I2S_test-deserializer_tester-sim.vhd").
+#   Returns (library, entity) pairs.
+#
+def find_testers(declaring_files):
+    architectures = set()
+    for unit in declaring_files :
+        if len(unit) == 3 :
+            architectures.add(unit[:2])
+    testers = []
+    for (unit, vhdl_file_spec) in declaring_files.items() :
+        file_library = os.path.basename(vhdl_file_spec).split('-')[0].lower()
+        if \
+            (unit in architectures) and unit[1].endswith(TESTER_SUFFIX) and \
+            file_library.endswith(TEST_LIBRARY_SUFFIX)                     \
+        :
+            testers.append(unit)
+
+    return(sorted(testers))
+
+# ------------------------------------------------------------------------------
+# check the output of a simulation
+#
+#   Returns the reported errors and failures, without the end of test
+#   failure, and whether the end of test has been reached.
+#
+def check_simulation_output(output, end_message):
+    errors = []
+    end_reached = False
+    for line in output.splitlines() :
+        assertion = ASSERTION_MESSAGE.search(line)
+        if assertion :
+            (severity, message) = assertion.groups()
+            if (severity == 'failure') and end_message and \
+                message.strip().startswith(end_message) \
+            :
+                end_reached = True
+            else :
+                errors.append(line.strip())
+
+    return(errors, end_reached)
+
+# ------------------------------------------------------------------------------
+# elaborate a testbench in its own directory
+#
+#   The work libraries are taken from the work directory, through the
+#   GHDL options. The executable is written in the test directory.
+#   Returns the test result, whose status is 'passed' until a step fails:
+#   'error' for an elaboration error, 'timeout' if the time limit is
+#   reached.
+#
+def elaborate_test(
+    top_level, library, ghdl, ghdl_options, test_directory, timeout=None
+):
+    os.makedirs(test_directory, exist_ok=True)
+    result = {
+        'name' : top_level,
+        'library' : library,
+        'status' : 'passed',
+        'time' : 0,
+        'errors' : [],
+        'output' : ''
+    }
+    start_time = time.perf_counter()
+    (exit_status, output) = run_ghdl(
+        ghdl_command(ghdl, '-e', library, ghdl_options, top_level),
+        test_directory, timeout
+    )
+    result['time'] = time.perf_counter() - start_time
+    result['output'] = output
+    if exit_status is None :
+        result['status'] = 'timeout'
+        result['errors'].append("elaboration stopped after %g s" % timeout)
+    elif exit_status :
+        result['status'] = 'error'
+        result['errors'].append("elaboration failed")
+
+    return(result)
+
+# ------------------------------------------------------------------------------
+# run an elaborated testbench in its own directory
+#
+#   The time limit includes the elaboration time. The waveforms are
+#   written in the test directory. The status becomes 'failed' if an
+#   error is reported.
+#
+def run_test(
+    result, ghdl, ghdl_options, test_directory, timeout=None,
+    end_message=END_OF_TEST_MESSAGE
+):
+    if result['status'] != 'passed' :
+        return(result)
+    start_time = time.perf_counter() - result['time']
+    top_level = result['name']
+    (exit_status, output) = run_ghdl(
+        ghdl_command(
+            ghdl, '-r', result['library'], ghdl_options,
+            top_level, "--vcd=%s.vcd" % top_level
+        ),
+        test_directory, find_remaining_time(start_time, timeout)
+    )
+    result['time'] = time.perf_counter() - start_time
+    result['output'] = result['output'] + output
+    if exit_status is None :
+        result['status'] = 'timeout'
+        result['errors'].append("simulation stopped after %g s" % timeout)
+        return(result)
+    (errors, end_reached) = check_simulation_output(output, end_message)
+    result['errors'] = errors
+    if errors or (exit_status and not end_reached) :
+        result['status'] = 'failed'
+        if not errors :
+            result['errors'].append(
+                "simulation exited with status %d" % exit_status
+            )
+
+    return(result)
+
+# ------------------------------------------------------------------------------
+# elaborate and run testbenches
+#
+#   Each testbench has a subdirectory of the tests directory, named
+#   after its library and entity.
+#   The elaborations may write to the shared work library: they are done
+#   one after the other. The simulations only read it and run in
+#   parallel.
+#   The results are printed and returned in the order of the testbenches.
+#
+def run_tests(
+    testers, ghdl, ghdl_options, work_directory, jobs,
+    timeout=None, end_message=END_OF_TEST_MESSAGE, verbose=False
+):
+    work_directory = os.path.abspath(work_directory)
+    ghdl_options = ghdl_options + [
+        "--workdir=%s" % work_directory, "-P%s" % work_directory
+    ]
+                                                                     # elaborate
+    elaborations = []
+    for (library, top_level) in testers :
+        test_directory = os.path.join(
+            work_directory, TESTS_DIRECTORY, "%s.%s" % (library, top_level)
+        )
+        elaborations.append((
+            elaborate_test(
+                top_level, library, ghdl, ghdl_options, test_directory,
+                timeout
+            ),
+            test_directory
+        ))
+                                                                      # simulate
+    with concurrent.futures.ThreadPoolExecutor(jobs or os.cpu_count()) \
+        as pool \
+    :
+        test_runs = []
+        for (result, test_directory) in elaborations :
+            test_runs.append(pool.submit(
+                run_test,
+                result, ghdl, ghdl_options, test_directory, timeout,
+                end_message
+            ))
+                                             # stop the simulations on interrupt
+        try :
+            for test_run in test_runs :
+                test_run.result()
+        except KeyboardInterrupt :
+            for process in list(running_processes) :
+                kill_process_group(process)
+            raise
+        results = []
+        for test_run in test_runs :
+            result = test_run.result()
+            results.append(result)
+            print("%8.3f s  %-8s %s.%s" % (
+                result['time'], result['status'],
+                result['library'], result['name']
+            ))
+            for error in result['errors'] :
+                print(INDENT + error)
+            if verbose and result['output'] :
+                print(result['output'].rstrip("\n"))
+
+    return(results)
+
+# ------------------------------------------------------------------------------
+# write the test results as JSON
+#
+def write_json_report(report_file_spec, results):
+    report_file = open(report_file_spec, 'w')
+    json.dump({'tests' : results}, report_file, indent=1)
+    report_file.close()
+
+# ------------------------------------------------------------------------------
+# write the test results as JUnit XML
+#
+#   Failed tests get a failure element, tests which didn't elaborate or
+#   timed out an error element.
+#
+def write_junit_report(report_file_spec, results):
+    test_suite = xml.etree.ElementTree.Element('testsuite', {
+        'name' : 'simulate',
+        'tests' : str(len(results)),
+        'failures' : str(len(
+            [result for result in results if result['status'] == 'failed']
+        )),
+        'errors' : str(len([
+            result for result in results
+                if result['status'] in ('error', 'timeout')
+        ])),
+        'time' : "%.3f" % sum([result['time'] for result in results])
+    })
+    for result in results :
+        test_case = xml.etree.ElementTree.SubElement(test_suite, 'testcase', {
+            'classname' : result['library'],
+            'name' : result['name'],
+            'time' : "%.3f" % result['time']
+        })
+        if result['status'] != 'passed' :
+            element = 'error'
+            if result['status'] == 'failed' :
+                element = 'failure'
+            problem = xml.etree.ElementTree.SubElement(test_case, element, {
+                'message' : (result['errors'] or [result['status']])[0],
+                'type' : result['status']
+            })
+            problem.text = "\n".join(result['errors'])
+        system_out = xml.etree.ElementTree.SubElement(test_case, 'system-out')
+        system_out.text = result['output']
+    xml.etree.ElementTree.ElementTree(test_suite).write(
+        report_file_spec, encoding='utf-8', xml_declaration=True
+    )
+
+# ==============================================================================
+# main script
+#
+if __name__ == '__main__' :
+    # --------------------------------------------------------------------------
+    # command line arguments
+    #
+                                                             # specify arguments
+    parser = argparse.ArgumentParser(
+      description='Analyse a compile list with GHDL and simulate the design'
+    )
+                                                                  # compile list
+    parser.add_argument('compile_list')
+                                                                     # top level
+    parser.add_argument(
+        '-t', '--top', action='append', default=[],
+        help = 'top level entity to elaborate and run (can be repeated)'
+    )
+                                                                   # testbenches
+    parser.add_argument(
+        '-T', '--testers', action='store_true',
+        help = 'run every *_tester entity of the *_test libraries'
+    )
+                                                                    # time limit
+    parser.add_argument(
+        '--timeout', type=float, default=0,
+        help = 'time limit of each test in seconds, 0 for none'
+    )
+                                                           # end of test message
+    parser.add_argument(
+        '-e', '--end-message', default=END_OF_TEST_MESSAGE,
+        help = 'message of the failure assertion ending a successful test'
+    )
+                                                                   # test report
+    parser.add_argument(
+        '-r', '--report',
+        help = 'test report file, JUnit XML if it ends with .xml, else JSON'
+    )
+                                                                  # compile only
+    parser.add_argument(
+        '-c', '--compile-only', action='store_true',
+        help = 'analyse the files without simulating'
+    )
+                                                                # work directory
+    parser.add_argument(
+        '-w', '--work', default='/tmp',
+        help = 'GHDL work directory'
+    )
+                                                              # incremental mode
+    parser.add_argument(
+        '-i', '--incremental', action='store_true',
+        help = 'keep the work libraries and analyse only the changed files'
+    )
+                                                                # file libraries
+    parser.add_argument(
+        '-l', '--libraries', action='store_true',
+        help = 'analyse each file into the library of its file name prefix'
+            ' (concurrent, needs explicit component bindings)'
+    )
+                                                                 # parallel jobs
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=0,
+        help = 'number of parallel analyses (with --libraries) and'
+            ' simulations, 0 for all processors'
+    )
+                                                               # GHDL executable
+    parser.add_argument(
+        '-g', '--ghdl', default='ghdl',
+        help = 'GHDL executable'
+    )
+                                                                  # GHDL options
+    parser.add_argument(
+        '-o', '--option', action='append', default=[],
+        help = 'GHDL option, as in -o=--std=08 (can be repeated)'
+    )
+                                                                # verbose output
+    parser.add_argument(
+        '-v', '--verbose', action='store_true',
+        help = 'Verbose display'
+    )
+                                                             # process arguments
+    parser_arguments = parser.parse_args()
+
+    compile_list_file_spec = parser_arguments.compile_list
+    top_levels = parser_arguments.top
+    run_testers = parser_arguments.testers
+    timeout = parser_arguments.timeout or None
+    end_message = parser_arguments.end_message
+    report_file_spec = parser_arguments.report
+    compile_only = parser_arguments.compile_only
+    work_directory = parser_arguments.work
+    incremental = parser_arguments.incremental
+    file_libraries = parser_arguments.libraries
+    jobs = parser_arguments.jobs
+    ghdl = parser_arguments.ghdl
+    ghdl_options = parser_arguments.option
+    verbose = parser_arguments.verbose
+
+    if file_libraries :
+        ghdl_options = ghdl_options + ["-P%s" % work_directory]
+                                                               # validity checks
+    if not os.path.isfile(compile_list_file_spec) :
+        compile_list_file_spec = os.path.join(
+            work_directory, compile_list_file_spec
+        )
+    if not os.path.isfile(compile_list_file_spec) :
+        print("compile list %s not found" % parser_arguments.compile_list)
+        sys.exit(1)
+
+    if not os.path.isdir(work_directory) :
+        print("work directory %s not found" % work_directory)
+        sys.exit(1)
+
+    if not (top_levels or run_testers or compile_only) :
+        print("no top level to simulate")
+        sys.exit(1)
+
+    vhdl_file_specs = read_compile_list(compile_list_file_spec)
+    for vhdl_file_spec in vhdl_file_specs :
+        if not os.path.isfile(vhdl_file_spec) :
+            print("VHDL file %s not found" % vhdl_file_spec)
+            sys.exit(1)
+
+    # --------------------------------------------------------------------------
+                                                            # order the analyses
+    if verbose :
+        print("building the dependency graph")
+    (dependencies, declaring_files) = build_dependencies(
+        vhdl_file_specs, file_libraries, verbose
+    )
+                                                        # find the changed files
+    state_file_spec = os.path.join(work_directory, 'simulate-analysis.json')
+    analysis_state = read_analysis_state(state_file_spec, {
+        'ghdl' : ghdl,
+        'options' : ghdl_options,
+        'libraries' : file_libraries
+    })
+    analysed_hashes = analysis_state['files']
+    if not incremental :
+        analysed_hashes.clear()
+    work_libraries = list_work_libraries(work_directory)
+    file_hashes = {}
+    changed_files = []
+    for vhdl_file_spec in vhdl_file_specs :
+        file_hash = geda.hash_file(vhdl_file_spec)
+        file_hashes[vhdl_file_spec] = file_hash
+        library = find_library(vhdl_file_spec, file_libraries)
+        if library not in work_libraries :
+            changed_files.append(vhdl_file_spec)
+        elif analysed_hashes.get(vhdl_file_spec) != file_hash :
+            changed_files.append(vhdl_file_spec)
+    files_to_analyse = find_dependents(changed_files, dependencies)
+    files_to_analyse = [
+        vhdl_file_spec for vhdl_file_spec in vhdl_file_specs
+            if vhdl_file_spec in files_to_analyse
+    ]
+    waves = find_analysis_waves(
+        files_to_analyse, dependencies,
+        set(vhdl_file_specs) - set(files_to_analyse)
+    )
+                                                            # start from scratch
+    if not analysed_hashes :
+        for library_file_spec in os.listdir(work_directory) :
+            if library_file_spec.endswith('.cf') :
+                os.remove(os.path.join(work_directory, library_file_spec))
+                                                             # analyse the files
+    if incremental :
+        print("analysing %d of %d files" % (
+            len(files_to_analyse), len(vhdl_file_specs)
+        ))
+    for vhdl_file_spec in files_to_analyse :
+        analysed_hashes.pop(vhdl_file_spec, None)
+    start_time = time.perf_counter()
+    (analysis_times, analysis_succeeded) = analyse_design(
+        waves, ghdl, ghdl_options, work_directory, jobs,
+        file_libraries, verbose
+    )
+    for vhdl_file_spec in analysis_times :
+        analysed_hashes[vhdl_file_spec] = file_hashes[vhdl_file_spec]
+    write_analysis_state(state_file_spec, analysis_state)
+    if not analysis_succeeded :
+        sys.exit(1)
+    print("analysed %d files in %d waves: %.3f s (%.3f s of analyses)" % (
+        len(analysis_times), len(waves),
+        time.perf_counter() - start_time, sum(analysis_times.values())
+    ))
+                                                              # test if continue
+    if compile_only :
+        sys.exit(0)
+                                                               # simulate design
+    if (len(top_levels) == 1) and not (run_testers or report_file_spec) :
+        top_level = top_levels[0]
+        top_library = find_top_library(top_level, declaring_files)
+        if verbose :
+            print("simulating %s.%s" % (top_library, top_level))
+        if not simulate_design(
+            top_level, top_library, ghdl, ghdl_options, work_directory,
+            timeout
+        ) :
+            sys.exit(1)
+        sys.exit(0)
+                                                                     # run tests
+    testers = []
+    for top_level in top_levels :
+        testers.append((
+            find_top_library(top_level, declaring_files), top_level.lower()
+        ))
+    if run_testers :
+        for tester in find_testers(declaring_files) :
+            if tester not in testers :
+                testers.append(tester)
+    if not testers :
+        print("no testbench found")
+        sys.exit(1)
+    print("running %d tests" % len(testers))
+    start_time = time.perf_counter()
+    results = run_tests(
+        testers, ghdl, ghdl_options, work_directory, jobs,
+        timeout, end_message, verbose
+    )
+    passed_count = len(
+        [result for result in results if result['status'] == 'passed']
+    )
+    print("%d of %d tests passed: %.3f s" % (
+        passed_count, len(results), time.perf_counter() - start_time
+    ))
+    if report_file_spec :
+        if report_file_spec.endswith('.xml') :
+            write_junit_report(report_file_spec, results)
+        else :
+            write_json_report(report_file_spec, results)
+    if passed_count < len(results) :
+        sys.exit(1)
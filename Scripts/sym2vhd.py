@@ -6,240 +6,322 @@
 # https://lepton-eda.github.io/lepton-manual.html/gEDA-file-format.html
 #
 import os
+import sys
 import argparse
-import re
+import io
+import geda
+import netlist
+import profiling
                                                                      # constants
 INDENT = 2 * ' '
 
 # ==============================================================================
-# command line arguments
+# functions
 #
-                                                             # specify arguments
-parser = argparse.ArgumentParser(
-  description='Convert a gEDA symbol to a VHDL entity'
-)
-                                                                    # input file
-parser.add_argument('input_file')
-                                                                  # VHDL library
-parser.add_argument(
-    '-l', '--library',
-    help = 'VHDL library'
-)
-                                                                # VHDL directory
-parser.add_argument(
-    '-d', '--directory',
-    help = 'VHDL files directory'
-)
-                                                             # scratch directory
-parser.add_argument(
-    '-s', '--scratch', default='/tmp',
-    help = 'scratch directory'
-)
-                                                                # verbose output
-parser.add_argument(
-    '-v', '--verbose', action='store_true',
-    help = 'Verbose display'
-)
-                                                             # process arguments
-parser_arguments = parser.parse_args()
-
-symbol_file_spec = parser_arguments.input_file
-VHDL_library = parser_arguments.library
-VHDL_directory = parser_arguments.directory
-scratch_directory = parser_arguments.scratch
-verbose = parser_arguments.verbose
-
-symbol_name = os.path.basename(symbol_file_spec).rstrip('.sym')
-if not VHDL_library :
-    VHDL_library = symbol_name.split('-', 1)[0]
-symbol_file_path = os.path.dirname(symbol_file_spec)
-if VHDL_directory :
-    vhdl_file_path = VHDL_directory
-else :
-    path_list = symbol_file_path.split(os.sep)
-    path_list[-1] = 'Description'
-    vhdl_file_path = os.sep.join(path_list)
-vhdl_file_spec = os.path.join(vhdl_file_path, symbol_name + '.vhd')
-port_locations_file_spec = os.path.join(
-    scratch_directory, symbol_name + '-port_locations.txt'
-)
-                                                               # validity checks
-if not os.path.isfile(symbol_file_spec) :
-    print("symbol file %s not found" % symbol_file_spec)
-    quit()
-
-if not os.path.isdir(vhdl_file_path) :
-    print("VHDL directory %s not found" % vhdl_file_path)
-    quit()
-
-if not os.path.isdir(scratch_directory) :
-    print("scratch directory %s not found" % scratch_directory)
-    quit()
-
-# ==============================================================================
-# main script
-#
-print("Converting %s to %s" % (symbol_file_spec, vhdl_file_spec))
-
 # ------------------------------------------------------------------------------
-                                                                    # parse file
-if verbose :
-    print("\nParsing symbol file")
-done = False
-processing_port = False
-processing_text = False
-generics = []
-ports = []
-port_location = [0, 0]
-symbol_file = open(symbol_file_spec, 'r')
-while not done :
-                                                                # read next line
-    line = symbol_file.readline().rstrip("\r\n")
-    # print(10*' ' + line)
-                                                                  # process port
-    if processing_port :
-        value = (line + '= ').split('=')[1]
-                                                                     # port name
-        if line.startswith('pinlabel') :
-            port_name = value
+# parse symbol file
+#
+def parse_symbol(symbol_file_spec, verbose=False):
+    if verbose :
+        print("\nParsing symbol file")
+    generics = []
+    ports = []
+    for geda_object in geda.read_objects(symbol_file_spec) :
+                                                                          # port
+        if (geda_object['type'] == 'P') and geda_object['attributes'] :
+            port = netlist.Port(
+                x=int(geda_object['fields'][0]), y=int(geda_object['fields'][1])
+            )
             if verbose :
-                print(2*INDENT + "port %s" % port_name)
+                print(INDENT + "at [%d, %d] :" % (port.x, port.y))
+            for (name, value) in geda_object['attributes'] :
+                                                                     # port name
+                if name.startswith('pinlabel') :
+                    port.name = sys.intern(value)
+                    if verbose :
+                        print(2*INDENT + "port %s" % value)
                                                                      # port type
-        if line.startswith('porttype') :
-            port_type = value
-            if verbose :
-                print(2*INDENT + "type %s" % port_type)
+                if name.startswith('porttype') :
+                    port.type = sys.intern(value)
+                    if verbose :
+                        print(2*INDENT + "type %s" % value)
                                                                     # port range
-        if line.startswith('portrange') :
-            port_range = value
-            if verbose :
-                print(2*INDENT + "range %s" % port_range)
+                if name.startswith('portrange') :
+                    port.range = value
+                    if verbose :
+                        print(2*INDENT + "range %s" % value)
                                                                 # port direction
-        if line.startswith('portdirection') :
-            port_direction = value
-            if verbose :
-                print(2*INDENT + "direction %s" % port_direction)
-        if line.startswith('}') :
-            ports.append({
-                'name' : port_name,
-                'type' : port_type,
-                'range' : port_range,
-                'direction' : port_direction,
-                'location' : port_location.copy()
-            })
-            processing_port = False
-                                                                  # process text
-    elif processing_text :
+                if name.startswith('portdirection') :
+                    port.direction = value
+                    if verbose :
+                        print(2*INDENT + "direction %s" % value)
+            ports.append(port)
                                                                       # generics
-        if line.startswith('generic') :
-            (label, generic) = line.split('=', 1)
-            if verbose :
-                print(INDENT + 'generic :')
-                print(2*INDENT + generic)
-            generics.append(generic)
-        processing_text = False
-    else :
-                                                            # schematics element
-        if line.startswith('P ') :
-            port_location_string = line.split(' ')[1:3]
-            for index in range(len(port_location_string)) :
-                port_location[index] = int(port_location_string[index])
-            if verbose :
-                print(
-                    INDENT +
-                    "at [%d, %d] :" % (port_location[0], port_location[0])
-                )
-            port_name = ''
-            port_type = 'std_ulogic'
-            port_range = ''
-            port_direction = 'in'
-            processing_port = True
-                                                                          # text
-        if line.startswith('T ') :
-            processing_text = True
-    if not line :
-        done = True
-symbol_file.close()
+        elif (geda_object['type'] == 'T') and geda_object['text'] :
+            if geda_object['text'][0].startswith('generic') :
+                generic = geda_object['text'][0].split('=', 1)[-1]
+                if verbose :
+                    print(INDENT + 'generic :')
+                    print(2*INDENT + generic)
+                generics.append(generic)
+
+    return(generics, ports)
 
 # ------------------------------------------------------------------------------
-                                                                  # write entity
-if verbose :
-    print("\nWriting entity")
-vhdl_file = open(vhdl_file_spec, 'w')
+# write entity
+#
+#   The file is only replaced if its contents change.
+#   Returns True if the file has been written.
+#
+def write_entity(
+    vhdl_file_spec, VHDL_library, symbol_name, generics, ports, verbose=False
+):
+    if verbose :
+        print("\nWriting entity")
+    vhdl_file = io.StringIO()
                                                                      # libraries
-vhdl_file.write("library %s;\n" % VHDL_library)
-use_1164 = False
-use_numeric_std = False
-for port in ports :
-    port_type = port['type'].lower()
-    if port_type.startswith('std_logic') :
-        use_1164 = True
-    if port_type.startswith('std_ulogic') :
-        use_1164 = True
-    if port_type == 'unsigned' :
-        use_numeric_std = True
-    if port_type == 'signed' :
-        use_numeric_std = True
-if use_1164 or use_numeric_std :
-    vhdl_file.write("library ieee;\n")
-if use_1164 :
-    vhdl_file.write(INDENT + "use ieee.std_logic_1164.all;\n")
-if use_numeric_std :
-    vhdl_file.write(INDENT + "use ieee.numeric_std.all;\n")
-vhdl_file.write("\n")
+    vhdl_file.write("library %s;\n" % VHDL_library)
+    use_1164 = False
+    use_numeric_std = False
+    for port in ports :
+        port_type = port.type.lower()
+        if port_type.startswith('std_logic') :
+            use_1164 = True
+        if port_type.startswith('std_ulogic') :
+            use_1164 = True
+        if port_type == 'unsigned' :
+            use_numeric_std = True
+        if port_type == 'signed' :
+            use_numeric_std = True
+    if use_1164 or use_numeric_std :
+        vhdl_file.write("library ieee;\n")
+    if use_1164 :
+        vhdl_file.write(INDENT + "use ieee.std_logic_1164.all;\n")
+    if use_numeric_std :
+        vhdl_file.write(INDENT + "use ieee.numeric_std.all;\n")
+    vhdl_file.write("\n")
                                                                   # entity start
-vhdl_symbol_name = symbol_name.replace('-', '_')
-vhdl_file.write("entity %s is\n" % vhdl_symbol_name)
+    vhdl_symbol_name = symbol_name.replace('-', '_')
+    vhdl_file.write("entity %s is\n" % vhdl_symbol_name)
                                                                       # generics
-if generics :
-    separator = ';'
-    if verbose :
-        print(INDENT + "generics :")
-    vhdl_file.write(INDENT + "generic (\n")
-    for index in range(len(generics)) :
-        generic = generics[index]
-        if index == len(generics)-1 :
-            separator = ''
+    if generics :
+        separator = ';'
         if verbose :
-            generic_name = generic.split(':')[0]
-            print(2*INDENT + generic_name)
-        vhdl_file.write(2*INDENT + generic + separator + "\n")
-    vhdl_file.write(INDENT + ");\n")
+            print(INDENT + "generics :")
+        vhdl_file.write(INDENT + "generic (\n")
+        for index in range(len(generics)) :
+            generic = generics[index]
+            if index == len(generics)-1 :
+                separator = ''
+            if verbose :
+                generic_name = generic.split(':')[0]
+                print(2*INDENT + generic_name)
+            vhdl_file.write(2*INDENT + generic + separator + "\n")
+        vhdl_file.write(INDENT + ");\n")
                                                                          # ports
-if ports :
-    separator = ';'
-    if verbose :
-        print(INDENT + "ports :")
-    vhdl_file.write(INDENT + "port (\n")
-    for index in range(len(ports)) :
-        port_dictionary = ports[index]
-        if index == len(ports)-1 :
-            separator = ''
+    if ports :
+        separator = ';'
         if verbose :
-            print(2*INDENT + port_dictionary['name'])
-        vhdl_file.write(2*INDENT + "%s : %s %s%s%s\n" % (
-            port_dictionary['name'],
-            port_dictionary['direction'],
-            port_dictionary['type'],
-            port_dictionary['range'],
-            separator
-        ))
-    vhdl_file.write(INDENT + ");\n")
+            print(INDENT + "ports :")
+        vhdl_file.write(INDENT + "port (\n")
+        for index in range(len(ports)) :
+            port = ports[index]
+            if index == len(ports)-1 :
+                separator = ''
+            if verbose :
+                print(2*INDENT + port.name)
+            vhdl_file.write(2*INDENT + "%s : %s %s%s%s\n" % (
+                port.name,
+                port.direction,
+                port.type,
+                port.range,
+                separator
+            ))
+        vhdl_file.write(INDENT + ");\n")
                                                                     # entity end
-vhdl_file.write("end %s;\n" % vhdl_symbol_name)
-vhdl_file.close()
-                                                                  # write entity
-if ports :
+    vhdl_file.write("end %s;\n" % vhdl_symbol_name)
+
+    return(geda.write_file_if_changed(vhdl_file_spec, vhdl_file.getvalue()))
+
+# ------------------------------------------------------------------------------
+# write port locations
+#
+#   Returns True if the file has been written.
+#
+def write_port_locations(port_locations_file_spec, ports, verbose=False):
     if verbose :
         print("\nWriting port locations to %s" % port_locations_file_spec)
-    port_locations_file = open(port_locations_file_spec, 'w')
+    port_locations_file = io.StringIO()
     for port in ports :
         if verbose :
-            print(INDENT + port['name'])
+            print(INDENT + port.name)
         port_locations_file.write("%s %s [%s, %s]\n" % (
-            port['name'],
-            port['type'] + port['range'],
-            port['location'][0],
-            port['location'][1]
+            port.name, port.type + port.range, port.x, port.y
         ))
+
+    return(geda.write_file_if_changed(
+        port_locations_file_spec, port_locations_file.getvalue()
+    ))
+
+# ------------------------------------------------------------------------------
+# read port locations
+#
+def read_port_locations(port_locations_file_spec):
+    ports = []
+    port_locations_file = open(port_locations_file_spec, 'r')
+    locations = port_locations_file.read().replace("\r", "\n").split("\n")
     port_locations_file.close()
+    for location in locations :
+        location_trimmed = location.replace('[', '').replace(']', '')
+        location_trimmed = location_trimmed.replace(',', '')
+        location_list = location_trimmed.split(' ')
+        if len(location_list) >= 4 :
+            port_type = ' '.join(location_list[1:-2])
+            base_type = port_type.split('(', 1)[0]
+            ports.append(netlist.Port(
+                location_list[0], base_type, port_type[len(base_type):], '',
+                int(location_list[-2]), int(location_list[-1])
+            ))
+
+    return(ports)
+
+# ------------------------------------------------------------------------------
+# find the files generated from a symbol
+#
+def find_file_specs(
+    symbol_file_spec, VHDL_directory='', scratch_directory='/tmp'
+):
+    symbol_name = os.path.basename(symbol_file_spec).rstrip('.sym')
+    symbol_file_path = os.path.dirname(symbol_file_spec)
+    if VHDL_directory :
+        vhdl_file_path = VHDL_directory
+    else :
+        path_list = symbol_file_path.split(os.sep)
+        path_list[-1] = 'Description'
+        vhdl_file_path = os.sep.join(path_list)
+    vhdl_file_spec = os.path.join(vhdl_file_path, symbol_name + '.vhd')
+    port_locations_file_spec = os.path.join(
+        scratch_directory, symbol_name + '-port_locations.txt'
+    )
+
+    return(symbol_name, vhdl_file_spec, port_locations_file_spec)
+
+# ------------------------------------------------------------------------------
+# convert a symbol to a VHDL entity
+#
+def convert_symbol(
+    symbol_file_spec, VHDL_library='', VHDL_directory='',
+    scratch_directory='/tmp', symbol_interfaces=None,
+    export_port_locations=True, verbose=False
+):
+                                                                    # file specs
+    (symbol_name, vhdl_file_spec, port_locations_file_spec) = \
+        find_file_specs(symbol_file_spec, VHDL_directory, scratch_directory)
+    if not VHDL_library :
+        VHDL_library = symbol_name.split('-', 1)[0]
+    vhdl_file_path = os.path.dirname(vhdl_file_spec)
+                                                               # validity checks
+    if not os.path.isfile(symbol_file_spec) :
+        print("symbol file %s not found" % symbol_file_spec)
+        return(False)
+
+    if not os.path.isdir(vhdl_file_path) :
+        print("VHDL directory %s not found" % vhdl_file_path)
+        return(False)
+
+    if not os.path.isdir(scratch_directory) :
+        print("scratch directory %s not found" % scratch_directory)
+        return(False)
+                                                                       # convert
+    print("Converting %s to %s" % (symbol_file_spec, vhdl_file_spec))
+    with profiling.phase('parse symbol') :
+        (generics, ports) = parse_symbol(symbol_file_spec, verbose)
+    profiling.count('symbol ports', len(ports))
+    profiling.count('symbol generics', len(generics))
+    with profiling.phase('write entity') :
+        write_entity(
+            vhdl_file_spec, VHDL_library, symbol_name, generics, ports, verbose
+        )
+    if ports and export_port_locations :
+        with profiling.phase('write port locations') :
+            write_port_locations(port_locations_file_spec, ports, verbose)
+    if symbol_interfaces is not None :
+        symbol_interfaces[symbol_name] = netlist.Interface(
+            symbol_name, generics, ports
+        )
+
+    return(True)
+
+# ==============================================================================
+# main script
+#
+if __name__ == '__main__' :
+                                                             # specify arguments
+    parser = argparse.ArgumentParser(
+      description='Convert a gEDA symbol to a VHDL entity'
+    )
+                                                                   # input files
+    parser.add_argument(
+        'input_files', nargs='*',
+        help = 'symbol files or glob patterns'
+    )
+                                                                     # file list
+    parser.add_argument(
+        '-f', '--file-list',
+        help = 'file listing the symbol files, one per line'
+    )
+                                                                  # VHDL library
+    parser.add_argument(
+        '-l', '--library',
+        help = 'VHDL library'
+    )
+                                                                # VHDL directory
+    parser.add_argument(
+        '-d', '--directory',
+        help = 'VHDL files directory'
+    )
+                                                             # scratch directory
+    parser.add_argument(
+        '-s', '--scratch', default='/tmp',
+        help = 'scratch directory'
+    )
+                                                                     # profiling
+    parser.add_argument(
+        '--profile', action='store_true',
+        help = 'print phase times, write a trace in the scratch directory'
+    )
+                                                                # verbose output
+    parser.add_argument(
+        '-v', '--verbose', action='store_true',
+        help = 'Verbose display'
+    )
+                                                             # process arguments
+    parser_arguments = parser.parse_args()
+    symbol_file_specs = geda.find_input_files(
+        parser_arguments.input_files, parser_arguments.file_list
+    )
+    if not symbol_file_specs :
+        print("no symbol file specified")
+        sys.exit(1)
+    if parser_arguments.profile :
+        profiling.enable()
+                                                                       # convert
+    with profiling.phase('sym2vhd', 'script') :
+        failed_files = geda.convert_batch(convert_symbol, symbol_file_specs, {
+            'VHDL_library' : parser_arguments.library,
+            'VHDL_directory' : parser_arguments.directory,
+            'scratch_directory' : parser_arguments.scratch,
+            'verbose' : parser_arguments.verbose
+        })
+    if len(symbol_file_specs) > 1 :
+        geda.print_batch_summary(symbol_file_specs, failed_files)
+                                                                # profile report
+    if parser_arguments.profile :
+        trace_name = 'sym2vhd'
+        if len(symbol_file_specs) == 1 :
+            trace_name = find_file_specs(symbol_file_specs[0])[0]
+        profiling.report(
+            os.path.join(parser_arguments.scratch, trace_name + '-trace.json')
+        )
+    if failed_files :
+        sys.exit(1)
@@ -0,0 +1,126 @@
+#! /usr/bin/env python3
+#
+# test_design2vhd.py
+#       Tests of the design build and watch mode, on a generated design.
+#
+#   Run with: python3 -m unittest discover Scripts
+#
+import os
+import io
+import contextlib
+import tempfile
+import unittest
+import unittest.mock
+import sch2vhd
+import design2vhd
+import generate_design
+
+# ==============================================================================
+# tests
+#
+class WatchTest(unittest.TestCase):
+
+    # --------------------------------------------------------------------------
+    # generate a small design in a temporary directory
+    #
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        (self.gafrc_file_spec, self.schematics_file_spec, segment_count) = \
+            generate_design.generate_design(
+                self.directory.name, instances=2, nets=2
+            )
+        scratch_directory = os.path.join(self.directory.name, 'scratch')
+        os.makedirs(scratch_directory)
+        (
+            self.symbol_file_spec, self.compile_list_file_spec,
+            self.manifest_file_spec, trace_file_spec
+        ) = design2vhd.find_design_file_specs(
+            self.schematics_file_spec, scratch_directory
+        )
+        self.vhdl_file_spec = sch2vhd.find_file_specs(
+            self.schematics_file_spec
+        )[-1]
+        self.conversion_options = {
+            'VHDL_library' : 'bench',
+            'VHDL_directory' : '',
+            'scratch_directory' : scratch_directory
+        }
+        self.component_cache = {}
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    # --------------------------------------------------------------------------
+    # build the design as the watch loop does
+    #
+    def build(self):
+        with contextlib.redirect_stdout(io.StringIO()) :
+            (hierarchy, conversion_succeeded, library_paths) = \
+                design2vhd.build_design(
+                    self.symbol_file_spec, self.schematics_file_spec,
+                    self.gafrc_file_spec, self.manifest_file_spec,
+                    self.compile_list_file_spec, self.conversion_options,
+                    component_cache=self.component_cache
+                )
+        self.assertTrue(conversion_succeeded)
+
+        return(hierarchy, library_paths)
+
+    # --------------------------------------------------------------------------
+    # rename an instance of the schematic, as an editor would save it
+    #
+    def save_schematic(self):
+        schematics_file = open(self.schematics_file_spec)
+        schematics = schematics_file.read()
+        schematics_file.close()
+        schematics_file = open(self.schematics_file_spec, 'w')
+        schematics_file.write(schematics.replace('refdes=U1', 'refdes=U9'))
+        schematics_file.close()
+                                  # make the save visible with coarse file times
+        file_stat = os.stat(self.schematics_file_spec)
+        os.utime(self.schematics_file_spec, ns=(
+            file_stat.st_atime_ns, file_stat.st_mtime_ns + 1000000000
+        ))
+
+    def read_architecture(self):
+        vhdl_file = open(self.vhdl_file_spec)
+        architecture = vhdl_file.read()
+        vhdl_file.close()
+
+        return(architecture)
+
+    # --------------------------------------------------------------------------
+    # a schematic saved while it is converted is converted again
+    #
+    def test_save_during_build(self):
+        convert_schematic = sch2vhd.convert_schematic
+        def convert_and_save(*arguments, **keywords):
+            success = convert_schematic(*arguments, **keywords)
+            self.save_schematic()
+            return(success)
+                                                   # save during the first build
+        with unittest.mock.patch.object(
+            sch2vhd, 'convert_schematic', convert_and_save
+        ) :
+            (hierarchy, library_paths) = self.build()
+        self.assertNotIn('U9', self.read_architecture())
+                                                    # the watch loop sees a save
+        watched_files = design2vhd.find_watched_files(
+            self.gafrc_file_spec, hierarchy, library_paths
+        )
+        modification_times = design2vhd.find_watched_times(
+            watched_files, hierarchy
+        )
+        self.assertNotEqual(
+            design2vhd.find_modification_times(watched_files),
+            modification_times
+        )
+                                                   # and the rebuild converts it
+        self.build()
+        self.assertIn('U9', self.read_architecture())
+
+# ==============================================================================
+# main script
+#
+if __name__ == '__main__' :
+    unittest.main()
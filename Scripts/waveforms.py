@@ -0,0 +1,661 @@
+#! /usr/bin/env python3
+#
+# waveforms.py
+#       Script and functions to read the VCD files written by the
+#       simulations and to query the signal values.
+#
+#   The VCD file is memory-mapped and scanned in chunks: only the value
+#   changes of the selected signals are kept, in compact arrays of times
+#   and values instead of lists of Python objects.
+#   Scalar values are coded as 0, 1, 2 (unknown, 'x', 'u', ...) and
+#   3 (high impedance, 'z'). Vector values are the integer value of the
+#   bits, or -1 if a bit is neither 0 nor 1. Vectors wider than 63 bits
+#   are kept as Python integers.
+#
+#   With NumPy, the arrays are NumPy arrays and the queries are
+#   vectorised. Without it, they are Python arrays.
+#
+#   The variables and the loaded waveforms can be stored in an index
+#   file. Reopening the VCD file then only reads the index, and the
+#   waveforms found in the index are mapped without parsing the VCD file
+#   again. The index is dropped when the VCD file changes.
+#
+import os
+import sys
+import argparse
+import array
+import bisect
+import json
+import mmap
+import re
+import geda
+try :
+    import numpy
+except ImportError :
+    numpy = None
+                                                                     # constants
+CHUNK_SIZE = 16 * 1024 * 1024
+INDEX_FORMAT = 'vhdl-eda waveform index'
+INDEX_VERSION = 1
+INDEX_ALIGNMENT = 8
+TIME_TYPE = 'q'
+SCALAR_TYPE = 'b'
+VECTOR_TYPE = 'q'
+REAL_TYPE = 'd'
+WIDE_VECTOR_TYPE = 'object'
+MAX_VECTOR_WIDTH = 63
+UNKNOWN = 2
+TIME_CHARACTER = ord('#')
+COMMAND_CHARACTER = ord('$')
+SCALAR_VALUES = {
+    ord('0') : 0, ord('1') : 1, ord('L') : 0, ord('l') : 0,
+    ord('H') : 1, ord('h') : 1, ord('Z') : 3, ord('z') : 3
+}
+
+TIME_UNITS = {
+    's' : 1, 'ms' : 1E-3, 'us' : 1E-6, 'ns' : 1E-9, 'ps' : 1E-12,
+    'fs' : 1E-15
+}
+TIME_SPECIFICATION = re.compile(
+    r'^\s*([\d.]+(?:[eE][-+]?\d+)?)\s*([a-z]*)\s*$'
+)
+
+# ==============================================================================
+# records
+#
+# ------------------------------------------------------------------------------
+# VCD variable
+#
+#   The name is the hierarchical name, with the scopes separated by dots.
+#   The code is the identifier of the variable in the value changes,
+#   shared by the variables which are aliases of each other.
+#
+class Variable :
+    __slots__ = ('name', 'code', 'type', 'width')
+
+    def __init__(self, name, code, variable_type, width):
+        self.name = name
+        self.code = code
+        self.type = variable_type
+        self.width = width
+
+# ------------------------------------------------------------------------------
+# waveform of a variable
+#
+#   The value at times[i] holds until times[i+1].
+#
+class Waveform :
+    __slots__ = ('name', 'width', 'value_type', 'times', 'values')
+
+    def __init__(self, name, width, value_type, times, values):
+        self.name = name
+        self.width = width
+        self.value_type = value_type
+        self.times = times
+        self.values = values
+
+    def __len__(self):
+        return(len(self.times))
+
+# ------------------------------------------------------------------------------
+# opened VCD file
+#
+#   The waveforms are indexed by variable code.
+#
+class Dump :
+    __slots__ = (
+        'file_spec', 'stamp', 'timescale', 'header_end', 'variables',
+        'waveforms', 'index_file_spec'
+    )
+
+    def __init__(self, file_spec, stamp, index_file_spec=None):
+        self.file_spec = file_spec
+        self.stamp = stamp
+        self.timescale = ''
+        self.header_end = 0
+        self.variables = []
+        self.waveforms = {}
+        self.index_file_spec = index_file_spec
+
+# ==============================================================================
+# functions
+#
+# ------------------------------------------------------------------------------
+# find the value type of a variable
+#
+def find_value_type(variable):
+    if variable.type in ('real', 'realtime') :
+        return(REAL_TYPE)
+    if variable.width == 1 :
+        return(SCALAR_TYPE)
+    if variable.width > MAX_VECTOR_WIDTH :
+        return(WIDE_VECTOR_TYPE)
+
+    return(VECTOR_TYPE)
+
+# ------------------------------------------------------------------------------
+# build a value array
+#
+def new_value_array(value_type):
+    if value_type == WIDE_VECTOR_TYPE :
+        return([])
+
+    return(array.array(value_type))
+
+# ------------------------------------------------------------------------------
+# convert the arrays of a waveform to NumPy arrays
+#
+#   The Python arrays are wrapped without copying their contents.
+#
+def convert_to_numpy(waveform):
+    if numpy is None :
+        return(waveform)
+    if isinstance(waveform.times, array.array) :
+        waveform.times = numpy.frombuffer(waveform.times, dtype=numpy.int64)
+    if isinstance(waveform.values, array.array) :
+        waveform.values = numpy.frombuffer(
+            waveform.values, dtype=waveform.values.typecode
+        )
+    elif isinstance(waveform.values, list) :
+        values = numpy.empty(len(waveform.values), dtype=object)
+        values[:] = waveform.values
+        waveform.values = values
+
+    return(waveform)
+
+# ------------------------------------------------------------------------------
+# parse the VCD header
+#
+#   The header ends with the $enddefinitions command.
+#   Returns False if the file has no $enddefinitions command.
+#
+def parse_header(dump, vcd_map):
+    header_end = vcd_map.find(b'$enddefinitions')
+    if header_end < 0 :
+        print("%s has no $enddefinitions command" % dump.file_spec)
+        return(False)
+    header_end = vcd_map.find(b'$end', header_end + len(b'$enddefinitions'))
+    if header_end < 0 :
+        print("%s has no end of definitions" % dump.file_spec)
+        return(False)
+    dump.header_end = header_end + len(b'$end')
+    tokens = vcd_map[:dump.header_end].decode(errors='replace').split()
+    scopes = []
+    index = 0
+    while index < len(tokens) :
+        token = tokens[index]
+        if token == '$timescale' :
+            end_index = tokens.index('$end', index)
+            dump.timescale = ''.join(tokens[index+1:end_index])
+            index = end_index
+        elif token == '$scope' :
+            scopes.append(tokens[index+2])
+            index = tokens.index('$end', index)
+        elif token == '$upscope' :
+            scopes.pop()
+            index = tokens.index('$end', index)
+        elif token == '$var' :
+            end_index = tokens.index('$end', index)
+            (variable_type, width, code, name) = tokens[index+1:index+5]
+            variable = Variable(
+                '.'.join(scopes + [name]), code, variable_type, int(width)
+            )
+            dump.variables.append(variable)
+            index = end_index
+        elif token.startswith('$') and (token != '$end') :
+            index = tokens.index('$end', index)
+        index = index + 1
+
+    return(True)
+
+# ------------------------------------------------------------------------------
+# find the variable of a signal
+#
+#   The name is the hierarchical name or its end, as long as it is the
+#   end of a single variable.
+#   Returns None if no variable or several variables match.
+#
+def find_variable(dump, name):
+    matching_variables = []
+    for variable in dump.variables :
+        if variable.name == name :
+            return(variable)
+        if variable.name.endswith('.' + name) :
+            matching_variables.append(variable)
+    if not matching_variables :
+        print("signal %s not found in %s" % (name, dump.file_spec))
+        return(None)
+    if len(matching_variables) > 1 :
+        print("signal %s is ambiguous in %s:" % (name, dump.file_spec))
+        for variable in matching_variables :
+            print("  " + variable.name)
+        return(None)
+
+    return(matching_variables[0])
+
+# ------------------------------------------------------------------------------
+# parse the value changes of selected variables
+#
+#   The file is scanned in chunks ending at a line end. Value changes of
+#   the other variables are skipped without being decoded.
+#
+def parse_value_changes(dump, vcd_map, variables):
+    waveforms = {}
+    for variable in variables :
+        if variable.code.encode() not in waveforms :
+            value_type = find_value_type(variable)
+            waveforms[variable.code.encode()] = Waveform(
+                variable.name, variable.width, value_type,
+                array.array(TIME_TYPE), new_value_array(value_type)
+            )
+    time = 0
+    position = dump.header_end
+    file_size = len(vcd_map)
+    skip_until_end = False
+    while position < file_size :
+        chunk_end = vcd_map.find(b'\n', min(position + CHUNK_SIZE, file_size))
+        if chunk_end < 0 :
+            chunk_end = file_size
+        tokens = vcd_map[position:chunk_end].split()
+        position = chunk_end + 1
+        index = 0
+        while index < len(tokens) :
+            token = tokens[index]
+            index = index + 1
+            first_character = token[0]
+                                                                  # skip comment
+            if skip_until_end :
+                if token == b'$end' :
+                    skip_until_end = False
+                                                                      # new time
+            elif first_character == TIME_CHARACTER :
+                time = int(token[1:])
+                                                                  # vector value
+            elif first_character in b'bBrR' :
+                waveform = waveforms.get(tokens[index])
+                index = index + 1
+                if waveform is None :
+                    continue
+                if waveform.value_type == REAL_TYPE :
+                    value = float(token[1:])
+                else :
+                    try :
+                        value = int(token[1:], 2)
+                    except ValueError :
+                        value = -1
+                waveform.times.append(time)
+                waveform.values.append(value)
+                                                                      # commands
+            elif first_character == COMMAND_CHARACTER :
+                skip_until_end = (token == b'$comment')
+                                                                  # scalar value
+            else :
+                waveform = waveforms.get(token[1:])
+                if waveform is None :
+                    continue
+                waveform.times.append(time)
+                waveform.values.append(
+                    SCALAR_VALUES.get(first_character, UNKNOWN)
+                )
+
+    return(waveforms)
+
+# ------------------------------------------------------------------------------
+# read the index of a VCD file
+#
+#   The index holds a JSON header line followed by the arrays of the
+#   indexed waveforms, each starting at a multiple of INDEX_ALIGNMENT.
+#   Returns False if the index is missing or doesn't match the VCD file.
+#
+def read_index(dump):
+    try :
+        index_file = open(dump.index_file_spec, 'rb')
+    except OSError :
+        return(False)
+    try :
+        header = json.loads(index_file.readline())
+    except ValueError :
+        index_file.close()
+        return(False)
+    if \
+        (not isinstance(header, dict))                    or \
+        (header.get('format') != INDEX_FORMAT)            or \
+        (header.get('version') != INDEX_VERSION)          or \
+        (header.get('source_stamp') != dump.stamp)           \
+    :
+        index_file.close()
+        return(False)
+    dump.timescale = header['timescale']
+    dump.header_end = header['header_end']
+    for (name, code, variable_type, width) in header['variables'] :
+        dump.variables.append(Variable(name, code, variable_type, width))
+    if header['waveforms'] :
+        index_map = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        for (code, stored) in header['waveforms'].items() :
+            (name, width, value_type, count, times_offset, values_offset) = \
+                stored
+            if numpy is not None :
+                times = numpy.frombuffer(
+                    index_map, numpy.int64, count, times_offset
+                )
+                values = numpy.frombuffer(
+                    index_map, value_type, count, values_offset
+                )
+            else :
+                times = array.array(TIME_TYPE)
+                times.frombytes(
+                    index_map[times_offset:times_offset + count*times.itemsize]
+                )
+                values = array.array(value_type)
+                values.frombytes(index_map[
+                    values_offset:values_offset + count*values.itemsize
+                ])
+            dump.waveforms[code] = Waveform(
+                name, width, value_type, times, values
+            )
+        if numpy is None :
+            index_map.close()
+    index_file.close()
+
+    return(True)
+
+# ------------------------------------------------------------------------------
+# write the index of a VCD file
+#
+#   The waveforms of wide vectors are not indexed.
+#   The index is written to a temporary file which then replaces the old
+#   one: a reader never sees a partly written index.
+#
+def write_index(dump):
+    variables = []
+    for variable in dump.variables :
+        variables.append(
+            [variable.name, variable.code, variable.type, variable.width]
+        )
+    stored_waveforms = {}
+    blocks = []
+    data_size = 0
+    for (code, waveform) in dump.waveforms.items() :
+        if waveform.value_type == WIDE_VECTOR_TYPE :
+            continue
+        offsets = []
+        for data in (waveform.times, waveform.values) :
+            data = bytes(memoryview(data).cast('B'))
+            offsets.append(data_size)
+            padding = -len(data) % INDEX_ALIGNMENT
+            blocks.append(data + padding * b'\0')
+            data_size = data_size + len(data) + padding
+        stored_waveforms[code] = [
+            waveform.name, waveform.width, waveform.value_type, len(waveform)
+        ] + offsets
+                                             # place the blocks after the header
+    header = {
+        'format' : INDEX_FORMAT,
+        'version' : INDEX_VERSION,
+        'source_stamp' : dump.stamp,
+        'timescale' : dump.timescale,
+        'header_end' : dump.header_end,
+        'variables' : variables,
+        'waveforms' : stored_waveforms
+    }
+    block_offsets = {}
+    for (code, stored) in stored_waveforms.items() :
+        block_offsets[code] = stored[4:]
+    header_size = 0
+    while True :
+        for (code, stored) in stored_waveforms.items() :
+            stored[4:] = [
+                offset + header_size for offset in block_offsets[code]
+            ]
+        header_line = json.dumps(header).encode()
+        if len(header_line) < header_size :
+            break
+        header_size = len(header_line) + 1
+        header_size = header_size + (-header_size % INDEX_ALIGNMENT)
+    header_line = header_line.ljust(header_size - 1) + b'\n'
+                                                                   # write index
+    temporary_file_spec = "%s.%d.tmp" % (dump.index_file_spec, os.getpid())
+    index_file = open(temporary_file_spec, 'wb')
+    index_file.write(header_line)
+    for block in blocks :
+        index_file.write(block)
+    index_file.close()
+    os.replace(temporary_file_spec, dump.index_file_spec)
+
+# ------------------------------------------------------------------------------
+# open a VCD file
+#
+#   With an index file, the variables are read from the index if it is
+#   up to date, and the index is rewritten otherwise.
+#   Returns None if the file can't be read.
+#
+def open_dump(vcd_file_spec, index_file_spec=None):
+    vcd_stamp = geda.find_file_stamp(vcd_file_spec)
+    if vcd_stamp is None :
+        print("VCD file %s not found" % vcd_file_spec)
+        return(None)
+    dump = Dump(vcd_file_spec, vcd_stamp)
+    dump.index_file_spec = index_file_spec
+    if index_file_spec and read_index(dump) :
+        return(dump)
+    vcd_file = open(vcd_file_spec, 'rb')
+    vcd_map = mmap.mmap(vcd_file.fileno(), 0, access=mmap.ACCESS_READ)
+    header_parsed = parse_header(dump, vcd_map)
+    vcd_map.close()
+    vcd_file.close()
+    if not header_parsed :
+        return(None)
+    if index_file_spec :
+        write_index(dump)
+
+    return(dump)
+
+# ------------------------------------------------------------------------------
+# load the waveforms of signals
+#
+#   The VCD file is scanned once for all the signals which aren't loaded
+#   yet. The index is updated with the new waveforms.
+#   Returns None if a signal isn't found.
+#
+def load_waveforms(dump, names):
+    variables = []
+    for name in names :
+        variable = find_variable(dump, name)
+        if variable is None :
+            return(None)
+        variables.append(variable)
+    missing_variables = []
+    for variable in variables :
+        if variable.code not in dump.waveforms :
+            missing_variables.append(variable)
+    if missing_variables :
+        vcd_file = open(dump.file_spec, 'rb')
+        vcd_map = mmap.mmap(vcd_file.fileno(), 0, access=mmap.ACCESS_READ)
+        waveforms = parse_value_changes(dump, vcd_map, missing_variables)
+        vcd_map.close()
+        vcd_file.close()
+        for (code, waveform) in waveforms.items() :
+            dump.waveforms[code.decode()] = convert_to_numpy(waveform)
+        if dump.index_file_spec :
+            write_index(dump)
+    waveforms = []
+    for variable in variables :
+        waveforms.append(dump.waveforms[variable.code])
+
+    return(waveforms)
+
+# ------------------------------------------------------------------------------
+# find the index of the value holding at a given time
+#
+#   Returns -1 before the first value change.
+#
+def find_change_index(waveform, time):
+    if numpy is not None and isinstance(waveform.times, numpy.ndarray) :
+        return(int(numpy.searchsorted(waveform.times, time, 'right')) - 1)
+
+    return(bisect.bisect_right(waveform.times, time) - 1)
+
+# ------------------------------------------------------------------------------
+# find the value of a waveform at a given time
+#
+#   Returns None before the first value change.
+#
+def value_at(waveform, time):
+    change_index = find_change_index(waveform, time)
+    if change_index < 0 :
+        return(None)
+    value = waveform.values[change_index]
+    if numpy is not None and isinstance(value, numpy.generic) :
+        value = value.item()
+
+    return(value)
+
+# ------------------------------------------------------------------------------
+# find the edges of a scalar waveform in a time window
+#
+#   The edge is 'rising' (0 to 1), 'falling' (1 to 0) or 'both'.
+#   Returns the times of the edges.
+#
+def find_edges(waveform, start=None, end=None, edge='rising'):
+    first_index = 1
+    if start is not None :
+        first_index = max(find_change_index(waveform, start - 1) + 1, 1)
+    last_index = len(waveform) - 1
+    if end is not None :
+        last_index = find_change_index(waveform, end)
+    if last_index < first_index :
+        return([])
+    rising = edge in ('rising', 'both')
+    falling = edge in ('falling', 'both')
+    if numpy is not None and isinstance(waveform.values, numpy.ndarray) :
+        previous = waveform.values[first_index-1:last_index]
+        current = waveform.values[first_index:last_index+1]
+        edges = numpy.zeros(len(current), dtype=bool)
+        if rising :
+            edges = edges | ((previous == 0) & (current == 1))
+        if falling :
+            edges = edges | ((previous == 1) & (current == 0))
+        return(waveform.times[first_index:last_index+1][edges].tolist())
+    edge_times = []
+    for index in range(first_index, last_index+1) :
+        previous = waveform.values[index-1]
+        current = waveform.values[index]
+        if \
+            (rising and (previous == 0) and (current == 1)) or \
+            (falling and (previous == 1) and (current == 0))   \
+        :
+            edge_times.append(waveform.times[index])
+
+    return(edge_times)
+
+# ------------------------------------------------------------------------------
+# convert a time specification to VCD time units
+#
+#   The time is a number of time units, or a number followed by a unit,
+#   as in "10us".
+#   Returns None if the time can't be converted.
+#
+def parse_time(time_specification, timescale):
+    match = TIME_SPECIFICATION.match(time_specification)
+    timescale_match = TIME_SPECIFICATION.match(timescale or '1s')
+    if not (match and timescale_match) :
+        print("invalid time %s" % time_specification)
+        return(None)
+    (value, unit) = match.groups()
+    if not unit :
+        return(int(float(value)))
+    if unit not in TIME_UNITS :
+        print("invalid time unit %s" % unit)
+        return(None)
+    (timescale_value, timescale_unit) = timescale_match.groups()
+    time_unit = float(timescale_value) * TIME_UNITS[timescale_unit or 's']
+
+    return(int(round(float(value) * TIME_UNITS[unit] / time_unit)))
+
+# ==============================================================================
+# main script
+#
+if __name__ == '__main__' :
+                                                             # specify arguments
+    parser = argparse.ArgumentParser(
+      description='Query the signal values of a VCD file'
+    )
+                                                                      # VCD file
+    parser.add_argument('vcd_file')
+                                                                       # signals
+    parser.add_argument(
+        'signals', nargs='*',
+        help = 'hierarchical signal names, or the end of these names'
+    )
+                                                                # list variables
+    parser.add_argument(
+        '-l', '--list', action='store_true',
+        help = 'list the variables of the file'
+    )
+                                                                    # query time
+    parser.add_argument(
+        '-t', '--time',
+        help = 'print the signal values at this time, as in 10us'
+    )
+                                                                         # edges
+    parser.add_argument(
+        '-e', '--edges', choices=('rising', 'falling', 'both'),
+        help = 'print the times of the edges of the signals'
+    )
+                                                                   # time window
+    parser.add_argument(
+        '-w', '--window', nargs=2, metavar=('START', 'END'),
+        help = 'time window of the edges'
+    )
+                                                                    # index file
+    parser.add_argument(
+        '-i', '--index', action='store_true',
+        help = 'keep an index file next to the VCD file'
+    )
+                                                             # process arguments
+    parser_arguments = parser.parse_intermixed_args()
+    vcd_file_spec = parser_arguments.vcd_file
+    index_file_spec = None
+    if parser_arguments.index :
+        index_file_spec = vcd_file_spec + '.index'
+                                                                     # open file
+    dump = open_dump(vcd_file_spec, index_file_spec)
+    if dump is None :
+        sys.exit(1)
+    if parser_arguments.list :
+        print("timescale %s" % dump.timescale)
+        for variable in dump.variables :
+            print("%-8s %4d %s" % (
+                variable.type, variable.width, variable.name
+            ))
+                                                                  # load signals
+    waveforms = load_waveforms(dump, parser_arguments.signals)
+    if waveforms is None :
+        sys.exit(1)
+                                                                  # print values
+    if parser_arguments.time :
+        time = parse_time(parser_arguments.time, dump.timescale)
+        if time is None :
+            sys.exit(1)
+        for waveform in waveforms :
+            print("%s = %s" % (waveform.name, value_at(waveform, time)))
+                                                                   # print edges
+    if parser_arguments.edges :
+        (start, end) = (None, None)
+        if parser_arguments.window :
+            start = parse_time(parser_arguments.window[0], dump.timescale)
+            end = parse_time(parser_arguments.window[1], dump.timescale)
+            if (start is None) or (end is None) :
+                sys.exit(1)
+        for waveform in waveforms :
+            edge_times = find_edges(
+                waveform, start, end, parser_arguments.edges
+            )
+            print("%s : %d %s edges" % (
+                waveform.name, len(edge_times), parser_arguments.edges
+            ))
+            for edge_time in edge_times :
+                print("  %d" % edge_time)
+    if not (parser_arguments.time or parser_arguments.edges) :
+        for waveform in waveforms :
+            print("%s : %d value changes" % (waveform.name, len(waveform)))
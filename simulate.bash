@@ -3,20 +3,26 @@
 compileList="I2S_test-deserializer_testbench-struct-compile_list.txt"
 topLevel="I2S_test_deserializer_tester"
 compileOnly="false"
+incremental="false"
+allTesters="false"
+report=""
                                                           # exit script on error
 set -e
-                                                     # work in scratch directory
-cd /tmp
-rm -f *.cf
-                                                             # analyse all files
-while read -r vhdlFileSpec ; do
-  echo "$vhdlFileSpec"
-  ghdl -a $vhdlFileSpec
-done < "$compileList"
-                                                              # test if continue
+                                                               # script location
+scriptDirectory=$(dirname "$(realpath "$0")")
+                                                                 # build options
+options="--work /tmp --top $topLevel"
 if [ "$compileOnly" = true ] ; then
-  exit 0
+  options="$options --compile-only"
 fi
-                                                               # simulate design
-ghdl -e $topLevel
-ghdl -r $topLevel --vcd=$topLevel.vcd
+if [ "$incremental" = true ] ; then
+  options="$options --incremental"
+fi
+if [ "$allTesters" = true ] ; then
+  options="$options --testers"
+fi
+if [ -n "$report" ] ; then
+  options="$options --report $report"
+fi
+                                      # analyse in dependency order and simulate
+python3 "$scriptDirectory/Scripts/simulate.py" $options "$compileList"